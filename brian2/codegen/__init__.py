@@ -7,4 +7,5 @@ from .statements import *
 from .translation import *
 from .runtime import *
 from ._prefs import *
-from .functions import *
\ No newline at end of file
+from .functions import *
+from .rng import *
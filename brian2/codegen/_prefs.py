@@ -1,10 +1,18 @@
 '''
 Module declaring general code generation preferences.
 '''
+import multiprocessing
 
 from .codeobject import CodeObject
 from brian2.core.preferences import brian_prefs, BrianPreference
 
+
+def _cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
 # Preferences
 brian_prefs.register_preferences(
     'codegen',
@@ -21,9 +29,42 @@ brian_prefs.register_preferences(
         * `'weave`' uses ``scipy.weave`` to generate and compile C++ code,
           should work anywhere where ``gcc`` is installed and available at the
           command line.
+        * `'numexpr'` evaluates expressions with the ``numexpr`` package,
+          using several threads but no compiler.
+        * `'cython'` uses ``Cython`` to generate and compile C code, needs
+          Cython and a C compiler.
         
         Or it can be a ``CodeObject`` class.
         ''',
         validator=lambda target: isinstance(target, str) or issubclass(target, CodeObject),
         ),
+    max_compile_processes = BrianPreference(
+        default=_cpu_count(),
+        docs='''
+        The maximum number of processes that are used to compile the code
+        objects of a network in parallel before a run (only relevant for
+        targets that compile code, e.g. weave) and the number of parallel
+        jobs used to build a C++ standalone project. Defaults to the number
+        of CPUs. Setting it to 1 compiles all code in the main process.
+        ''',
+        validator=lambda value: isinstance(value, int) and value >= 1
+        ),
+    cache_code_objects = BrianPreference(
+        default=True,
+        docs='''
+        Whether to reuse the code objects of a previous run if the abstract
+        code, the values of external constants, the variables and the target
+        did not change (e.g. when calling ``run`` repeatedly in a loop). See
+        `get_code_object_cache_statistics`.
+        ''',
+        ),
+    loop_invariant_optimisations = BrianPreference(
+        default=True,
+        docs='''
+        Whether to calculate parts of expressions that only depend on scalar
+        values (e.g. ``exp(-dt/tau)`` with a constant ``tau``) only once
+        for every execution of a code object instead of once for every
+        element. See `optimise_statements`.
+        ''',
+        ),
     )
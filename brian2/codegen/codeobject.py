@@ -1,15 +1,21 @@
 '''
 Module providing the base `CodeObject` and related functions.
 '''
+import os
 import copy
 import functools
 import weakref
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
 
 import numpy as np
 
 from brian2.core.functions import Function
 from brian2.core.names import Nameable
-from brian2.core.variables import Constant
+from brian2.core.preferences import brian_prefs
+from brian2.core.variables import (Constant, AttributeVariable,
+                                   DynamicArrayVariable)
 from brian2.equations.unitcheck import check_units_statements
 from brian2.units.fundamentalunits import get_unit
 from brian2.utils.logger import get_logger
@@ -18,10 +24,34 @@ from .translation import analyse_identifiers
 
 __all__ = ['CodeObject',
            'CodeObjectUpdater',
+           'get_code_object_cache_statistics',
+           'clear_code_object_cache',
            ]
 
 logger = get_logger(__name__)
 
+#: The code objects whose compilation has been deferred, stored with a key
+#: identifying their source (see `defer_compilation`). ``None`` if compilation
+#: is currently not deferred.
+_deferred_code_objects = None
+
+#: The code objects that are built by the worker processes
+_build_queue = None
+
+#: Code objects created by `create_runner_codeobj` that can be reused, stored
+#: with a key describing everything their generation depends on (see
+#: `_code_object_cache_key`). The code objects are only weakly referenced,
+#: an entry is removed when no object uses the code object anymore.
+_code_object_cache = weakref.WeakValueDictionary()
+
+#: Statistics about the use of `_code_object_cache`
+_code_object_cache_statistics = {'hits': 0, 'misses': 0}
+
+#: The part of the `_code_object_cache_key` describing the code generation
+#: preferences, stored together with the version of the preferences it was
+#: determined for (see `_preferences_cache_key`)
+_preferences_key = (None, None)
+
 
 class CodeObject(Nameable):
     '''
@@ -51,6 +81,10 @@ class CodeObject(Nameable):
         self.owner = owner
         self.code = code
         self.variables = variables
+        #: Whether the code draws random numbers, the runtime code objects
+        #: have to start a new execution of the random number generator
+        #: every time they are run (see `brian2.codegen.rng`)
+        self.draws_random_numbers = '_rng_state' in variables
 
     def update_namespace(self):
         '''
@@ -72,6 +106,17 @@ class CodeObject(Nameable):
     def compile(self):
         pass
 
+    def build(self):
+        '''
+        Perform the expensive part of the compilation that does not change
+        the state of the current process (e.g. calling a compiler that stores
+        the compiled code on disk). Only called for code objects that
+        deferred their compilation with `defer_compilation`, possibly in a
+        separate process. The `compile` method is called again afterwards.
+        Does nothing by default.
+        '''
+        pass
+
     def __call__(self, **kwds):
         self.update_namespace()
         self.namespace.update(**kwds)
@@ -91,6 +136,193 @@ class CodeObject(Nameable):
         raise NotImplementedError()
 
 
+def defer_compilation(codeobj, key):
+    '''
+    Defer the build step of a code object's compilation (see
+    `CodeObject.build`) to the end of the current `deferred_compilation`
+    block. Should be called from `CodeObject.compile`.
+
+    Parameters
+    ----------
+    codeobj : `CodeObject`
+        The code object whose compilation should be deferred.
+    key : str
+        A key identifying the source that has to be built. Code objects with
+        the same key are only built once.
+
+    Returns
+    -------
+    deferred : bool
+        Whether the compilation has been deferred. If ``False``, the code
+        object has to build its code immediately.
+    '''
+    if _deferred_code_objects is None:
+        return False
+    _deferred_code_objects.append((key, codeobj))
+    return True
+
+
+def _run_build(index):
+    _build_queue[index].build()
+
+
+def build_code_objects(code_objects):
+    '''
+    Build the given code objects (see `CodeObject.build`), in parallel in up
+    to `codegen.max_compile_processes` processes.
+    '''
+    global _build_queue
+    processes = min(brian_prefs['codegen.max_compile_processes'],
+                    len(code_objects))
+    # The worker processes access the code objects via the global
+    # _build_queue, this only works if the processes are forked
+    if processes > 1 and hasattr(os, 'fork'):
+        logger.debug('Building %d code objects in %d processes' % (len(code_objects),
+                                                                   processes))
+        _build_queue = code_objects
+        pool = multiprocessing.Pool(processes)
+        try:
+            pool.map(_run_build, range(len(code_objects)))
+        finally:
+            pool.close()
+            pool.join()
+            _build_queue = None
+    else:
+        for codeobj in code_objects:
+            codeobj.build()
+
+
+@contextmanager
+def deferred_compilation():
+    '''
+    Context manager deferring the build step of all code objects that are
+    created within it and support it (see `defer_compilation`). At the end of
+    the block, all distinct sources are built at once (see
+    `build_code_objects`) and the `CodeObject.compile` method of the
+    deferred code objects is called again. Code objects that are run within
+    the block have to build their code on their own.
+    '''
+    global _deferred_code_objects
+    if _deferred_code_objects is not None:
+        # Nested use, the outer block takes care of the compilation
+        yield
+        return
+    _deferred_code_objects = []
+    try:
+        yield
+        deferred = _deferred_code_objects
+    finally:
+        _deferred_code_objects = None
+
+    to_build = OrderedDict()
+    for key, codeobj in deferred:
+        to_build.setdefault(key, codeobj)
+    build_code_objects(to_build.values())
+    for _, codeobj in deferred:
+        codeobj.compile()
+
+
+def get_code_object_cache_statistics():
+    '''
+    Return statistics about the reuse of code objects between runs (see
+    `codegen.cache_code_objects`).
+
+    Returns
+    -------
+    statistics : dict
+        A dictionary with the number of requested code objects that could be
+        reused (``'hits'``) and of those that had to be generated
+        (``'misses'``).
+    '''
+    return dict(_code_object_cache_statistics)
+
+
+def clear_code_object_cache():
+    '''
+    Forget all code objects stored for reuse and reset the statistics.
+    '''
+    _code_object_cache.clear()
+    for key in _code_object_cache_statistics:
+        _code_object_cache_statistics[key] = 0
+
+
+def _hashable(value):
+    '''
+    Helper function to use a value in a cache key: hashable values are used
+    directly, others via their identity.
+    '''
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ('id', id(value))
+
+
+def _preferences_cache_key():
+    '''
+    Return the part of the `_code_object_cache_key` describing the code
+    generation preferences. It is only determined again after a preference
+    has been set or after `invalidate_preferences_cache_key` has been called.
+    '''
+    global _preferences_key
+    version, key = _preferences_key
+    if version != brian_prefs._version:
+        key = tuple(sorted((prefname, repr(value))
+                           for prefname, value in brian_prefs.prefs.iteritems()
+                           if prefname.startswith('codegen.') or
+                           prefname.startswith('core.')))
+        _preferences_key = (brian_prefs._version, key)
+    return key
+
+
+def invalidate_preferences_cache_key():
+    '''
+    Determine the preference part of the code object cache keys again when it
+    is needed next. Called by `Network.before_run`, preference values such as
+    lists could have been changed in place.
+    '''
+    global _preferences_key
+    _preferences_key = (None, None)
+
+
+def _code_object_cache_key(device, codeobj_class, group, name, code,
+                           template_name, variables, variable_indices,
+                           unit_namespace, template_kwds):
+    '''
+    Create a key for `_code_object_cache`. Variables are identified by their
+    identity (code objects keep references to them, the identities are
+    therefore not reused while the cached code object exists), external
+    constants and constant attributes by their value and unit. Resizing
+    arrays that code objects do not expect to change size invalidates the
+    key, as do changes in the code generation preferences.
+    '''
+    if isinstance(code, dict):
+        code = tuple(sorted(code.iteritems()))
+    variable_keys = []
+    for varname, var in sorted(variables.iteritems()):
+        if isinstance(var, Constant):
+            value = unit_namespace.get(varname, var.value)
+            value_key = (type(value).__name__,
+                         repr(np.asarray(value).tolist()),
+                         repr(get_unit(value)))
+            variable_keys.append((varname, value_key))
+        elif isinstance(var, AttributeVariable) and var.constant:
+            variable_keys.append((varname, var,
+                                  repr(np.asarray(var.get_value()).tolist())))
+        elif isinstance(var, DynamicArrayVariable) and var.constant_size:
+            variable_keys.append((varname, var, var.size))
+        else:
+            variable_keys.append((varname, _hashable(var)))
+    indices = tuple(sorted((varname, variable_indices[varname])
+                           for varname in variables
+                           if varname in variable_indices))
+    if template_kwds is None:
+        template_kwds = {}
+    kwds = tuple(sorted((k, _hashable(v)) for k, v in template_kwds.iteritems()))
+    return (id(device), codeobj_class, id(group), name, code, template_name,
+            tuple(variable_keys), indices, kwds, _preferences_cache_key())
+
+
 def check_code_units(code, group, additional_variables=None,
                      additional_namespace=None,
                      ignore_keyerrors=False):
@@ -187,22 +419,17 @@ def create_runner_codeobj(group, code, template_name,
         saved in `group`.
     template_kwds : dict, optional
         A dictionary of additional information that is passed to the template.
+
+    Notes
+    -----
+    If the `codegen.cache_code_objects` preference is set, a code object
+    created by an earlier call with the same code, variables, external
+    constants and target is returned if it still exists.
     '''
     logger.debug('Creating code object for abstract code:\n' + str(code))
     from brian2.devices import get_device
     device = get_device()
 
-    if check_units:
-        if isinstance(code, dict):
-            for c in code.values():
-                check_code_units(c, group,
-                                 additional_variables=additional_variables,
-                                 additional_namespace=additional_namespace)
-        else:
-            check_code_units(code, group,
-                             additional_variables=additional_variables,
-                             additional_namespace=additional_namespace)
-
     codeobj_class = device.code_object_class(group.codeobj_class)
     template = getattr(codeobj_class.templater, template_name)
 
@@ -295,11 +522,42 @@ def create_runner_codeobj(group, code, template_name,
         if var_index != '_idx':
             variables[var_index] = all_variables[var_index]
 
-    return device.code_object(owner=group,
-                              name=name,
-                              abstract_code=code,
-                              variables=variables,
-                              template_name=template_name,
-                              variable_indices=all_variable_indices,
-                              template_kwds=template_kwds,
-                              codeobj_class=group.codeobj_class)
+    use_cache = brian_prefs['codegen.cache_code_objects']
+    if use_cache:
+        # The units of external constants are relevant for the unit checks
+        unit_namespace = group.namespace.resolve_all(resolved_namespace.keys(),
+                                                     additional_namespace,
+                                                     strip_units=False)
+        key = _code_object_cache_key(device, codeobj_class, group, name, code,
+                                     template_name, variables,
+                                     all_variable_indices, unit_namespace,
+                                     template_kwds)
+        codeobj = _code_object_cache.get(key)
+        if codeobj is not None:
+            _code_object_cache_statistics['hits'] += 1
+            logger.debug('Reusing code object %s' % codeobj.name)
+            return codeobj
+        _code_object_cache_statistics['misses'] += 1
+
+    if check_units:
+        if isinstance(code, dict):
+            for c in code.values():
+                check_code_units(c, group,
+                                 additional_variables=additional_variables,
+                                 additional_namespace=additional_namespace)
+        else:
+            check_code_units(code, group,
+                             additional_variables=additional_variables,
+                             additional_namespace=additional_namespace)
+
+    codeobj = device.code_object(owner=group,
+                                 name=name,
+                                 abstract_code=code,
+                                 variables=variables,
+                                 template_name=template_name,
+                                 variable_indices=all_variable_indices,
+                                 template_kwds=template_kwds,
+                                 codeobj_class=group.codeobj_class)
+    if use_cache:
+        _code_object_cache[key] = codeobj
+    return codeobj
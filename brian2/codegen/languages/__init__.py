@@ -1,3 +1,5 @@
 from .base import *
 from .cpp_lang import *
 from .numpy_lang import *
+from .numexpr_lang import *
+from .cython_lang import *
@@ -56,6 +56,23 @@ class Language(object):
         '''
         raise NotImplementedError
 
+    def translate_scalar_statements(self, statements, variables,
+                                    codeobj_class):
+        '''
+        Translate the statements calculating loop-invariant values (see
+        `optimise_statements`), which are executed once before the loop over
+        the elements. ``statements`` can be a list of `Statement` objects or a
+        dictionary of such lists, the return value is a list of lines or a
+        dictionary of lists of lines, respectively.
+        '''
+        if isinstance(statements, dict):
+            return dict((name, self.translate_scalar_statements(block,
+                                                                variables,
+                                                                codeobj_class))
+                        for name, block in statements.iteritems())
+        return [self.translate_statement(stmt, variables, codeobj_class)
+                for stmt in statements]
+
     def translate_statement_sequence(self, statements, variables,
                                      variable_indices, iterate_all,
                                      codeobj_class):
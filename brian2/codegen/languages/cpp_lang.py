@@ -13,6 +13,7 @@ from brian2.core.functions import (Function, FunctionImplementation,
                                    DEFAULT_FUNCTIONS)
 from brian2.core.preferences import brian_prefs, BrianPreference
 from brian2.core.variables import ArrayVariable
+from brian2.codegen import rng
 
 from .base import Language
 
@@ -231,11 +232,15 @@ class CPPLanguage(Language):
         user_functions = []
         support_code = ''
         hash_defines = ''
+        # Several functions can share their code (e.g. rand and randn), it
+        # is only included once
+        included_code = set()
         for varname, variable in variables.items():
             if isinstance(variable, Function):
                 user_functions.append((varname, variable))
                 speccode = variable.implementations[codeobj_class].code
-                if speccode is not None:
+                if speccode is not None and id(speccode) not in included_code:
+                    included_code.add(id(speccode))
                     support_code += '\n' + deindent(speccode.get('support_code', ''))
                     hash_defines += deindent(speccode.get('hashdefine_code', ''))
                 # add the Python function with a leading '_python', if it
@@ -301,50 +306,76 @@ for func, func_cpp in [('arcsin', 'asin'), ('arccos', 'acos'), ('arctan', 'atan'
     DEFAULT_FUNCTIONS[func].implementations[CPPLanguage] = FunctionImplementation(func_cpp)
 
 # Functions that need to be implemented specifically
-randn_code = {'support_code': '''
 
-    inline double _ranf()
+# The random numbers are drawn from the counter-based Philox-4x32-10 generator
+# (see brian2.codegen.rng), for a key and execution number stored in the
+# _rng_state array. The functions do not have any state, they can be called
+# from several threads.
+rng_support_code = '''
+    inline void _philox4x32(uint32_t *ctr, uint32_t key0, uint32_t key1)
     {
-        return (double)rand()/RAND_MAX;
+        for(int _round=0; _round<10; _round++)
+        {
+            const uint64_t _p0 = (uint64_t)0xD2511F53U * ctr[0];
+            const uint64_t _p1 = (uint64_t)0xCD9E8D57U * ctr[2];
+            const uint32_t _c1 = ctr[1], _c3 = ctr[3];
+            ctr[0] = (uint32_t)(_p1 >> 32) ^ _c1 ^ key0;
+            ctr[1] = (uint32_t)_p1;
+            ctr[2] = (uint32_t)(_p0 >> 32) ^ _c3 ^ key1;
+            ctr[3] = (uint32_t)_p0;
+            key0 += 0x9E3779B9U;
+            key1 += 0xBB67AE85U;
+        }
     }
 
-    double _randn(const int vectorisation_idx)
+    inline void _philox_random_words(uint32_t *ctr, const uint64_t key,
+                                     const uint64_t execution,
+                                     const uint64_t index, const int site)
     {
-         double x1, x2, w;
-         static double y1, y2;
-         static bool need_values = true;
-         if (need_values)
-         {
-             do {
-                     x1 = 2.0 * _ranf() - 1.0;
-                     x2 = 2.0 * _ranf() - 1.0;
-                     w = x1 * x1 + x2 * x2;
-             } while ( w >= 1.0 );
-
-             w = sqrt( (-2.0 * log( w ) ) / w );
-             y1 = x1 * w;
-             y2 = x2 * w;
-
-             need_values = false;
-             return y1;
-         } else
-         {
-            need_values = true;
-            return y2;
-         }
+        ctr[0] = (uint32_t)index;
+        ctr[1] = (uint32_t)(index >> 32);
+        ctr[2] = (uint32_t)execution;
+        ctr[3] = (uint32_t)(((execution >> 32) << 16) | site);
+        _philox4x32(ctr, (uint32_t)key, (uint32_t)(key >> 32));
     }
-        '''}
-DEFAULT_FUNCTIONS['randn'].implementations[CPPLanguage] = FunctionImplementation('_randn',
-                                                                                 code=randn_code)
 
-rand_code = {'support_code': '''
-        double _rand(int vectorisation_idx)
-        {
-	        return (double)rand()/RAND_MAX;
-        }
-        '''}
+    // A double in [0, 1) from 53 random bits
+    inline double _philox_to_uniform(const uint32_t high, const uint32_t low)
+    {
+        return ((high >> 5) * 67108864.0 + (low >> 6)) * (1.0 / 9007199254740992.0);
+    }
+
+    inline double _philox_rand(const uint64_t key, const uint64_t execution,
+                               const uint64_t index, const int site)
+    {
+        uint32_t ctr[4];
+        _philox_random_words(ctr, key, execution, index, site);
+        return _philox_to_uniform(ctr[0], ctr[1]);
+    }
+
+    // Box-Muller transform
+    inline double _philox_randn(const uint64_t key, const uint64_t execution,
+                                const uint64_t index, const int site)
+    {
+        uint32_t ctr[4];
+        _philox_random_words(ctr, key, execution, index, site);
+        const double u1 = _philox_to_uniform(ctr[0], ctr[1]);
+        const double u2 = _philox_to_uniform(ctr[2], ctr[3]);
+        return sqrt(-2.0 * log(1.0 - u1)) * cos(6.283185307179586 * u2);
+    }
+    '''
+rng_code = {'support_code': rng_support_code,
+            'hashdefine_code': '''
+    #define _rand(_vectorisation_idx, _site) _philox_rand(_rng_state[0], _rng_state[1], _vectorisation_idx, _site)
+    #define _randn(_vectorisation_idx, _site) _philox_randn(_rng_state[0], _rng_state[1], _vectorisation_idx, _site)
+    '''}
+rng_namespace = {'_rng_state': rng.RNG_STATE}
+DEFAULT_FUNCTIONS['randn'].implementations[CPPLanguage] = FunctionImplementation('_randn',
+                                                                                 code=rng_code,
+                                                                                 namespace=rng_namespace)
 DEFAULT_FUNCTIONS['rand'].implementations[CPPLanguage] = FunctionImplementation('_rand',
-                                                                                code=rand_code)
+                                                                                code=rng_code,
+                                                                                namespace=rng_namespace)
 
 clip_code = {'support_code': '''
         double _clip(const float value, const float a_min, const float a_max)
@@ -367,4 +398,4 @@ int_code = {'support_code':
         }
         '''}
 DEFAULT_FUNCTIONS['int'].implementations[CPPLanguage] = FunctionImplementation('int_',
-                                                                               code=int_code)
+                                                                               code=int_code)
@@ -0,0 +1,318 @@
+'''
+Module providing `CythonLanguage`.
+'''
+import itertools
+
+import numpy
+
+from brian2.utils.stringtools import (deindent, stripped_deindented_lines,
+                                      word_substitute)
+from brian2.parsing.rendering import NodeRenderer
+from brian2.core.functions import (Function, FunctionImplementation,
+                                   DEFAULT_FUNCTIONS)
+from brian2.codegen import rng
+
+from .base import Language
+
+__all__ = ['CythonLanguage',
+           'cython_data_type',
+           ]
+
+
+def cython_data_type(dtype, memoryview=False):
+    '''
+    Gives the Cython type specifier for numpy data types. For example,
+    ``numpy.int32`` maps to ``int32_t``. Boolean values are represented as
+    ``bint``, or as ``unsigned char`` for the elements of a typed memoryview
+    (boolean arrays have to be accessed via a ``numpy.uint8`` view, see
+    `CythonCodeObject`).
+    '''
+    # this handles the case where int is specified, it will be int32 or int64
+    # depending on platform
+    if dtype is int:
+        dtype = numpy.array([1]).dtype.type
+    if dtype is float:
+        dtype = numpy.array([1.]).dtype.type
+
+    if dtype == numpy.float32:
+        dtype = 'float'
+    elif dtype == numpy.float64:
+        dtype = 'double'
+    elif dtype == numpy.int8:
+        dtype = 'int8_t'
+    elif dtype == numpy.int16:
+        dtype = 'int16_t'
+    elif dtype == numpy.int32:
+        dtype = 'int32_t'
+    elif dtype == numpy.int64:
+        dtype = 'int64_t'
+    elif dtype == numpy.uint8:
+        dtype = 'uint8_t'
+    elif dtype == numpy.uint16:
+        dtype = 'uint16_t'
+    elif dtype == numpy.uint32:
+        dtype = 'uint32_t'
+    elif dtype == numpy.uint64:
+        dtype = 'uint64_t'
+    elif dtype == numpy.bool_ or dtype is bool:
+        dtype = 'unsigned char' if memoryview else 'bint'
+    else:
+        raise ValueError("dtype " + str(dtype) + " not known.")
+    return dtype
+
+
+class CythonLanguage(Language):
+    '''
+    Cython language
+
+    Cython code templates should provide Jinja2 macros with the following
+    names:
+
+    ``main``
+        The body of the function that is called to run the code. The
+        arguments of the function (the values in the namespace of the code
+        object) are typed automatically by `CythonCodeObject`.
+    ``support_code``
+        The support code (function definitions, etc.), at the module level.
+
+    Variables cannot be declared within loops in Cython, the declarations of
+    all variables used in the code lines are therefore provided separately
+    (as ``declaration_lines``) and should be inserted at the beginning of
+    ``main``.
+
+    For user-defined functions, the ``support_code`` key has to provide the
+    function definition (e.g. a ``cdef`` function). The values in the
+    namespace of the function implementation are available to the support
+    code as module-level variables.
+    '''
+
+    language_id = 'cython'
+
+    def get_array_name(self, var, access_data=True):
+        # We have to do the import here to avoid circular import dependencies.
+        from brian2.devices.device import get_device
+        device = get_device()
+        return device.get_array_name(var, access_data=access_data)
+
+    def translate_expression(self, expr, variables, codeobj_class):
+        for varname, var in variables.iteritems():
+            if isinstance(var, Function):
+                impl_name = var.implementations[codeobj_class].name
+                if impl_name is not None:
+                    expr = word_substitute(expr, {varname: impl_name})
+        # Cython uses Python syntax (the expressions are evaluated with C
+        # semantics since all variables are declared with C types)
+        return NodeRenderer().render_expr(expr).strip()
+
+    def translate_statement(self, statement, variables, codeobj_class):
+        var, op, expr = statement.var, statement.op, statement.expr
+        if op == ':=':
+            # Only used for the scalar code that is executed once at the
+            # beginning of the function, all other variables are declared
+            # via the declaration_lines
+            decl = 'cdef ' + cython_data_type(statement.dtype) + ' '
+            op = '='
+        else:
+            decl = ''
+        return decl + var + ' ' + op + ' ' + self.translate_expression(expr,
+                                                                       variables,
+                                                                       codeobj_class)
+
+    def translate_one_statement_sequence(self, statements, variables,
+                                         variable_indices, iterate_all,
+                                         codeobj_class):
+        # Note that Cython code does not care about the iterate_all argument
+        # -- it always has to loop over the elements
+        read, write, indices = self.array_read_write(statements, variables,
+                                                     variable_indices)
+        lines = []
+        # index and read arrays (index arrays first)
+        for varname in itertools.chain(indices, read):
+            index_var = variable_indices[varname]
+            var = variables[varname]
+            lines.append('%s = %s[%s]' % (varname, self.get_array_name(var),
+                                          index_var))
+        # the actual code
+        for stmt in statements:
+            if stmt.op == ':=':
+                line = '%s = %s' % (stmt.var,
+                                    self.translate_expression(stmt.expr,
+                                                              variables,
+                                                              codeobj_class))
+            else:
+                line = self.translate_statement(stmt, variables, codeobj_class)
+            lines.append(line)
+        # write arrays
+        for varname in write:
+            index_var = variable_indices[varname]
+            var = variables[varname]
+            lines.append('%s[%s] = %s' % (self.get_array_name(var), index_var,
+                                          varname))
+        return lines
+
+    def translate_declarations(self, statements, variables, variable_indices):
+        '''
+        Return the ``cdef`` lines declaring the variables used in the code
+        lines of `translate_one_statement_sequence` for the given statements
+        (a list of `Statement` objects or a dictionary of such lists).
+        '''
+        if isinstance(statements, dict):
+            statements = list(itertools.chain(*statements.itervalues()))
+        read, write, indices = self.array_read_write(statements, variables,
+                                                     variable_indices)
+        declarations = {}
+        for varname in itertools.chain(indices, read, write):
+            declarations[varname] = cython_data_type(variables[varname].dtype)
+        for stmt in statements:
+            if stmt.op == ':=':
+                declarations.setdefault(stmt.var,
+                                        cython_data_type(stmt.dtype))
+        return ['cdef %s %s' % (c_type, varname)
+                for varname, c_type in sorted(declarations.iteritems())]
+
+    def determine_keywords(self, variables, codeobj_class):
+        # set up the functions
+        user_functions = []
+        support_code = ''
+        # Several functions can share their code (e.g. rand and randn), it
+        # is only included once
+        included_code = set()
+        for varname, variable in variables.items():
+            if isinstance(variable, Function):
+                user_functions.append((varname, variable))
+                speccode = variable.implementations[codeobj_class].code
+                if speccode is not None and id(speccode) not in included_code:
+                    included_code.add(id(speccode))
+                    support_code += '\n' + deindent(speccode.get('support_code', ''))
+
+        # delete the user-defined functions from the namespace and add the
+        # function namespaces (if any)
+        for funcname, func in user_functions:
+            del variables[funcname]
+            func_namespace = func.implementations[codeobj_class].namespace
+            if func_namespace is not None:
+                variables.update(func_namespace)
+
+        return {'support_code_lines': stripped_deindented_lines(support_code)}
+
+    def translate_statement_sequence(self, statements, variables,
+                                     variable_indices, iterate_all,
+                                     codeobj_class):
+        if isinstance(statements, dict):
+            blocks = {}
+            for name, block in statements.iteritems():
+                blocks[name] = self.translate_one_statement_sequence(block,
+                                                                     variables,
+                                                                     variable_indices,
+                                                                     iterate_all,
+                                                                     codeobj_class)
+        else:
+            blocks = self.translate_one_statement_sequence(statements, variables,
+                                                           variable_indices,
+                                                           iterate_all, codeobj_class)
+        declarations = self.translate_declarations(statements, variables,
+                                                   variable_indices)
+
+        kwds = self.determine_keywords(variables, codeobj_class)
+        kwds['declaration_lines'] = declarations
+
+        return blocks, kwds
+
+
+################################################################################
+# Implement functions
+################################################################################
+
+# Functions that exist under the same name in C (all of them are imported from
+# libc.math, except for abs which is a Cython builtin)
+for func in ['sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh', 'exp', 'log',
+             'log10', 'sqrt', 'ceil', 'floor', 'abs']:
+    DEFAULT_FUNCTIONS[func].implementations[CythonLanguage] = FunctionImplementation()
+
+# Functions that need a name translation
+for func, func_cython in [('arcsin', 'asin'), ('arccos', 'acos'),
+                          ('arctan', 'atan')]:
+    DEFAULT_FUNCTIONS[func].implementations[CythonLanguage] = FunctionImplementation(func_cython)
+
+# Functions that need to be implemented specifically
+
+# The random numbers are drawn from the counter-based Philox-4x32-10 generator
+# (see brian2.codegen.rng), for the key and execution number stored in the
+# _rng_state array
+rng_code = {'support_code': '''
+        cdef inline void _philox4x32(uint32_t *ctr, uint32_t key0, uint32_t key1):
+            cdef uint64_t p0, p1
+            cdef int _round
+            for _round in range(10):
+                p0 = <uint64_t>0xD2511F53 * ctr[0]
+                p1 = <uint64_t>0xCD9E8D57 * ctr[2]
+                ctr[0], ctr[1], ctr[2], ctr[3] = ((<uint32_t>(p1 >> 32)) ^ ctr[1] ^ key0,
+                                                  <uint32_t>p1,
+                                                  (<uint32_t>(p0 >> 32)) ^ ctr[3] ^ key1,
+                                                  <uint32_t>p0)
+                key0 += <uint32_t>0x9E3779B9
+                key1 += <uint32_t>0xBB67AE85
+
+        cdef inline void _philox_random_words(uint32_t *ctr, int64_t index, int site):
+            cdef uint64_t key = _rng_state[0]
+            cdef uint64_t execution = _rng_state[1]
+            cdef uint64_t uindex = <uint64_t>index
+            ctr[0] = <uint32_t>uindex
+            ctr[1] = <uint32_t>(uindex >> 32)
+            ctr[2] = <uint32_t>execution
+            ctr[3] = <uint32_t>(((execution >> 32) << 16) | <uint64_t>site)
+            _philox4x32(ctr, <uint32_t>key, <uint32_t>(key >> 32))
+
+        # A double in [0, 1) from 53 random bits
+        cdef inline double _philox_to_uniform(uint32_t high, uint32_t low):
+            return ((high >> 5) * 67108864.0 + (low >> 6)) * (1.0 / 9007199254740992.0)
+
+        cdef double _rand(int64_t _vectorisation_idx, int _site):
+            cdef uint32_t ctr[4]
+            _philox_random_words(ctr, _vectorisation_idx, _site)
+            return _philox_to_uniform(ctr[0], ctr[1])
+
+        # Box-Muller transform
+        cdef double _randn(int64_t _vectorisation_idx, int _site):
+            cdef uint32_t ctr[4]
+            _philox_random_words(ctr, _vectorisation_idx, _site)
+            cdef double u1 = _philox_to_uniform(ctr[0], ctr[1])
+            cdef double u2 = _philox_to_uniform(ctr[2], ctr[3])
+            return sqrt(-2.0 * log(1.0 - u1)) * cos(6.283185307179586 * u2)
+        '''}
+rng_namespace = {'_rng_state': rng.RNG_STATE}
+DEFAULT_FUNCTIONS['rand'].implementations[CythonLanguage] = FunctionImplementation('_rand',
+                                                                                   code=rng_code,
+                                                                                   namespace=rng_namespace)
+DEFAULT_FUNCTIONS['randn'].implementations[CythonLanguage] = FunctionImplementation('_randn',
+                                                                                    code=rng_code,
+                                                                                    namespace=rng_namespace)
+
+# Same semantics as numpy's mod (the result has the sign of the divisor)
+mod_code = {'support_code': '''
+        cdef inline double _mod(double x, double y):
+            cdef double result = fmod(x, y)
+            if result != 0 and ((result < 0) != (y < 0)):
+                result += y
+            return result
+        '''}
+DEFAULT_FUNCTIONS['mod'].implementations[CythonLanguage] = FunctionImplementation('_mod',
+                                                                                  code=mod_code)
+
+clip_code = {'support_code': '''
+        cdef inline double _clip(double value, double a_min, double a_max):
+            if value < a_min:
+                return a_min
+            if value > a_max:
+                return a_max
+            return value
+        '''}
+DEFAULT_FUNCTIONS['clip'].implementations[CythonLanguage] = FunctionImplementation('_clip',
+                                                                                   code=clip_code)
+
+int_code = {'support_code': '''
+        cdef inline long _int(double value):
+            return <long>value
+        '''}
+DEFAULT_FUNCTIONS['int'].implementations[CythonLanguage] = FunctionImplementation('_int',
+                                                                                  code=int_code)
@@ -0,0 +1,161 @@
+'''
+Module providing `NumexprLanguage`, a variant of `NumpyLanguage` that
+evaluates the expressions with ``numexpr``.
+'''
+import ast
+
+import numpy as np
+
+try:
+    import numexpr
+    from numexpr.expressions import functions as _numexpr_functions
+except ImportError:
+    numexpr = None
+    _numexpr_functions = {}
+
+from brian2.core.functions import DEFAULT_FUNCTIONS, Function
+from brian2.parsing.rendering import NumpyNodeRenderer
+from brian2.utils.stringtools import get_identifiers
+
+from .numpy_lang import NumpyLanguage
+
+__all__ = ['NumexprLanguage']
+
+#: The names of the `DEFAULT_FUNCTIONS` that numexpr supports (under the same
+#: name and with the same meaning)
+NUMEXPR_FUNCTIONS = set(name for name in ['sin', 'cos', 'tan', 'sinh', 'cosh',
+                                          'tanh', 'exp', 'log', 'log10',
+                                          'sqrt', 'arcsin', 'arccos',
+                                          'arctan', 'abs', 'ceil', 'floor']
+                        if name in _numexpr_functions)
+
+
+class NumexprNodeRenderer(NumpyNodeRenderer):
+    '''
+    Renders expressions in the syntax of numexpr, which uses the bitwise
+    operators for logical operations.
+    '''
+    expression_ops = NumpyNodeRenderer.expression_ops.copy()
+    expression_ops.update({
+          # Unary ops
+          'Not': '~',
+          # Bool ops
+          'And': '&',
+          'Or': '|',
+          })
+
+
+def _can_use_numexpr(expr):
+    '''
+    Whether numexpr gives the same result as numpy for an expression (given
+    that all variables are floating point values). This is not the case for
+    ``%`` (numexpr uses the sign of the dividend, numpy the sign of the
+    divisor) and divisions of integer constants (numexpr rounds towards zero,
+    Python towards negative infinity).
+    '''
+    for node in ast.walk(ast.parse(expr, mode='eval')):
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Mod):
+                return False
+            if (isinstance(node.op, (ast.Div, ast.FloorDiv)) and
+                    not any(isinstance(subnode, ast.Name)
+                            for subnode in ast.walk(node))):
+                return False
+        elif isinstance(node, ast.Call):
+            if (not isinstance(node.func, ast.Name) or
+                    node.func.id not in NUMEXPR_FUNCTIONS):
+                return False
+    return True
+
+
+class NumexprLanguage(NumpyLanguage):
+    '''
+    Numexpr language
+
+    Statements operating on arrays are evaluated with ``numexpr``, which
+    evaluates the whole expression in a single pass over blocks of the data
+    (using several threads), without allocating temporary arrays. Statements
+    that numexpr cannot evaluate (e.g. because they use functions that
+    numexpr does not know, like ``rand()`` or a `TimedArray`) are evaluated
+    with numpy, as in `NumpyLanguage`.
+    '''
+
+    language_id = 'numexpr'
+
+    def use_inplace_operations(self):
+        # numexpr does not allocate arrays for intermediate results anyway
+        return False
+
+    def translate_array_statement(self, statement, variables, codeobj_class,
+                                  arrays, dtypes):
+        lines = self.translate_numexpr_statement(statement, variables,
+                                                 codeobj_class, arrays, dtypes)
+        if lines is None:
+            lines = NumpyLanguage.translate_array_statement(self, statement,
+                                                            variables,
+                                                            codeobj_class,
+                                                            arrays, dtypes)
+        return lines
+
+    def translate_numexpr_statement(self, statement, variables, codeobj_class,
+                                    arrays, dtypes):
+        '''
+        Translate a statement into a call of ``numexpr.evaluate``. Returns
+        ``None`` if the statement cannot (or should not) be evaluated with
+        numexpr: if it does not refer to any arrays, if it only copies a
+        value or if it uses values or functions that numexpr does not support
+        (in the same way as numpy).
+        '''
+        if numexpr is None:
+            return None
+        if not (np.issubdtype(statement.dtype, np.floating) or
+                statement.dtype is bool or
+                np.issubdtype(statement.dtype, np.bool_)):
+            return None
+        identifiers = get_identifiers(statement.expr)
+        if not arrays.intersection(identifiers):
+            return None
+        names = set()
+        for varname in identifiers:
+            var = variables.get(varname, None)
+            if isinstance(var, Function):
+                if (varname not in NUMEXPR_FUNCTIONS or
+                        var is not DEFAULT_FUNCTIONS[varname]):
+                    return None
+                continue
+            if varname in dtypes:
+                dtype = dtypes[varname]
+            elif var is not None:
+                dtype = var.dtype
+            else:
+                return None
+            # Integer arithmetic follows C rules in numexpr
+            if not np.issubdtype(dtype, np.floating):
+                return None
+            names.add(varname)
+        if isinstance(ast.parse(statement.expr, mode='eval').body,
+                      (ast.Name, ast.Num)):
+            return None
+        if not _can_use_numexpr(statement.expr):
+            return None
+        expr = NumexprNodeRenderer().render_expr(statement.expr)
+        local_dict = '{%s}' % ', '.join('%r: %s' % (name, name)
+                                        for name in sorted(names))
+        if statement.op in (':=', '='):
+            return ['%s = _numexpr_evaluate(%r, local_dict=%s)' % (statement.var,
+                                                                   expr,
+                                                                   local_dict)]
+        elif statement.op in ('+=', '-=', '*=', '/='):
+            if (statement.var not in arrays or
+                    not np.issubdtype(statement.dtype, np.floating)):
+                return None
+            # Update the array in place, it might be the array storing the
+            # variable and not a copy (see translate_one_statement_sequence)
+            expr = '%s %s (%s)' % (statement.var, statement.op[0], expr)
+            local_dict = '{%s}' % ', '.join('%r: %s' % (name, name)
+                                            for name in sorted(names |
+                                                               set([statement.var])))
+            return ['_numexpr_evaluate(%r, local_dict=%s, out=%s)' % (expr,
+                                                                      local_dict,
+                                                                      statement.var)]
+        return None
@@ -1,16 +1,139 @@
+import ast
 import itertools
 
 import numpy as np
 
-from brian2.utils.stringtools import word_substitute
+from brian2.core.preferences import brian_prefs
+from brian2.utils.stringtools import word_substitute, get_identifiers
 from brian2.parsing.rendering import NumpyNodeRenderer
 from brian2.core.functions import (DEFAULT_FUNCTIONS, Function,
                                    FunctionImplementation)
 from brian2.core.variables import ArrayVariable
+from brian2.codegen import rng
 
 from .base import Language
 
-__all__ = ['NumpyLanguage']
+__all__ = ['NumpyLanguage', 'add_at']
+
+
+def add_at(array, indices, values):
+    '''
+    Add `values` to `array` at `indices`, correctly handling repeated indices
+    (i.e. equivalent to ``np.add.at(array, indices, values)``). Uses
+    `np.bincount` over the whole array if there are many indices compared to
+    the size of the array, since this is much faster in this case.
+    '''
+    if array.dtype.kind == 'f' and len(indices) > len(array) // 100:
+        weights = np.empty(len(indices))
+        weights[:] = values
+        array += np.bincount(indices, weights=weights, minlength=len(array))
+    else:
+        np.add.at(array, indices, values)
+
+
+class InplaceNodeRenderer(NumpyNodeRenderer):
+    '''
+    Renders an expression as a sequence of numpy ufunc calls that store their
+    results in preallocated buffers (via the ``out`` argument) instead of
+    allocating new arrays for all intermediate results.
+
+    Only subexpressions that refer to at least one of the given array names
+    are rendered in this way, all other subexpressions (scalar values,
+    comparisons, calls of functions that are not ufuncs, etc.) are rendered
+    as normal numpy expressions and used as arguments of the ufunc calls.
+
+    Parameters
+    ----------
+    arrays : set of str
+        The names referring to arrays.
+    ufuncs : dict
+        A mapping from function names (as used in the rendered code) to the
+        ufuncs implementing them.
+    '''
+    #: The numpy ufuncs for arithmetic operators
+    ufunc_names = {'Add': 'add',
+                   'Sub': 'subtract',
+                   'Mult': 'multiply',
+                   # Python's "/" operator is equivalent to np.divide (which
+                   # performs an integer division for integers in Python 2)
+                   'Div': 'divide',
+                   'Pow': 'power',
+                   'Mod': 'remainder',
+                   'USub': 'negative'}
+
+    def __init__(self, arrays, ufuncs):
+        self.arrays = arrays
+        self.ufuncs = ufuncs
+        self.lines = []
+        self.num_temporaries = 0
+        self.free_temporaries = []
+
+    def is_array_expression(self, node):
+        return any(isinstance(subnode, ast.Name) and subnode.id in self.arrays
+                   for subnode in ast.walk(node))
+
+    def can_render_inplace(self, node):
+        if not self.is_array_expression(node):
+            return False
+        if isinstance(node, ast.BinOp):
+            return node.op.__class__.__name__ in self.ufunc_names
+        elif isinstance(node, ast.UnaryOp):
+            return node.op.__class__.__name__ in ('USub', 'UAdd')
+        elif isinstance(node, ast.Call):
+            return (isinstance(node.func, ast.Name) and
+                    node.func.id in self.ufuncs and
+                    self.ufuncs[node.func.id].nin == len(node.args) and
+                    not node.keywords)
+        return False
+
+    def new_temporary(self):
+        if self.free_temporaries:
+            return self.free_temporaries.pop()
+        name = '_temp_%d' % self.num_temporaries
+        self.num_temporaries += 1
+        return name
+
+    def render_argument(self, node):
+        '''
+        Return the code for an argument of an ufunc call and the name of the
+        temporary buffer holding its value (or ``None``).
+        '''
+        if self.can_render_inplace(node):
+            name = self.render_inplace(node)
+            if name.startswith('_temp_'):
+                return name, name
+            return name, None
+        return NumpyNodeRenderer.render_node(self, node), None
+
+    def render_inplace(self, node, out=None):
+        '''
+        Add the ufunc calls calculating the value of ``node`` to `lines` and
+        return the name of the buffer holding the result. The result is
+        stored in ``out`` if given, otherwise in a temporary buffer.
+        '''
+        if isinstance(node, ast.UnaryOp) and node.op.__class__.__name__ == 'UAdd':
+            if out is None:
+                return self.render_argument(node.operand)[0]
+            return self.render_inplace(node.operand, out)
+        if isinstance(node, ast.BinOp):
+            ufunc = '_numpy.' + self.ufunc_names[node.op.__class__.__name__]
+            operands = [node.left, node.right]
+        elif isinstance(node, ast.UnaryOp):
+            ufunc = '_numpy.' + self.ufunc_names[node.op.__class__.__name__]
+            operands = [node.operand]
+        else:  # ast.Call
+            ufunc = node.func.id
+            operands = node.args
+        arguments = [self.render_argument(operand) for operand in operands]
+        temporaries = [temp for _, temp in arguments if temp is not None]
+        if out is None:
+            # Reuse the buffer of an argument if possible
+            out = temporaries.pop(0) if temporaries else self.new_temporary()
+        self.free_temporaries.extend(temporaries)
+        self.lines.append('%s(%s, out=%s)' % (ufunc,
+                                              ', '.join(arg for arg, _ in arguments),
+                                              out))
+        return out
 
 
 class NumpyLanguage(Language):
@@ -33,17 +156,140 @@ class NumpyLanguage(Language):
         return NumpyNodeRenderer().render_expr(expr, variables).strip()
 
     def translate_statement(self, statement, variables, codeobj_class):
-        # TODO: optimisation, translate arithmetic to a sequence of inplace
-        # operations like a=b+c -> add(b, c, a)
+        # See translate_inplace_statement for a translation into a sequence
+        # of inplace operations like a=b+c -> add(b, c, a)
         var, op, expr = statement.var, statement.op, statement.expr
         if op == ':=':
             op = '='
         return var + ' ' + op + ' ' + self.translate_expression(expr, variables,
                                                                 codeobj_class)
 
+    def use_inplace_operations(self):
+        '''
+        Whether to provide the translation using scratch buffers (see
+        `translate_inplace_statement`) to the templates.
+        '''
+        return brian_prefs['codegen.runtime.numpy.inplace_operations']
+
+    def translate_array_statement(self, statement, variables, codeobj_class,
+                                  arrays, dtypes):
+        '''
+        Translate a statement in a sequence of statements. Returns a list of
+        lines, by default only the line returned by `translate_statement`.
+        Subclasses can use a different translation for statements that
+        operate on arrays.
+
+        Parameters
+        ----------
+        statement : `Statement`
+            The statement to translate.
+        variables : dict of `Variable`
+            The variables used in the statement.
+        codeobj_class : `CodeObject`
+            The code object class (used to look up function implementations).
+        arrays : set of str
+            The names referring to arrays in the code block.
+        dtypes : dict
+            The dtypes of the variables defined by previous statements in the
+            code block.
+        '''
+        return [self.translate_statement(statement, variables, codeobj_class)]
+
+    def translate_inplace_statement(self, statement, variables, codeobj_class,
+                                    arrays, dtypes, slot):
+        '''
+        Translate a statement into a sequence of ufunc calls that store all
+        intermediate results and the result of the statement in scratch
+        buffers provided by the code object (see
+        `NumpyCodeObject.get_scratch_buffers`), instead of allocating new
+        arrays. Returns ``None`` if this is not possible, e.g. if the
+        statement does not refer to any arrays.
+
+        Parameters
+        ----------
+        statement : `Statement`
+            The statement to translate.
+        variables : dict of `Variable`
+            The variables used in the statement.
+        codeobj_class : `CodeObject`
+            The code object class (used to look up function implementations).
+        arrays : set of str
+            The names referring to arrays in the code block.
+        dtypes : dict
+            The dtypes of the variables defined by previous statements in the
+            code block.
+        slot : int
+            A unique number for the buffer storing the result of the
+            statement. The buffer is not overwritten by any other statement
+            in the code object, so the variable can be used in later
+            statements.
+        '''
+        if not np.issubdtype(statement.dtype, np.floating):
+            return None
+        identifiers = get_identifiers(statement.expr)
+        # The result buffer is requested before the expression is evaluated
+        if statement.var in identifiers:
+            return None
+        ufuncs = {}
+        for varname in identifiers:
+            var = variables.get(varname, None)
+            if isinstance(var, Function):
+                impl = var.implementations[codeobj_class]
+                if isinstance(impl.code, np.ufunc) and impl.code.nout == 1:
+                    ufuncs[impl.name or varname] = impl.code
+            elif (varname in arrays and
+                  not np.issubdtype(dtypes.get(varname, var.dtype
+                                                        if var is not None
+                                                        else None),
+                                    np.floating)):
+                # Results of integer operations would be stored in floating
+                # point buffers
+                return None
+        operands = sorted(identifiers.intersection(arrays))
+        # np.broadcast can only handle up to 32 arrays
+        if not 0 < len(operands) <= 32:
+            return None
+        expr = self.translate_expression(statement.expr, variables,
+                                         codeobj_class)
+        node = ast.parse(expr, mode='eval').body
+        renderer = InplaceNodeRenderer(arrays, ufuncs)
+        if not renderer.can_render_inplace(node):
+            return None
+        if statement.op in (':=', '='):
+            renderer.render_inplace(node, out=statement.var)
+            outputs = [statement.var]
+            keys = [repr(slot)]
+        elif statement.op in ('+=', '-=', '*=', '/='):
+            result = renderer.render_inplace(node)
+            ufunc = renderer.ufunc_names[{'+=': 'Add', '-=': 'Sub',
+                                          '*=': 'Mult',
+                                          '/=': 'Div'}[statement.op]]
+            renderer.lines.append('_numpy.%s(%s, %s, out=%s)' % (ufunc,
+                                                                statement.var,
+                                                                result,
+                                                                statement.var))
+            outputs = []
+            keys = []
+        else:
+            return None
+        # The temporary buffers are shared between all statements
+        temporaries = ['_temp_%d' % idx
+                       for idx in xrange(renderer.num_temporaries)]
+        outputs.extend(temporaries)
+        keys.extend(repr(temp) for temp in temporaries)
+        line = '%s = _scratch_buffers((%s, ), %s)' % (', '.join(outputs) + ',',
+                                                      ', '.join(keys),
+                                                      ', '.join(operands))
+        return [line] + renderer.lines
+
     def translate_one_statement_sequence(self, statements, variables,
                                          variable_indices, iterate_all,
-                                         codeobj_class):
+                                         codeobj_class, slots=None):
+        '''
+        Translate a sequence of statements. If ``slots`` (an iterator over
+        unique numbers for scratch buffers) is given, statements are
+        translated with `translate_inplace_statement` whenever possible.
+        '''
         read, write, indices = self.array_read_write(statements, variables,
                                             variable_indices)
         lines = []
@@ -56,8 +302,24 @@ class NumpyLanguage(Language):
                 line = line + '[' + index + ']'
             lines.append(line)
         # the actual code
-        lines.extend([self.translate_statement(stmt, variables, codeobj_class)
-                      for stmt in statements])
+        arrays = set(varname for varname in read
+                     if not getattr(variables[varname], 'scalar', False))
+        dtypes = {}
+        for stmt in statements:
+            stmt_lines = None
+            if slots is not None:
+                stmt_lines = self.translate_inplace_statement(stmt, variables,
+                                                              codeobj_class,
+                                                              arrays, dtypes,
+                                                              next(slots))
+            if stmt_lines is None:
+                stmt_lines = self.translate_array_statement(stmt, variables,
+                                                            codeobj_class,
+                                                            arrays, dtypes)
+            lines.extend(stmt_lines)
+            if arrays.intersection(get_identifiers(stmt.expr)):
+                arrays.add(stmt.var)
+            dtypes[stmt.var] = stmt.dtype
         # write arrays
         for varname in write:
             var = variables[varname]
@@ -81,35 +343,140 @@ class NumpyLanguage(Language):
                 line = line + ' = ' + varname
                 lines.append(line)
 
-        # Make sure we do not use the __call__ function of Function objects but
-        # rather the Python function stored internally. The __call__ function
-        # would otherwise return values with units
-        for varname, var in variables.iteritems():
-            if isinstance(var, Function):
-                variables[varname] = var.implementations[codeobj_class].code
+        return lines
+
+    def translate_accumulation_sequence(self, statements, variables,
+                                        variable_indices, iterate_all,
+                                        codeobj_class):
+        '''
+        Translate a sequence of statements where all variables that are
+        accessed with an index that might contain repeated values (i.e. any
+        index apart from ``_idx`` and the indices in `iterate_all`) are only
+        changed via accumulation (``+=`` or ``-=``) and not read otherwise. In
+        this case, the order in which the statements are applied to the
+        repeated indices does not matter and the accumulation can be done for
+        all indices at once with `add_at`.
+
+        Returns
+        -------
+        lines : list of str or None
+            The lines of code, or ``None`` if the statements do not have the
+            required form.
+        '''
+        if not hasattr(np.add, 'at'):  # numpy < 1.8
+            return None
+        read, write, indices = self.array_read_write(statements, variables,
+                                                     variable_indices)
+        accumulated = set(varname for varname in write
+                          if variable_indices[varname] != '_idx' and
+                          not variable_indices[varname] in iterate_all)
+        if not accumulated:
+            return None
+        for stmt in statements:
+            if stmt.var in accumulated and stmt.op not in ('+=', '-='):
+                return None
+            if accumulated.intersection(get_identifiers(stmt.expr)):
+                return None
+
+        lines = []
+        # index and read arrays (index arrays first), the accumulated
+        # variables are never read
+        for varname in itertools.chain(indices, read - accumulated):
+            var = variables[varname]
+            index = variable_indices[varname]
+            line = varname + ' = ' + self.get_array_name(var)
+            if not index in iterate_all:
+                line = line + '[' + index + ']'
+            lines.append(line)
+        # the actual code
+        for stmt in statements:
+            if stmt.var in accumulated:
+                expr = self.translate_expression(stmt.expr, variables,
+                                                 codeobj_class)
+                if stmt.op == '-=':
+                    expr = '-(' + expr + ')'
+                lines.append('_add_at({array}, {index}, {expr})'.format(
+                    array=self.get_array_name(variables[stmt.var]),
+                    index=variable_indices[stmt.var],
+                    expr=expr))
+            else:
+                lines.append(self.translate_statement(stmt, variables,
+                                                      codeobj_class))
+        # write the other arrays
+        for varname in write - accumulated:
+            var = variables[varname]
+            index_var = variable_indices[varname]
+            line = self.get_array_name(var)
+            if index_var in iterate_all:
+                line = line + '[:]'
+            else:
+                line = line + '[' + index_var + ']'
+            lines.append(line + ' = ' + varname)
 
         return lines
 
     def translate_statement_sequence(self, statements, variables,
                                      variable_indices, iterate_all,
                                      codeobj_class):
-        # For numpy, no addiional keywords are provided to the template
+        # For numpy, the additional keywords provided to the template are an
+        # alternative translation of accumulating statements (only used in
+        # the synapses template to avoid looping over repeated indices) and
+        # a translation using scratch buffers (only used in templates where
+        # the values of the variables are not needed after the code object
+        # finished, e.g. the state update)
         kwds = {}
+        if self.use_inplace_operations():
+            slots = itertools.count()
+        else:
+            slots = None
 
         if isinstance(statements, dict):
             blocks = {}
+            inplace_blocks = {}
             for name, block in statements.iteritems():
                 blocks[name] = self.translate_one_statement_sequence(block,
                                                                      variables,
                                                                      variable_indices,
                                                                      iterate_all,
                                                                      codeobj_class)
-            return blocks, kwds
+                if slots is not None:
+                    inplace_blocks[name] = self.translate_one_statement_sequence(block,
+                                                                                 variables,
+                                                                                 variable_indices,
+                                                                                 iterate_all,
+                                                                                 codeobj_class,
+                                                                                 slots)
+            result = blocks
         else:
-            block = self.translate_one_statement_sequence(statements, variables,
-                                                          variable_indices,
-                                                          iterate_all, codeobj_class)
-            return block, kwds
+            kwds['accumulation_lines'] = self.translate_accumulation_sequence(statements,
+                                                                              variables,
+                                                                              variable_indices,
+                                                                              iterate_all,
+                                                                              codeobj_class)
+            result = self.translate_one_statement_sequence(statements, variables,
+                                                           variable_indices,
+                                                           iterate_all, codeobj_class)
+            if slots is not None:
+                inplace_blocks = self.translate_one_statement_sequence(statements,
+                                                                       variables,
+                                                                       variable_indices,
+                                                                       iterate_all,
+                                                                       codeobj_class,
+                                                                       slots)
+        kwds['inplace_lines'] = inplace_blocks if slots is not None else None
+
+        # Make sure we do not use the __call__ function of Function objects but
+        # rather the Python function stored internally. The __call__ function
+        # would otherwise return values with units. Also add the function
+        # namespaces (if any)
+        for varname, var in variables.items():
+            if isinstance(var, Function):
+                impl = var.implementations[codeobj_class]
+                variables[varname] = impl.code
+                if impl.namespace is not None:
+                    variables.update(impl.namespace)
+
+        return result, kwds
 
 ################################################################################
 # Implement functions
@@ -125,23 +492,54 @@ for func_name, func in [('sin', np.sin), ('cos', np.cos), ('tan', np.tan),
     DEFAULT_FUNCTIONS[func_name].implementations[NumpyLanguage] = FunctionImplementation(code=func)
 
 # Functions that are implemented in a somewhat special way
-def randn_func(vectorisation_idx):
+def _vectorisation_indices(vectorisation_idx):
+    '''
+    The indices of the values to generate for `vectorisation_idx`, which is
+    either the number of values, a boolean array selecting the values or an
+    array of indices (possibly multi-dimensional).
+    '''
+    if isinstance(vectorisation_idx, np.ndarray):
+        if vectorisation_idx.dtype == np.bool_:
+            return np.flatnonzero(vectorisation_idx)
+        return vectorisation_idx
     try:
-        N = int(vectorisation_idx)
+        return np.arange(int(vectorisation_idx))
     except (TypeError, ValueError):
-        N = len(vectorisation_idx)
-
-    return np.random.randn(N)
+        return np.asarray(vectorisation_idx)
 
-def rand_func(vectorisation_idx):
+def _vectorisation_shape(vectorisation_idx):
+    '''
+    The shape of the values to generate for `vectorisation_idx` (see
+    `_vectorisation_indices`).
+    '''
+    if isinstance(vectorisation_idx, np.ndarray) and vectorisation_idx.ndim > 0:
+        if vectorisation_idx.dtype == np.bool_:
+            return np.count_nonzero(vectorisation_idx)
+        return vectorisation_idx.shape
     try:
-        N = int(vectorisation_idx)
+        return int(vectorisation_idx)
     except (TypeError, ValueError):
-        N = len(vectorisation_idx)
+        return len(vectorisation_idx)
+
+# The random numbers are drawn from numpy's generator or, with the
+# codegen.runtime.numpy.counter_based_random preference, from the
+# counter-based generator used by the other targets (see brian2.codegen.rng).
+# The call site is added during the translation
+def randn_func(vectorisation_idx, site):
+    if brian_prefs['codegen.runtime.numpy.counter_based_random']:
+        return rng.normal(_vectorisation_indices(vectorisation_idx), site)
+    return np.random.standard_normal(_vectorisation_shape(vectorisation_idx))
 
-    return np.random.rand(N)
-DEFAULT_FUNCTIONS['randn'].implementations[NumpyLanguage] = FunctionImplementation(code=randn_func)
-DEFAULT_FUNCTIONS['rand'].implementations[NumpyLanguage] = FunctionImplementation(code=rand_func)
+def rand_func(vectorisation_idx, site):
+    if brian_prefs['codegen.runtime.numpy.counter_based_random']:
+        return rng.uniform(_vectorisation_indices(vectorisation_idx), site)
+    return np.random.random_sample(_vectorisation_shape(vectorisation_idx))
+# The namespace marks the code objects that draw random numbers
+_rng_namespace = {'_rng_state': rng.RNG_STATE}
+DEFAULT_FUNCTIONS['randn'].implementations[NumpyLanguage] = FunctionImplementation(code=randn_func,
+                                                                                   namespace=_rng_namespace)
+DEFAULT_FUNCTIONS['rand'].implementations[NumpyLanguage] = FunctionImplementation(code=rand_func,
+                                                                                  namespace=_rng_namespace)
 clip_func = lambda array, a_min, a_max: np.clip(array, a_min, a_max)
 DEFAULT_FUNCTIONS['clip'].implementations[NumpyLanguage] = FunctionImplementation(code=clip_func)
 int_func = lambda value: np.int_(value)
@@ -0,0 +1,223 @@
+'''
+Module providing the counter-based random number generator that implements
+the ``rand()`` and ``randn()`` functions for the code generation targets.
+
+Random numbers are generated with the Philox-4x32-10 generator (Salmon et
+al., "Parallel random numbers: as easy as 1, 2, 3", 2011). Instead of
+advancing an internal state, it encrypts a counter with a key, every random
+number is therefore a function of:
+
+* the seed (the key of the generator, see `seed`),
+* the index of the element (e.g. the neuron or synapse) it is drawn for,
+* the call site, i.e. the number of the ``rand()`` or ``randn()`` call in the
+  code of a code object (see `add_random_call_sites`), and
+* the execution, a counter that is increased every time a code object that
+  draws random numbers is run (i.e. once per time step for a state updater).
+
+Random numbers can therefore be drawn in any order and in parallel without
+any shared state, and all targets draw the same numbers for the same seed.
+The C++ (``cpp_lang``) and Cython (``cython_lang``) implementations use the
+same scheme. The numpy target (and the numexpr target, which evaluates random
+numbers with numpy) only uses this generator if the
+`codegen.runtime.numpy.counter_based_random` preference is set, by default
+it uses numpy's generator, which is faster.
+'''
+import os
+import struct
+import sys
+
+import numpy as np
+
+__all__ = ['seed']
+
+#: The state shared by all runtime code objects: the key (the seed) and the
+#: number of the current execution (see `next_execution`)
+RNG_STATE = np.zeros(2, dtype=np.uint64)
+
+# Constants of the Philox-4x32 generator
+_M0 = np.uint64(0xD2511F53)
+_M1 = np.uint64(0xCD9E8D57)
+_W0 = 0x9E3779B9
+_W1 = 0xBB67AE85
+_MASK = 0xFFFFFFFF
+# The positions of the high and the low word in a 64 bit integer viewed as two
+# 32 bit ones
+_HIGH = 1 if sys.byteorder == 'little' else 0
+_LOW = 1 - _HIGH
+
+#: The number of random numbers generated at once by the numpy
+#: implementation, the buffers for the intermediate values (about 50 bytes
+#: per random number) should fit into the CPU cache
+_CHUNK_SIZE = 16384
+
+
+def _random_key():
+    return struct.unpack('<Q', os.urandom(8))[0]
+
+
+def seed(seed=None):
+    '''
+    Set the seed for the random numbers drawn by ``rand()`` and ``randn()``
+    in the runtime targets (numpy, weave and Cython) and for numpy's random
+    number generator, which is used by the numpy target (unless the
+    `codegen.runtime.numpy.counter_based_random` preference is set) and
+    internally (e.g. when creating synapses with the numpy target). Also
+    resets the execution counter, a simulation script that calls ``seed``
+    with a fixed value at the beginning therefore uses the same random
+    numbers in every run (and for every target, apart from the differences
+    between numpy's and the counter-based generator).
+
+    Parameters
+    ----------
+    seed : int, optional
+        The seed, an integer between 0 and 2**64-1. If not given, a seed is
+        taken from the operating system's source of randomness.
+
+    Notes
+    -----
+    For standalone projects, the seed is set via the ``seed`` argument of
+    `build`.
+    '''
+    if seed is None:
+        key = _random_key()
+    else:
+        key = int(seed)
+        if not 0 <= key < 2**64:
+            raise ValueError('The seed has to be between 0 and 2**64-1.')
+    RNG_STATE[0] = key
+    RNG_STATE[1] = 0
+    np.random.seed(None if seed is None else key % 2**32)
+
+
+def next_execution():
+    '''
+    Start a new execution, has to be called every time before a code object
+    that draws random numbers is run.
+    '''
+    RNG_STATE[1] = int(RNG_STATE[1]) + 1
+
+
+def _philox(c0, c1, c2, c3, k0, k1, products):
+    '''
+    The Philox-4x32-10 function for arrays of 32 bit integers. `c0` and `c2`
+    have to be contiguous ``numpy.uint32`` arrays, they are overwritten.
+    `products` is a buffer of shape ``(2, 2, n)`` for the 64 bit products,
+    the rounds alternate between its two halves so that the low words of a
+    round's products can be used in the next round without copying them. No
+    other arrays are allocated. Returns the four words of the result, the
+    second and the fourth word are views of `products`.
+    '''
+    for i in xrange(10):
+        p0, p1 = products[i % 2]
+        np.multiply(c0, _M0, out=p0, dtype=np.uint64)
+        np.multiply(c2, _M1, out=p1, dtype=np.uint64)
+        words0 = p0.view(np.uint32)
+        words1 = p1.view(np.uint32)
+        # c0, c1, c2, c3 = hi1 ^ c1 ^ k0, lo1, hi0 ^ c3 ^ k1, lo0
+        np.bitwise_xor(words1[_HIGH::2], c1, out=c0)
+        c0 ^= np.uint32(k0)
+        np.bitwise_xor(words0[_HIGH::2], c3, out=c2)
+        c2 ^= np.uint32(k1)
+        c1 = words1[_LOW::2]
+        c3 = words0[_LOW::2]
+        k0 = (k0 + _W0) & _MASK
+        k1 = (k1 + _W1) & _MASK
+    return c0, c1, c2, c3
+
+
+def philox4x32(c0, c1, c2, c3, k0, k1):
+    '''
+    The Philox-4x32-10 function for the counter ``(c0, c1, c2, c3)`` and the
+    key ``(k0, k1)``. The counter values can be integers or arrays of 32 bit
+    integers, all of them are broadcasted against each other. Returns the four
+    words of the result (``numpy.uint32`` arrays of the broadcasted shape).
+    '''
+    counters = np.broadcast_arrays(*[np.asarray(c, dtype=np.uint32)
+                                     for c in (c0, c1, c2, c3)])
+    shape = counters[0].shape
+    counters = [np.array(c.ravel()) for c in counters]
+    products = np.empty((2, 2, counters[0].size), dtype=np.uint64)
+    words = _philox(*(counters + [int(k0), int(k1), products]))
+    return tuple(w.reshape(shape) for w in words)
+
+
+def _random_words(indices, site):
+    '''
+    Apply the generator to the counters for an array of indices at a call
+    site in the current execution (see `RNG_STATE`). The indices are handled
+    in chunks of `_CHUNK_SIZE` elements: for each chunk, the start and the
+    end of the chunk in the flattened indices and the four words of the
+    result are yielded. The words are stored in buffers that are overwritten
+    for the next chunk.
+    '''
+    key, execution = int(RNG_STATE[0]), int(RNG_STATE[1])
+    indices = np.asarray(indices).ravel()
+    c2 = execution & _MASK
+    c3 = ((execution >> 32) << 16 | site) & _MASK
+    size = min(len(indices), _CHUNK_SIZE)
+    counters = np.empty((4, size), dtype=np.uint32)
+    products = np.empty((2, 2, size), dtype=np.uint64)
+    for start in xrange(0, len(indices), _CHUNK_SIZE):
+        end = min(start + _CHUNK_SIZE, len(indices))
+        chunk_counters = counters[:, :end - start]
+        # The low and the high word of the indices
+        chunk_counters[0] = indices[start:end]
+        np.right_shift(indices[start:end], 32, out=chunk_counters[1],
+                       casting='unsafe')
+        chunk_counters[2] = c2
+        chunk_counters[3] = c3
+        words = _philox(*(list(chunk_counters) +
+                          [key & _MASK, key >> 32, products[:, :, :end - start]]))
+        yield start, end, words
+
+
+def _to_uniform(high, low, out):
+    '''
+    Store doubles in [0, 1) made from 53 random bits of the words `high` and
+    `low` in `out`. Overwrites `high` and `low`.
+    '''
+    high >>= np.uint32(5)
+    low >>= np.uint32(6)
+    # Exact, the values are smaller than 2**53
+    np.multiply(high, 67108864.0, out=out)
+    out += low
+    out *= 1.0 / 9007199254740992.0
+
+
+def uniform(indices, site):
+    '''
+    Uniformly distributed random numbers in [0, 1) for an array of indices
+    at a call site.
+    '''
+    values = np.empty(np.shape(indices))
+    flat_values = values.reshape(-1)
+    for start, end, words in _random_words(indices, site):
+        _to_uniform(words[0], words[1], flat_values[start:end])
+    return values
+
+
+def normal(indices, site):
+    '''
+    Normally distributed random numbers for an array of indices at a call
+    site, using the Box-Muller transform.
+    '''
+    values = np.empty(np.shape(indices))
+    flat_values = values.reshape(-1)
+    uniforms = np.empty((2, min(values.size, _CHUNK_SIZE)))
+    for start, end, words in _random_words(indices, site):
+        u1, u2 = uniforms[:, :end - start]
+        _to_uniform(words[0], words[1], u1)
+        _to_uniform(words[2], words[3], u2)
+        # sqrt(-2*log(1 - u1)) * cos(2*pi*u2)
+        np.subtract(1.0, u1, out=u1)
+        np.log(u1, out=u1)
+        u1 *= -2.0
+        np.sqrt(u1, out=u1)
+        u2 *= 6.283185307179586
+        np.cos(u2, out=u2)
+        np.multiply(u1, u2, out=flat_values[start:end])
+    return values
+
+
+# Start with a random seed
+RNG_STATE[0] = _random_key()
@@ -4,3 +4,5 @@ Runtime targets for code generation.
 
 from .numpy_rt import *
 from .weave_rt import *
+from .numexpr_rt import *
+from .cython_rt import *
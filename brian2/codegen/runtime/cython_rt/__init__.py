@@ -0,0 +1,12 @@
+'''
+Runtime code generation via Cython.
+
+Compiled code is stored as extension modules in a cache directory, use
+`cython_rt.get_cache_statistics` and `cython_rt.clear_cache` to inspect and
+clear this cache.
+
+Preferences
+--------------------
+.. document_brian_prefs:: codegen.runtime.cython
+'''
+from .cython_rt import *
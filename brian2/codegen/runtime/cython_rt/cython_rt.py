@@ -0,0 +1,464 @@
+'''
+Module providing `CythonCodeObject`.
+'''
+import os
+import shutil
+import hashlib
+import tempfile
+from distutils import log
+from distutils.core import Distribution, Extension
+from distutils.command.build_ext import build_ext
+
+import numpy
+
+try:
+    import Cython
+    from Cython.Build import cythonize
+except ImportError:
+    Cython = None
+
+from brian2.core.variables import (Variable, DynamicArrayVariable,
+                                   ArrayVariable, AttributeVariable)
+from brian2.core.preferences import brian_prefs, BrianPreference
+from brian2.utils.stringtools import indent, deindent, get_identifiers
+
+from ...codeobject import CodeObject, defer_compilation
+from ... import rng
+from ...templates import Templater
+from ...languages.cython_lang import CythonLanguage, cython_data_type
+from ...targets import codegen_targets
+from ..weave_rt.weave_rt import _evict_modules, _module_filename, _load_module
+
+__all__ = ['CythonCodeObject']
+
+# Preferences
+brian_prefs.register_preferences(
+    'codegen.runtime.cython',
+    'Cython runtime codegen preferences',
+    extra_compile_args = BrianPreference(
+        default=['-w', '-O3', '-ffast-math'],
+        docs='''
+        Extra compile arguments to pass to the C compiler
+        '''
+        ),
+    include_dirs = BrianPreference(
+        default=[],
+        docs='''
+        Include directories to use.
+        '''
+        ),
+    cache_directory = BrianPreference(
+        default=os.path.join(os.path.expanduser('~'), '.brian', 'cython_cache'),
+        docs='''
+        The directory where compiled extension modules are stored. The name
+        of a module is based on a hash of its source code and the compiler
+        settings, a module is only compiled once and then reused by all code
+        objects (also in later processes) with the same code.
+        '''
+        ),
+    cache_size_limit = BrianPreference(
+        default=500,
+        docs='''
+        The maximum total size (in megabytes) of the files in the
+        `codegen.runtime.cython.cache_directory`. If the size is exceeded
+        after compiling a new module, the least recently used modules are
+        deleted.
+        ''',
+        validator=lambda value: value > 0
+        )
+    )
+
+#: The compiled modules that have been used in this process, stored with
+#: their hash as the key
+_compiled_modules = {}
+
+#: Statistics about the use of the module cache
+_cache_statistics = {'memory_hits': 0, 'disk_hits': 0, 'compilations': 0,
+                     'evictions': 0}
+
+
+def get_cache_statistics():
+    '''
+    Return statistics about the use of the Cython module cache (see
+    `codegen.runtime.cython.cache_directory`) in the current process.
+
+    Returns
+    -------
+    statistics : dict
+        A dictionary with the number of code objects for which an
+        already loaded module could be reused (``'memory_hits'``), a compiled
+        module was loaded from the cache directory (``'disk_hits'``) or a new
+        module had to be compiled (``'compilations'``), and the number of
+        modules that were deleted from the cache directory
+        (``'evictions'``).
+    '''
+    return dict(_cache_statistics)
+
+
+def clear_cache():
+    '''
+    Delete all modules from the cache directory (see
+    `codegen.runtime.cython.cache_directory`) and reset the cache statistics.
+    Modules that are already loaded can still be used.
+    '''
+    cache_dir = brian_prefs['codegen.runtime.cython.cache_directory']
+    if os.path.isdir(cache_dir):
+        for fname in os.listdir(cache_dir):
+            if fname.startswith('brian_cython_'):
+                os.remove(os.path.join(cache_dir, fname))
+    for key in _cache_statistics:
+        _cache_statistics[key] = 0
+
+
+#: The beginning of every generated module
+_module_header = '''
+#cython: language_level=2, boundscheck=False, wraparound=False
+#cython: cdivision=True, initializedcheck=False
+from libc.math cimport (sin, cos, tan, sinh, cosh, tanh, exp, log, log10,
+                        sqrt, ceil, floor, asin, acos, atan, fmod)
+from libc.stdint cimport (int8_t, int16_t, int32_t, int64_t, uint8_t,
+                          uint16_t, uint32_t, uint64_t)
+import numpy as _numpy
+
+cdef object _as_buffer(array):
+    # Boolean arrays are accessed as arrays of unsigned char
+    if array.dtype == _numpy.bool_:
+        return array.view(_numpy.uint8)
+    return array
+'''
+
+
+def _argument_declaration(name, value):
+    '''
+    Return the declaration of a function argument `name` (with the type
+    corresponding to `value`) in the generated module. Arrays are passed as
+    typed memoryviews.
+    '''
+    if isinstance(value, numpy.ndarray) and value.ndim > 0:
+        return '%s[%s] %s' % (cython_data_type(value.dtype.type,
+                                               memoryview=True),
+                              ', '.join([':'] * value.ndim), name)
+    elif isinstance(value, (bool, numpy.bool_)):
+        return 'bint ' + name
+    elif isinstance(value, (int, long, numpy.integer)):
+        return 'long ' + name
+    elif isinstance(value, (float, numpy.floating)):
+        return 'double ' + name
+    else:
+        return 'object ' + name
+
+
+def _argument_value(value):
+    '''
+    Convert `value` into the form expected by the generated module: boolean
+    arrays are passed as arrays of ``numpy.uint8`` (without copying).
+    '''
+    if isinstance(value, numpy.ndarray) and value.dtype == numpy.bool_:
+        return value.view(numpy.uint8)
+    return value
+
+
+class CythonCodeObject(CodeObject):
+    '''
+    Cython code object
+
+    The ``code`` should be a `~brian2.codegen.languages.templates.MultiTemplate`
+    object with two macros defined, ``main`` (for the body of the function
+    running the code) and ``support_code`` for any support code (e.g.
+    function definitions). The code is compiled into an extension module,
+    stored in the `codegen.runtime.cython.cache_directory` under a name
+    based on a hash of its source. Arrays are accessed via typed memoryviews
+    (i.e. directly in the memory of the numpy arrays or `DynamicArray`
+    objects). The values in the namespace are stored in global variables of
+    the module, they are only set again when an array has been reallocated.
+    Only the values that change every time step (e.g. ``t``) are passed as
+    arguments to the compiled function.
+    '''
+    templater = Templater('brian2.codegen.runtime.cython_rt',
+                          env_globals={'cython_data_type': cython_data_type,
+                                       'dtype': numpy.dtype})
+    language = CythonLanguage()
+    class_name = 'cython'
+
+    def __init__(self, owner, code, variables, name='cython_code_object*'):
+        if Cython is None:
+            raise ImportError('The cython target needs the Cython package.')
+        from brian2.devices.device import get_device
+        self.device = get_device()
+        self.namespace = {'_owner': owner}
+        super(CythonCodeObject, self).__init__(owner, code, variables,
+                                               name=name)
+        self.extra_compile_args = brian_prefs['codegen.runtime.cython.extra_compile_args']
+        self.include_dirs = brian_prefs['codegen.runtime.cython.include_dirs']
+        self.python_code_namespace = {'_owner': owner}
+        self._awaiting_build = False
+        # Identifies the values bound to the global variables of a module
+        # (see run), the same module can be used by several code objects
+        self._binding_token = object()
+        self.variables_to_namespace()
+
+    def variables_to_namespace(self):
+
+        # Variables can refer to values that are either constant (e.g. dt)
+        # or change every timestep (e.g. t). We add the values of the
+        # constant variables here and add the names of non-constant variables
+        # to a list
+
+        # A list containing tuples of name and a function giving the value
+        self.nonconstant_values = []
+        # A list containing tuples of the name of the array and of its size,
+        # the variable and the DynamicArray object for all dynamic arrays
+        self.dynamic_arrays = []
+
+        for name, var in self.variables.iteritems():
+
+            try:
+                value = var.get_value()
+            except (TypeError, AttributeError):
+                # A dummy Variable without value, a function or a Subexpression
+                self.namespace[name] = var
+                continue
+
+            if isinstance(var, ArrayVariable):
+                self.namespace[self.device.get_array_name(var)] = value
+                self.namespace['_num'+name] = var.size
+            else:
+                self.namespace[name] = value
+
+            if isinstance(var, DynamicArrayVariable):
+                dyn_array_name = self.language.get_array_name(var,
+                                                              access_data=False)
+                dyn_array = self.device.get_value(var, access_data=False)
+                self.namespace[dyn_array_name] = dyn_array
+                self.dynamic_arrays.append((self.device.get_array_name(var),
+                                            '_num'+name, var, dyn_array))
+
+            # Non-constant AttributeVariables (e.g. "t") have to be injected
+            # into the namespace with their current value at each time step.
+            # Dynamic arrays (e.g. the structures used in monitors) only have
+            # to be updated when they have been resized (see update_namespace)
+            if isinstance(var, AttributeVariable) and not var.constant:
+                self.nonconstant_values.append((name, var.get_value))
+                if not var.scalar:
+                    self.nonconstant_values.append(('_num'+name, var.get_len))
+
+        #: The `DynamicArray.generation` of the dynamic arrays for the values
+        #: in the namespace
+        self.dynamic_array_generations = [dyn_array.generation
+                                          for _, _, _, dyn_array
+                                          in self.dynamic_arrays]
+
+    def update_namespace(self):
+        # update the values of the non-constant values in the namespace and
+        # in the arguments of the compiled function
+        for name, func in self.nonconstant_values:
+            self._set_value(name, func())
+        # the values of dynamic arrays only change if they have been resized
+        generations = self.dynamic_array_generations
+        for index, (name, num_name, var, dyn_array) in enumerate(self.dynamic_arrays):
+            if dyn_array.generation != generations[index]:
+                generations[index] = dyn_array.generation
+                self._set_value(name, dyn_array.data)
+                self._set_value(num_name, var.get_len())
+        if self.draws_random_numbers:
+            rng.next_execution()
+
+    def _set_value(self, name, value):
+        self.namespace[name] = value
+        index = self.argument_indices.get(name, None)
+        if index is not None:
+            self.arguments[index] = _argument_value(value)
+        elif name in self.bound_names and self.module is not None:
+            # The global variables have to be set again before the next call
+            self.module._binding_token = None
+
+    def __call__(self, **kwds):
+        self.update_namespace()
+        for name, value in kwds.iteritems():
+            self._set_value(name, value)
+        return self.run()
+
+    def _argument_names(self):
+        # The values in the namespace that are used in the code. The values
+        # that change every time step (and are not used in the support code)
+        # are passed to the main function, all others are stored in global
+        # variables of the module.
+        main_identifiers = get_identifiers(self.code.main)
+        support_identifiers = get_identifiers(self.code.support_code)
+        changing = set(name for name, _ in self.nonconstant_values)
+        names = [name for name, value in sorted(self.namespace.iteritems())
+                 if not isinstance(value, Variable) and
+                 (name in main_identifiers or name in support_identifiers)]
+        argument_names = [name for name in names
+                          if name in changing and
+                          name not in support_identifiers]
+        bound_names = [name for name in names if name not in argument_names]
+        return argument_names, bound_names
+
+    def module_source(self):
+        '''
+        Return the source code of the extension module. The module provides
+        a ``_bind`` function that sets the module-level variables for the
+        values of the namespace and a ``main`` function that takes the values
+        that change every time step as (typed) positional arguments.
+        '''
+        # The values used in the support code are stored under their own
+        # name, all other values are copied from the module-level variables
+        # into local variables of the main function (access to module-level
+        # memoryviews in loops is considerably slower)
+        support_identifiers = get_identifiers(self.code.support_code)
+        global_names = dict((name, name if name in support_identifiers
+                                   else '_bound_' + name)
+                            for name in self.bound_names)
+        bound_values = dict((name, _argument_value(self.namespace[name]))
+                            for name in self.bound_names)
+        lines = [deindent(_module_header), self.code.support_code]
+        if self.bound_names:
+            # Module-level variables, set by the _bind function
+            lines.extend('cdef ' + _argument_declaration(global_names[name],
+                                                         bound_values[name])
+                         for name in self.bound_names)
+            declarations = [_argument_declaration('_' + name + '_value',
+                                                  bound_values[name])
+                            for name in self.bound_names]
+            lines.append('def _bind(%s):' % ', '.join(declarations))
+            lines.append('    global ' + ', '.join(global_names[name]
+                                                   for name in self.bound_names))
+            lines.extend('    %s = _%s_value' % (global_names[name], name)
+                         for name in self.bound_names)
+        declarations = [_argument_declaration(name, value)
+                        for name, value in zip(self.argument_names,
+                                               self.arguments)]
+        lines.append('def main(%s):' % ', '.join(declarations))
+        lines.extend('    cdef %s = %s' % (_argument_declaration(name,
+                                                                  bound_values[name]),
+                                            global_names[name])
+                     for name in self.bound_names
+                     if global_names[name] != name)
+        lines.append(indent(deindent(self.code.main)))
+        return '\n'.join(lines) + '\n'
+
+    def compile(self):
+        CodeObject.compile(self)
+        if hasattr(self.code, 'python_pre'):
+            self.compiled_python_pre = compile(self.code.python_pre, '(string)', 'exec')
+        if hasattr(self.code, 'python_post'):
+            self.compiled_python_post = compile(self.code.python_post, '(string)', 'exec')
+        self.module = None
+        self.argument_names, self.bound_names = self._argument_names()
+        # Only the values used in the code have to be updated in every time
+        # step, and only the dynamic arrays used in the code have to be
+        # checked for resizes (see update_namespace)
+        used_names = set(self.argument_names + self.bound_names)
+        self.nonconstant_values = [(name, func) for name, func
+                                   in self.nonconstant_values
+                                   if name in used_names]
+        used_arrays = [(entry, generation) for entry, generation
+                       in zip(self.dynamic_arrays,
+                              self.dynamic_array_generations)
+                       if entry[0] in used_names or entry[1] in used_names]
+        self.dynamic_arrays = [entry for entry, _ in used_arrays]
+        self.dynamic_array_generations = [generation for _, generation
+                                          in used_arrays]
+        self.argument_indices = dict((name, index) for index, name
+                                     in enumerate(self.argument_names))
+        self.arguments = [_argument_value(self.namespace[name])
+                          for name in self.argument_names]
+        if not self.code.main.strip():
+            # Nothing to compile, e.g. for the code objects that only run
+            # Python code to push spikes
+            self.extension_key = None
+            return
+        self.source = self.module_source()
+        self.extension_key = hashlib.sha1('\n'.join([self.source,
+                                                     repr((self.extra_compile_args,
+                                                           self.include_dirs)),
+                                                     Cython.__version__,
+                                                     numpy.__version__])).hexdigest()
+        self.module = self.load_extension()
+        if self.module is None:
+            self._awaiting_build = True
+            if not defer_compilation(self, self.extension_key):
+                self.build()
+                self.module = self.load_extension()
+
+    def load_extension(self):
+        '''
+        Return the compiled module for this code object or ``None`` if the
+        code has not been compiled yet. Code objects with the same source code
+        (and compiler settings) reuse the same module.
+        '''
+        key = self.extension_key
+        if key in _compiled_modules:
+            _cache_statistics['memory_hits'] += 1
+            self._awaiting_build = False
+            return _compiled_modules[key]
+
+        module_name = 'brian_cython_' + key
+        cache_dir = brian_prefs['codegen.runtime.cython.cache_directory']
+        module = _load_module(module_name, cache_dir)
+        if module is None:
+            return None
+        if self._awaiting_build:
+            # The module has been built for this code object
+            self._awaiting_build = False
+            _cache_statistics['compilations'] += 1
+            size_limit = brian_prefs['codegen.runtime.cython.cache_size_limit']
+            loaded = set('brian_cython_' + k for k in _compiled_modules)
+            loaded.add(module_name)
+            _cache_statistics['evictions'] += _evict_modules(cache_dir,
+                                                             size_limit*1024*1024,
+                                                             keep=loaded,
+                                                             prefix='brian_cython_')
+        else:
+            _cache_statistics['disk_hits'] += 1
+        _compiled_modules[key] = module
+        return module
+
+    def build(self):
+        module_name = 'brian_cython_' + self.extension_key
+        cache_dir = brian_prefs['codegen.runtime.cython.cache_directory']
+        if _module_filename(module_name, cache_dir) is not None:
+            return  # already built
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        pyx_fname = os.path.join(cache_dir, module_name + '.pyx')
+        with open(pyx_fname, 'w') as f:
+            f.write(self.source)
+        extension = Extension(module_name, [pyx_fname],
+                              include_dirs=self.include_dirs,
+                              extra_compile_args=self.extra_compile_args)
+        build_dir = tempfile.mkdtemp(prefix=module_name)
+        old_threshold = log.set_threshold(log.WARN)
+        try:
+            extensions = cythonize([extension], quiet=True)
+            build_command = build_ext(Distribution({'ext_modules': extensions}))
+            build_command.build_lib = cache_dir
+            build_command.build_temp = build_dir
+            build_command.finalize_options()
+            build_command.run()
+        finally:
+            log.set_threshold(old_threshold)
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    def run(self):
+        if hasattr(self, 'compiled_python_pre'):
+            exec self.compiled_python_pre in self.python_code_namespace
+        return_value = None
+        if self.extension_key is not None:
+            if self.module is None:
+                # The compilation has been deferred (see Network.before_run)
+                # but the code is already needed
+                self.build()
+                self.module = self.load_extension()
+            if (self.bound_names and
+                    getattr(self.module, '_binding_token', None) is not self._binding_token):
+                self.module._bind(*[_argument_value(self.namespace[name])
+                                    for name in self.bound_names])
+                self.module._binding_token = self._binding_token
+            return_value = self.module.main(*self.arguments)
+        if hasattr(self, 'compiled_python_post'):
+            exec self.compiled_python_post in self.python_code_namespace
+        return return_value
+
+codegen_targets.add(CythonCodeObject)
@@ -0,0 +1,15 @@
+{% macro main() %}
+    {% for line in declaration_lines %}
+    {{line}}
+    {% endfor %}
+    {% block maincode %}
+    {% endblock %}
+{% endmacro %}
+
+{% macro support_code() %}
+{% block support_code_block %}
+{% for line in support_code_lines %}
+{{line}}
+{% endfor %}
+{% endblock %}
+{% endmacro %}
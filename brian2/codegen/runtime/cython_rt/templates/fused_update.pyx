@@ -0,0 +1,42 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _spikespace } #}
+    # t, not_refractory and lastspike are added as needed_variables in the
+    # FusedUpdater class, we cannot use the USES_VARIABLE mechanism
+    # conditionally
+    cdef int _idx
+    cdef int _vectorisation_idx
+    cdef long _numspikes = 0
+
+    #### SCALAR CODE ##########
+    {% for block_lines in scalar_code_lines.values() %}
+    {% for line in block_lines %}
+    {{line}}
+    {% endfor %}
+    {% endfor %}
+
+    #### MAIN CODE ############
+    for _idx in range(N):
+        _vectorisation_idx = _idx
+        # State update
+        {% for line in code_lines['stateupdate'] %}
+        {{line}}
+        {% endfor %}
+        {% if 'threshold' in code_lines %}
+        # Threshold
+        {% for line in code_lines['threshold'] %}
+        {{line}}
+        {% endfor %}
+        if _cond:
+            {{_spikespace}}[_numspikes] = _idx
+            _numspikes += 1
+            {% if _uses_refractory %}
+            {{not_refractory}}[_idx] = False
+            {{lastspike}}[_idx] = t
+            {% endif %}
+        {% endif %}
+    {% if 'threshold' in code_lines %}
+    {{_spikespace}}[N] = _numspikes
+    {% endif %}
+{% endblock %}
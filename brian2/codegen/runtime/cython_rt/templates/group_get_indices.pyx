@@ -0,0 +1,21 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {% set c_type = cython_data_type(variables['_indices'].dtype, memoryview=True) %}
+    {% set numpy_type = dtype(variables['_indices'].dtype).name %}
+    cdef int _idx
+    cdef int _vectorisation_idx
+    cdef int _num_elements = 0
+    # Container for all the potential values
+    _elements_array = _numpy.empty(N, dtype=_numpy.{{numpy_type}})
+    cdef {{c_type}}[:] _elements = _elements_array
+    for _idx in range(N):
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+        if _cond:
+            _elements[_num_elements] = _idx
+            _num_elements += 1
+    return _elements_array[:_num_elements]
+{% endblock %}
@@ -0,0 +1,25 @@
+{# Note that we use this template only for subexpressions -- for normal arrays
+   we do not generate any code but simply access the data in the underlying
+   array directly. See RuntimeDevice.get_with_array #}
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _group_idx } #}
+    {% set c_type = cython_data_type(variables['_variable'].dtype, memoryview=True) %}
+    {% set numpy_type = dtype(variables['_variable'].dtype).name %}
+    cdef int _idx_group_idx
+    cdef int _idx
+    cdef int _vectorisation_idx
+    # Container for the return values
+    _elements_array = _numpy.empty(_num_group_idx, dtype=_numpy.{{numpy_type}})
+    cdef {{c_type}}[:] _elements = _as_buffer(_elements_array)
+    for _idx_group_idx in range(_num_group_idx):
+        _idx = {{_group_idx}}[_idx_group_idx]
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+        # _variable is set in the abstract code, see Group._get_with_array
+        _elements[_idx_group_idx] = _variable
+    return _elements_array
+{% endblock %}
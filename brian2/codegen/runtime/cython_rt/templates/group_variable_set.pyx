@@ -0,0 +1,16 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _group_idx } #}
+    cdef int _idx_group_idx
+    cdef int _idx
+    cdef int _vectorisation_idx
+    cdef int _target_idx
+    for _idx_group_idx in range(_num_group_idx):
+        _idx = {{_group_idx}}[_idx_group_idx]
+        _vectorisation_idx = _idx
+        _target_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+{% endblock %}
@@ -0,0 +1,17 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    cdef int _idx
+    cdef int _vectorisation_idx
+    for _idx in range(N):
+        _vectorisation_idx = _idx
+        #### CONDITION ############
+        {% for line in code_lines['condition'] %}
+        {{line}}
+        {% endfor %}
+        if _cond:
+            #### STATEMENT ############
+            {% for line in code_lines['statement'] %}
+            {{line}}
+            {% endfor %}
+{% endblock %}
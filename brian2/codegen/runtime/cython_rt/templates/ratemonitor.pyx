@@ -0,0 +1,20 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _t, _rate, t, dt, _spikespace, _num_source_neurons } #}
+    cdef int _num_spikes = {{_spikespace}}[_num_spikespace - 1]
+
+    # Calculate the new length for the arrays
+    cdef int _new_len = len({{_dynamic__t}}) + 1
+
+    # Resize the arrays
+    {{_dynamic__t}}.resize(_new_len)
+    {{_dynamic__rate}}.resize(_new_len)
+    # Get the potentially newly created underlying data arrays
+    cdef double[:] _t_data = {{_dynamic__t}}.data
+    cdef double[:] _rate_data = {{_dynamic__rate}}.data
+
+    # Set the new values
+    _t_data[_new_len - 1] = t
+    _rate_data[_new_len - 1] = 1.0 * _num_spikes / dt / _num_source_neurons
+{% endblock %}
@@ -0,0 +1,22 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _spikespace } #}
+    cdef int _idx
+    cdef int _vectorisation_idx
+    cdef int _index_spikes
+    cdef int _num_spikes = {{_spikespace}}[_num_spikespace - 1]
+
+    #### SCALAR CODE ##########
+    {% for line in scalar_code_lines %}
+    {{line}}
+    {% endfor %}
+
+    #### MAIN CODE ############
+    for _index_spikes in range(_num_spikes):
+        _idx = {{_spikespace}}[_index_spikes]
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+{% endblock %}
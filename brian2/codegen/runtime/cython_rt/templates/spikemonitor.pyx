@@ -0,0 +1,51 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _t, _i, t, _spikespace, _count,
+                        _source_start, _source_stop} #}
+    {% set c_type = cython_data_type(variables['_i'].dtype) %}
+    cdef int _j
+    cdef int _idx
+    cdef int _num_spikes = {{_spikespace}}[_num_spikespace - 1]
+    cdef int _start_idx
+    cdef int _end_idx
+    cdef int _lower
+    cdef int _curlen
+    cdef double[:] _t_data
+    cdef {{c_type}}[:] _i_data
+    if _num_spikes > 0:
+        # For subgroups, we do not want to record all spikes. The spikes are
+        # sorted, bisect for the first spike of the subgroup and the first
+        # spike after it
+        _start_idx = 0
+        _end_idx = _num_spikes
+        while _start_idx < _end_idx:
+            _j = (_start_idx + _end_idx) // 2
+            if {{_spikespace}}[_j] < _source_start:
+                _start_idx = _j + 1
+            else:
+                _end_idx = _j
+        _lower = _start_idx
+        _end_idx = _num_spikes
+        while _lower < _end_idx:
+            _j = (_lower + _end_idx) // 2
+            if {{_spikespace}}[_j] < _source_stop:
+                _lower = _j + 1
+            else:
+                _end_idx = _j
+        _num_spikes = _end_idx - _start_idx
+        if _num_spikes > 0:
+            # Resize the arrays
+            _curlen = len({{_dynamic__t}})
+            {{_dynamic__t}}.resize(_curlen + _num_spikes)
+            {{_dynamic__i}}.resize(_curlen + _num_spikes)
+            # Get the potentially newly created underlying data arrays
+            _t_data = {{_dynamic__t}}.data
+            _i_data = {{_dynamic__i}}.data
+            # Copy the values across
+            for _j in range(_start_idx, _end_idx):
+                _idx = {{_spikespace}}[_j]
+                _t_data[_curlen + _j - _start_idx] = t
+                _i_data[_curlen + _j - _start_idx] = _idx - _source_start
+                {{_count}}[_idx - _source_start] += 1
+{% endblock %}
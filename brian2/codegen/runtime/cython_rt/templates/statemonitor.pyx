@@ -0,0 +1,78 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _t, _clock_t, _clock_i, _indices, _num_recorded,
+                        _window_start, _window_stop, _last_interval,
+                        _num_samples } #}
+    cdef int _i
+    cdef int _idx
+    cdef int _vectorisation_idx
+    cdef int _w
+    cdef int _n
+    cdef int _num_samples_row
+
+    # Only record in the recording windows, and every {{_every}} time steps
+    # (or in every time step, if values are averaged over the interval)
+    cdef bint _record = False
+    for _w in range(_num_window_start):
+        if _clock_i >= {{_window_start}}[_w] and _clock_i < {{_window_stop}}[_w]:
+            _record = True
+            break
+    {% if _mean %}
+    cdef int _interval = _clock_i // {{_every}}
+    cdef bint _new_row = _interval != {{_last_interval}}[0]
+    {% else %}
+    _record = _record and _clock_i % {{_every}} == 0
+    cdef bint _new_row = True
+    {% endif %}
+    if not _record:
+        return
+
+    if _new_row:
+        # The arrays are preallocated for the recordings of the run (see
+        # StateMonitor.before_run), they only have to be enlarged if more
+        # values are recorded
+        _n = {{_num_recorded}}[0]
+        if _n >= len({{_dynamic__t}}):
+            {{_dynamic__t}}.resize(2*_n + 1)
+            {% for var in _recorded_variables.values() %}
+            {{get_array_name(var, access_data=False)}}.resize((2*_n + 1, _num_indices))
+            {% endfor %}
+        _num_samples_row = 1
+    else:
+        _n = {{_num_recorded}}[0] - 1
+        _num_samples_row = {{_num_samples}}[0] + 1
+
+    # Get the potentially newly created underlying data arrays and copy the
+    # data
+    cdef double[:] _t_data = {{_dynamic__t}}.data
+    if _new_row:
+        _t_data[_n] = _clock_t
+    {% for varname, var in _recorded_variables.items() %}
+    cdef {{cython_data_type(var.dtype, memoryview=True)}}[:, :] _record_data_{{varname}} = _as_buffer({{get_array_name(var, access_data=False)}}.data)
+    {% endfor %}
+
+    for _i in range(_num_indices):
+        _idx = {{_indices}}[_i]
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+        {% for varname in _recorded_variables %}
+        {% if _mean %}
+        if _new_row:
+            _record_data_{{varname}}[_n, _i] = _to_record_{{varname}}
+        else:
+            _record_data_{{varname}}[_n, _i] += (_to_record_{{varname}} - _record_data_{{varname}}[_n, _i]) / _num_samples_row
+        {% else %}
+        _record_data_{{varname}}[_n, _i] = _to_record_{{varname}}
+        {% endif %}
+        {% endfor %}
+
+    if _new_row:
+        {{_num_recorded}}[0] = _n + 1
+    {% if _mean %}
+    {{_last_interval}}[0] = _interval
+    {% endif %}
+    {{_num_samples}}[0] = _num_samples_row
+{% endblock %}
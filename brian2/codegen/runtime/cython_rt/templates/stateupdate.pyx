@@ -0,0 +1,18 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    cdef int _idx
+    cdef int _vectorisation_idx
+
+    #### SCALAR CODE ##########
+    {% for line in scalar_code_lines %}
+    {{line}}
+    {% endfor %}
+
+    #### MAIN CODE ############
+    for _idx in range(N):
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+{% endblock %}
@@ -0,0 +1,20 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _synaptic_post, N_post } #}
+    {% set _target_var_array = get_array_name(_target_var) %}
+    cdef int _idx
+    cdef int _vectorisation_idx
+    cdef int _target_idx
+
+    # Set all the target variable values to zero
+    for _target_idx in range(N_post):
+        {{_target_var_array}}[_target_idx] = 0.0
+
+    for _idx in range(_num_synaptic_post):
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+        {{_target_var_array}}[{{_synaptic_post}}[_idx]] += _synaptic_var
+{% endblock %}
@@ -0,0 +1,27 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _spiking_synapses } #}
+    cdef int _spiking_synapse_idx
+    cdef int _idx
+    cdef int _vectorisation_idx
+    # The spike queue returns the synapses as an array of 32 bit integers
+    # (or as an empty list before the first time step)
+    cdef int32_t[:] _spiking_synapses_view = _numpy.asarray(_spiking_synapses,
+                                                            dtype=_numpy.int32)
+
+    #### SCALAR CODE ##########
+    {% for line in scalar_code_lines %}
+    {{line}}
+    {% endfor %}
+
+    #### MAIN CODE ############
+    # The synapses are processed one after the other, repeated postsynaptic
+    # targets are therefore handled correctly
+    for _spiking_synapse_idx in range(_spiking_synapses_view.shape[0]):
+        _idx = _spiking_synapses_view[_spiking_synapse_idx]
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+{% endblock %}
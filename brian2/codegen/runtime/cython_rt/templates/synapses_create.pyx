@@ -0,0 +1,79 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _synaptic_pre, _synaptic_post, rand} #}
+    {% set c_type = cython_data_type(variables['_synaptic_pre'].dtype) %}
+    {% set numpy_type = dtype(variables['_synaptic_pre'].dtype).name %}
+    cdef int i
+    cdef int j
+    cdef int64_t _vectorisation_idx
+    cdef int _repetition
+    cdef double _skip
+    # The new synapses are collected in buffers that are enlarged as
+    # necessary, all arrays are only resized once at the end
+    cdef int _buffer_size = 1024
+    cdef int _curbuf = 0
+    _prebuf_array = _numpy.empty(_buffer_size, dtype=_numpy.{{numpy_type}})
+    _postbuf_array = _numpy.empty(_buffer_size, dtype=_numpy.{{numpy_type}})
+    cdef {{c_type}}[:] _prebuf = _prebuf_array
+    cdef {{c_type}}[:] _postbuf = _postbuf_array
+    {% if _sparse_p is not none %}
+    # The connection probability is a constant: instead of drawing a random
+    # number for every pair of neurons, we directly jump to the next candidate
+    # target, skipping over a geometrically distributed number of targets
+    cdef double _log_1mp = log(1.0 - {{_sparse_p}})
+    {% endif %}
+    for i in range(_num_all_pre):
+        {% if _sparse_p is none %}
+        for j in range(_num_all_post):
+        {% else %}
+        j = -1
+        while True:
+            # _rand returns values in [0, 1), the skip can therefore be large.
+            # The random number for a skip is drawn for the index of the next
+            # candidate pair
+            _skip = floor(log(1.0 - _rand(<int64_t>i*_num_all_post + j + 1,
+                                          {{random_call_sites + 1}})) / _log_1mp)
+            if _skip >= _num_all_post - j - 1:
+                break
+            j += 1 + <int>_skip
+        {% endif %}
+            # Random numbers are drawn for the index of the (i, j) pair
+            _vectorisation_idx = <int64_t>i*_num_all_post + j
+            {# The abstract code consists of the following lines (the first two lines
+            are there to properly support subgroups as sources/targets):
+            _pre_idx = _all_pre
+            _post_idx = _all_post
+            _cond = {user-specified condition}
+            _n = {user-specified number of synapses}
+            _p = {user-specified probability}
+            #}
+            {% for line in code_lines %}
+            {{line}}
+            {% endfor %}
+            if not _cond:
+                continue
+            {% if _sparse_p is none %}
+            # We have to use _rand instead of rand to use our rand function,
+            # not the one from the C standard library
+            if _p != 1.0 and _rand(_vectorisation_idx, {{random_call_sites}}) >= _p:
+                continue
+            {% endif %}
+            for _repetition in range(<int>_n):
+                if _curbuf == _buffer_size:
+                    _buffer_size *= 2
+                    _prebuf_array = _numpy.resize(_prebuf_array, _buffer_size)
+                    _postbuf_array = _numpy.resize(_postbuf_array, _buffer_size)
+                    _prebuf = _prebuf_array
+                    _postbuf = _postbuf_array
+                _prebuf[_curbuf] = <{{c_type}}>_pre_idx
+                _postbuf[_curbuf] = <{{c_type}}>_post_idx
+                _curbuf += 1
+
+    if _curbuf > 0:
+        _cur_num_synapses = len({{_dynamic__synaptic_pre}})
+        # Resize all dynamic arrays (synaptic indices, weights, delays, etc.)
+        _owner._resize(_cur_num_synapses + _curbuf)
+        {{_dynamic__synaptic_pre}}[_cur_num_synapses:] = _prebuf_array[:_curbuf]
+        {{_dynamic__synaptic_post}}[_cur_num_synapses:] = _postbuf_array[:_curbuf]
+{% endblock %}
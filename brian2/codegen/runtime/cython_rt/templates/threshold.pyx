@@ -0,0 +1,31 @@
+{% extends 'common_group.pyx' %}
+
+{% block maincode %}
+    {# USES_VARIABLES { _spikespace } #}
+    # t, not_refractory and lastspike are added as needed_variables in the
+    # Thresholder class, we cannot use the USES_VARIABLE mechanism
+    # conditionally
+    cdef int _idx
+    cdef int _vectorisation_idx
+    cdef long _numspikes = 0
+
+    #### SCALAR CODE ##########
+    {% for line in scalar_code_lines %}
+    {{line}}
+    {% endfor %}
+
+    #### MAIN CODE ############
+    for _idx in range(N):
+        _vectorisation_idx = _idx
+        {% for line in code_lines %}
+        {{line}}
+        {% endfor %}
+        if _cond:
+            {{_spikespace}}[_numspikes] = _idx
+            _numspikes += 1
+            {% if _uses_refractory %}
+            {{not_refractory}}[_idx] = False
+            {{lastspike}}[_idx] = t
+            {% endif %}
+    {{_spikespace}}[N] = _numspikes
+{% endblock %}
@@ -0,0 +1,10 @@
+'''
+Runtime target evaluating expressions with numexpr (falling back to numpy for
+expressions that numexpr does not support).
+
+Preferences
+--------------------
+.. document_brian_prefs:: codegen.runtime.numexpr
+'''
+
+from .numexpr_rt import *
@@ -0,0 +1,60 @@
+'''
+Module providing `NumexprCodeObject`.
+'''
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+from brian2.core.preferences import brian_prefs, BrianPreference
+
+from ...templates import Templater
+from ...languages.numexpr_lang import NumexprLanguage
+from ...targets import codegen_targets
+from ..numpy_rt import NumpyCodeObject
+
+__all__ = ['NumexprCodeObject']
+
+# Preferences
+brian_prefs.register_preferences(
+    'codegen.runtime.numexpr',
+    'Numexpr runtime codegen preferences',
+    num_threads = BrianPreference(
+        default=None,
+        docs='''
+        The number of threads used by numexpr. If set to ``None`` (the
+        default), numexpr's own default is used (the number of cores or the
+        value of the ``NUMEXPR_NUM_THREADS`` environment variable).
+        ''',
+        validator=lambda value: value is None or (isinstance(value, int) and
+                                                  value >= 1)
+        )
+    )
+
+
+class NumexprCodeObject(NumpyCodeObject):
+    '''
+    Execute code using numexpr
+
+    Uses the numpy templates, but evaluates expressions on arrays with
+    ``numexpr``, which uses several threads and does not allocate temporary
+    arrays. Does not need a compiler, but needs the ``numexpr`` package.
+    '''
+    # The generated code is Python code as for numpy
+    templater = Templater('brian2.codegen.runtime.numpy_rt')
+    language = NumexprLanguage()
+    class_name = 'numexpr'
+
+    def __init__(self, owner, code, variables, name='numexpr_code_object*'):
+        if numexpr is None:
+            raise ImportError('The numexpr target needs the numexpr package.')
+        NumpyCodeObject.__init__(self, owner, code, variables, name=name)
+        self.namespace['_numexpr_evaluate'] = numexpr.evaluate
+
+    def compile(self):
+        super(NumexprCodeObject, self).compile()
+        num_threads = brian_prefs['codegen.runtime.numexpr.num_threads']
+        if num_threads is not None:
+            numexpr.set_num_threads(num_threads)
+
+codegen_targets.add(NumexprCodeObject)
@@ -8,9 +8,10 @@ from brian2.core.variables import (DynamicArrayVariable, ArrayVariable,
                                    AttributeVariable)
 
 from ...codeobject import CodeObject
+from ... import rng
 
 from ...templates import Templater
-from ...languages.numpy_lang import NumpyLanguage
+from ...languages.numpy_lang import NumpyLanguage, add_at
 from ...targets import codegen_targets
 
 __all__ = ['NumpyCodeObject']
@@ -25,6 +26,37 @@ brian_prefs.register_preferences(
         Whether to change the namespace of user-specifed functions to remove
         units.
         '''
+        ),
+    synapse_creation_block_size = BrianPreference(
+        default=1000000,
+        docs='''
+        The maximum number of pairs of pre- and postsynaptic neurons for
+        which the synapse creation condition is evaluated at once. Larger
+        values lead to faster synapse creation but need more memory.
+        ''',
+        validator=lambda value: isinstance(value, int) and value > 0
+        ),
+    inplace_operations = BrianPreference(
+        default=False,
+        docs='''
+        Whether to evaluate the state update code with numpy functions that
+        store their results in buffers allocated once per code object,
+        instead of allocating new arrays for every operation in every time
+        step. This is faster for large groups (roughly from 10000 neurons or
+        synapses on), but slower for small groups.
+        '''
+        ),
+    counter_based_random = BrianPreference(
+        default=False,
+        docs='''
+        Whether to draw the random numbers for ``rand()`` and ``randn()`` from
+        the counter-based generator used by the other targets (see
+        `brian2.codegen.rng`) instead of numpy's generator. The numpy target
+        then generates the same random numbers as the other targets (for the
+        same seed), but is slower for code that draws many random numbers
+        (about 3 to 4 times slower for uniformly distributed numbers, about
+        twice as slow for normally distributed numbers).
+        '''
         )
     )
 
@@ -45,7 +77,12 @@ class NumpyCodeObject(CodeObject):
         self.device = get_device()
         self.namespace = {'_owner': owner,
                           # TODO: This should maybe go somewhere else
-                          'logical_not': np.logical_not}
+                          'logical_not': np.logical_not,
+                          '_add_at': add_at,
+                          '_numpy': np,
+                          '_scratch_buffers': self.get_scratch_buffers}
+        #: The buffers returned by `get_scratch_buffers`
+        self.scratch_buffers = {}
         CodeObject.__init__(self, owner, code, variables, name=name)
         self.variables_to_namespace()
 
@@ -91,10 +128,45 @@ class NumpyCodeObject(CodeObject):
                                                                              self.variables),
                                                 var.get_value))
 
+    def get_scratch_buffers(self, keys, *operands):
+        '''
+        Return floating point arrays that can be used to store intermediate
+        results (see `NumpyLanguage.translate_inplace_statement`). The same
+        arrays are returned for the same keys in every time step, they are
+        only reallocated if the shape of the operands changes.
+
+        Parameters
+        ----------
+        keys : tuple
+            A unique key for each requested array.
+        operands
+            The arrays used in the calculation, the returned arrays have the
+            shape of the operands after broadcasting.
+
+        Returns
+        -------
+        buffers : list of `ndarray`
+            The (uninitialised) arrays.
+        '''
+        if len(operands) == 1:
+            shape = np.shape(operands[0])
+        else:
+            shape = np.broadcast(*operands).shape
+        buffers = []
+        for key in keys:
+            buffer = self.scratch_buffers.get(key, None)
+            if buffer is None or buffer.shape != shape:
+                buffer = np.empty(shape)
+                self.scratch_buffers[key] = buffer
+            buffers.append(buffer)
+        return buffers
+
     def update_namespace(self):
         # update the values of the non-constant values in the namespace
         for name, func in self.nonconstant_values:
             self.namespace[name] = func()
+        if self.draws_random_numbers:
+            rng.next_execution()
 
     def compile(self):
         super(NumpyCodeObject, self).compile()
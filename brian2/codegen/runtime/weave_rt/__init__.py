@@ -1,6 +1,10 @@
 '''
 Runtime C++ code generation via weave.
 
+Compiled code is stored as extension modules in a cache directory, use
+`weave_rt.get_cache_statistics` and `weave_rt.clear_cache` to inspect and
+clear this cache.
+
 Preferences
 --------------------
 .. document_brian_prefs:: codegen.runtime.weave
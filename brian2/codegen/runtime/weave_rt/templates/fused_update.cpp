@@ -0,0 +1,46 @@
+{% extends 'common_group.cpp' %}
+
+{% block maincode %}
+	{# USES_VARIABLES {_spikespace } #}
+	// t, not_refractory and lastspike are added as needed_variables in the
+	// FusedUpdater class, we cannot use the USES_VARIABLE mechanism
+	// conditionally
+
+	//// SCALAR CODE //////////
+	{% for block_lines in scalar_code_lines.values() %}
+	{% for line in block_lines %}
+	{{line}}
+	{% endfor %}
+	{% endfor %}
+
+	//// MAIN CODE ////////////
+	long _cpp_numspikes = 0;
+	for(int _idx=0; _idx<N; _idx++)
+	{
+		const int _vectorisation_idx = _idx;
+		// State update
+		{
+			{% for line in code_lines['stateupdate'] %}
+			{{line}}
+			{% endfor %}
+		}
+		{% if 'threshold' in code_lines %}
+		// Threshold
+		{
+			{% for line in code_lines['threshold'] %}
+			{{line}}
+			{% endfor %}
+			if(_cond) {
+				{{_spikespace}}[_cpp_numspikes++] = _idx;
+				{% if _uses_refractory %}
+				{{not_refractory}}[_idx] = false;
+				{{lastspike}}[_idx] = t;
+				{% endif %}
+			}
+		}
+		{% endif %}
+	}
+	{% if 'threshold' in code_lines %}
+	{{_spikespace}}[N] = _cpp_numspikes;
+	{% endif %}
+{% endblock %}
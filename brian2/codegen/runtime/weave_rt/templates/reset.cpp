@@ -2,6 +2,11 @@
 
 {% block maincode %}
 	{# USES_VARIABLES { _spikespace } #}
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
 	//// MAIN CODE ////////////
 	const int _num_spikes = {{_spikespace}}[_num_spikespace-1];
 	for(int _index_spikes=0; _index_spikes<_num_spikes; _index_spikes++)
@@ -7,29 +7,14 @@
 	int _num_spikes = {{_spikespace}}[_num_spikespace-1];
     if (_num_spikes > 0)
     {
-        // For subgroups, we do not want to record all spikes
-        // We assume that spikes are ordered
-        // TODO: Will this assumption ever be violated?
-        int _start_idx = 0;
-        int _end_idx = - 1;
-        for(int _j=0; _j<_num_spikes; _j++)
-        {
-            const int _idx = {{_spikespace}}[_j];
-            if (_idx >= _source_start) {
-                _start_idx = _j;
-                break;
-            }
-        }
-        for(int _j=_start_idx; _j<_num_spikes; _j++)
-        {
-            const int _idx = {{_spikespace}}[_j];
-            if (_idx >= _source_stop) {
-                _end_idx = _j;
-                break;
-            }
-        }
-        if (_end_idx == -1)
-            _end_idx =_num_spikes;
+        // For subgroups, we do not want to record all spikes. The spikes are
+        // sorted, the spikes of the subgroup are therefore a contiguous range
+        const int _start_idx = std::lower_bound({{_spikespace}},
+                                                {{_spikespace}} + _num_spikes,
+                                                _source_start) - {{_spikespace}};
+        const int _end_idx = std::lower_bound({{_spikespace}} + _start_idx,
+                                              {{_spikespace}} + _num_spikes,
+                                              _source_stop) - {{_spikespace}};
         _num_spikes = _end_idx - _start_idx;
         if (_num_spikes > 0) {
             // Get the current length and new length of t and i arrays
@@ -57,4 +42,5 @@
 {% endmacro %}
 
 {% macro support_code() %}
+#include<algorithm>
 {% endmacro %}
@@ -1,37 +1,89 @@
 {% extends 'common_group.cpp' %}
 
 {% block maincode %}
-    {# USES_VARIABLES { _t, _clock_t, _indices } #}
+    {# USES_VARIABLES { _t, _clock_t, _clock_i, _indices, _num_recorded,
+                        _window_start, _window_stop, _last_interval,
+                        _num_samples } #}
 
-    // Get the current length and new length of t and value arrays
-    const int _curlen = {{_dynamic__t}}.attr("shape")[0];
-    const int _new_len = _curlen + 1;
-    // Resize the arrays
-    PyObject_CallMethod({{_dynamic__t}}, "resize", "i", _new_len);
-    {% for var in _recorded_variables.values() %}
-    PyObject_CallMethod({{get_array_name(var, access_data=False)}}, "resize", "((ii))",
-                        _new_len, _num_indices);
-    {% endfor %}
-
-    // Get the potentially newly created underlying data arrays and copy the
-    // data
-    double *_t_data = (double*)(((PyArrayObject*)(PyObject*){{_dynamic__t}}.attr("data"))->data);
-    _t_data[_new_len - 1] = _clock_t;
+    // Only record in the recording windows, and every {{_every}} time steps
+    // (or in every time step, if values are averaged over the interval)
+    bool _record = false;
+    for (int _w = 0; _w < _num_window_start; _w++)
+    {
+        if (_clock_i >= {{_window_start}}[_w] && _clock_i < {{_window_stop}}[_w])
+        {
+            _record = true;
+            break;
+        }
+    }
+    {% if _mean %}
+    const int _interval = _clock_i / {{_every}};
+    const bool _new_row = _interval != {{_last_interval}}[0];
+    {% else %}
+    _record = _record && (_clock_i % {{_every}} == 0);
+    const bool _new_row = true;
+    {% endif %}
 
-    {% for varname, var in _recorded_variables.items() %}
-    {%set c_type = c_data_type(variables[varname].dtype) %}
+    if (_record)
     {
-        PyArrayObject *_record_data = (((PyArrayObject*)(PyObject*){{get_array_name(var, access_data=False)}}.attr("data")));
-        const npy_intp* _record_strides = _record_data->strides;
-        for (int _i = 0; _i < _num_indices; _i++)
+        int _n, _num_samples_row;
+        if (_new_row)
+        {
+            // The arrays are preallocated for the recordings of the run (see
+            // StateMonitor.before_run), they only have to be enlarged if more
+            // values are recorded
+            _n = {{_num_recorded}}[0];
+            const int _curlen = {{_dynamic__t}}.attr("shape")[0];
+            if (_n >= _curlen)
+            {
+                PyObject_CallMethod({{_dynamic__t}}, "resize", "i", 2*_n + 1);
+                {% for var in _recorded_variables.values() %}
+                PyObject_CallMethod({{get_array_name(var, access_data=False)}}, "resize", "((ii))",
+                                    2*_n + 1, _num_indices);
+                {% endfor %}
+            }
+            _num_samples_row = 1;
+        } else
         {
-            const int _idx = {{_indices}}[_i];
-            const int _vectorisation_idx = _idx;
-            {{ super() }}
+            _n = {{_num_recorded}}[0] - 1;
+            _num_samples_row = {{_num_samples}}[0] + 1;
+        }
+
+        // Get the potentially newly created underlying data arrays and copy
+        // the data
+        double *_t_data = (double*)(((PyArrayObject*)(PyObject*){{_dynamic__t}}.attr("data"))->data);
+        if (_new_row)
+            _t_data[_n] = _clock_t;
 
-            {{c_type}} *recorded_entry = ({{c_type}}*)(_record_data->data + (_new_len - 1)*_record_strides[0] + _i*_record_strides[1]);
-            *recorded_entry = _to_record_{{varname}};
+        {% for varname, var in _recorded_variables.items() %}
+        {%set c_type = c_data_type(variables[varname].dtype) %}
+        {
+            PyArrayObject *_record_data = (((PyArrayObject*)(PyObject*){{get_array_name(var, access_data=False)}}.attr("data")));
+            const npy_intp* _record_strides = _record_data->strides;
+            for (int _i = 0; _i < _num_indices; _i++)
+            {
+                const int _idx = {{_indices}}[_i];
+                const int _vectorisation_idx = _idx;
+                {{ super() }}
+
+                {{c_type}} *recorded_entry = ({{c_type}}*)(_record_data->data + _n*_record_strides[0] + _i*_record_strides[1]);
+                {% if _mean %}
+                if (_new_row)
+                    *recorded_entry = _to_record_{{varname}};
+                else
+                    *recorded_entry += (_to_record_{{varname}} - *recorded_entry) / _num_samples_row;
+                {% else %}
+                *recorded_entry = _to_record_{{varname}};
+                {% endif %}
+            }
         }
+        {% endfor %}
+
+        if (_new_row)
+            {{_num_recorded}}[0] = _n + 1;
+        {% if _mean %}
+        {{_last_interval}}[0] = _interval;
+        {% endif %}
+        {{_num_samples}}[0] = _num_samples_row;
     }
-    {% endfor %}
 {% endblock %}
@@ -1,6 +1,11 @@
 {% extends 'common_group.cpp' %}
 
 {% block maincode %}
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
 	//// MAIN CODE ////////////
 	for(int _idx=0; _idx<N; _idx++)
 	{
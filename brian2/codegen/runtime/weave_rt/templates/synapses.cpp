@@ -2,6 +2,11 @@
 
 {% block maincode %}
 	{# USES_VARIABLES { _spiking_synapses} #}
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
 	//// MAIN CODE ////////////
 	for(int _spiking_synapse_idx=0;
 		_spiking_synapse_idx<_num_spiking_synapses;
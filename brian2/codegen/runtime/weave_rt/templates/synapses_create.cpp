@@ -2,18 +2,37 @@
 
 {% block maincode %}
     {# USES_VARIABLES { _synaptic_pre, _synaptic_post, rand} #}
-	srand((unsigned int)time(NULL));
 	int _buffer_size = 1024;
 	int *_prebuf = new int[_buffer_size];
 	int *_postbuf = new int[_buffer_size];
 	int *_synprebuf = new int[1];
 	int *_synpostbuf = new int[1];
 	int _curbuf = 0;
+	{% if _sparse_p is not none %}
+	// The connection probability is a constant: instead of drawing a random
+	// number for every pair of neurons, we directly jump to the next candidate
+	// target, skipping over a geometrically distributed number of targets
+	const double _log_1mp = log(1.0 - {{_sparse_p}});
+	{% endif %}
 	for(int i=0; i<_num_all_pre; i++)
 	{
+		{% if _sparse_p is none %}
 		for(int j=0; j<_num_all_post; j++)
 		{
-		    const int _vectorisation_idx = j;
+		{% else %}
+		for(int j=-1; ; )
+		{
+		    // _rand returns values in [0, 1), the skip can therefore be large.
+		    // The random number for a skip is drawn for the index of the next
+		    // candidate pair
+		    const double _skip = floor(log(1.0 - _rand((int64_t)i*_num_all_post + j + 1,
+		                                               {{random_call_sites + 1}})) / _log_1mp);
+		    if (_skip >= _num_all_post - j - 1)
+		        break;
+		    j += 1 + (int)_skip;
+		{% endif %}
+		    // Random numbers are drawn for the index of the (i, j) pair
+		    const int64_t _vectorisation_idx = (int64_t)i*_num_all_post + j;
             {# The abstract code consists of the following lines (the first two lines
             are there to properly support subgroups as sources/targets):
             _pre_idx = _all_pre
@@ -26,12 +45,14 @@
 			// Add to buffer
 			if(_cond)
 			{
+			    {% if _sparse_p is none %}
 			    if (_p != 1.0) {
 			        // We have to use _rand instead of rand to use our rand
 			        // function, not the one from the C standard library
-			        if (_rand(_vectorisation_idx) >= _p)
+			        if (_rand(_vectorisation_idx, {{random_call_sites}}) >= _p)
 			            continue;
 			    }
+			    {% endif %}
 
 			    for (int _repetition=0; _repetition<_n; _repetition++) {
                     _prebuf[_curbuf] = _pre_idx;
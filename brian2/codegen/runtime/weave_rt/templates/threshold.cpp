@@ -6,6 +6,11 @@
 	// Thresholder class, we cannot use the USES_VARIABLE mechanism
 	// conditionally
 
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
 	//// MAIN CODE ////////////
 	long _cpp_numspikes = 0;
 	for(int _idx=0; _idx<N; _idx++)
@@ -1,11 +1,15 @@
 '''
 Module providing `WeaveCodeObject`.
 '''
+import os
+import imp
+import hashlib
 
 import numpy
 
 try:
     from scipy import weave
+    from scipy.weave import ext_tools
     from scipy.weave.c_spec import num_to_c_types
 except ImportError:
     # No weave for Python 3
@@ -14,9 +18,9 @@ except ImportError:
 from brian2.core.variables import (DynamicArrayVariable, ArrayVariable,
                                    AttributeVariable)
 from brian2.core.preferences import brian_prefs, BrianPreference
-from brian2.core.functions import DEFAULT_FUNCTIONS, FunctionImplementation
 
-from ...codeobject import CodeObject
+from ...codeobject import CodeObject, defer_compilation
+from ... import rng
 from ...templates import Templater
 from ...languages.cpp_lang import CPPLanguage
 from ...targets import codegen_targets
@@ -45,9 +49,134 @@ brian_prefs.register_preferences(
         docs='''
         Include directories to use.
         '''
+        ),
+    extension_cache = BrianPreference(
+        default=True,
+        docs='''
+        Whether to compile each code object into an extension module that is
+        stored in the `codegen.runtime.weave.cache_directory` and called
+        directly. If set to ``False``, ``weave.inline`` is used instead, which
+        looks up the compiled code in weave's catalog for every call.
+        '''
+        ),
+    cache_directory = BrianPreference(
+        default=os.path.join(os.path.expanduser('~'), '.brian', 'weave_cache'),
+        docs='''
+        The directory where compiled extension modules are stored (see
+        `codegen.runtime.weave.extension_cache`).
+        '''
+        ),
+    cache_size_limit = BrianPreference(
+        default=500,
+        docs='''
+        The maximum total size (in megabytes) of the extension modules in the
+        `codegen.runtime.weave.cache_directory`. If the size is exceeded after
+        compiling a new module, the least recently used modules are deleted.
+        ''',
+        validator=lambda value: value > 0
         )
     )
 
+#: The compiled functions that have been used in this process, stored with
+#: their hash as the key
+_compiled_functions = {}
+
+#: Statistics about the use of the extension cache
+_cache_statistics = {'memory_hits': 0, 'disk_hits': 0, 'compilations': 0,
+                     'evictions': 0}
+
+
+def get_cache_statistics():
+    '''
+    Return statistics about the use of the extension module cache (see
+    `codegen.runtime.weave.extension_cache`) in the current process.
+
+    Returns
+    -------
+    statistics : dict
+        A dictionary with the number of code objects for which an
+        already loaded module could be reused (``'memory_hits'``), a compiled
+        module was loaded from the cache directory (``'disk_hits'``) or a new
+        module had to be compiled (``'compilations'``), and the number of
+        modules that were deleted from the cache directory
+        (``'evictions'``).
+    '''
+    return dict(_cache_statistics)
+
+
+def clear_cache():
+    '''
+    Delete all extension modules from the cache directory (see
+    `codegen.runtime.weave.cache_directory`) and reset the cache statistics.
+    Modules that are already loaded can still be used.
+    '''
+    cache_dir = brian_prefs['codegen.runtime.weave.cache_directory']
+    if os.path.isdir(cache_dir):
+        for fname in os.listdir(cache_dir):
+            if fname.startswith('brian_weave_'):
+                os.remove(os.path.join(cache_dir, fname))
+    for key in _cache_statistics:
+        _cache_statistics[key] = 0
+
+
+def _evict_modules(cache_dir, size_limit, keep=(), prefix='brian_weave_'):
+    '''
+    Delete the least recently used modules (i.e. all files belonging to a
+    module) from the cache directory until their total size is below
+    `size_limit` (in bytes). Only files whose name starts with `prefix` are
+    considered, modules with names in `keep` are never deleted. Returns the
+    number of deleted modules.
+    '''
+    modules = {}
+    for fname in os.listdir(cache_dir):
+        if not fname.startswith(prefix):
+            continue
+        module_name = fname.split('.')[0]
+        stat = os.stat(os.path.join(cache_dir, fname))
+        size, last_used, files = modules.get(module_name, (0, 0, []))
+        modules[module_name] = (size + stat.st_size,
+                                max(last_used, stat.st_mtime),
+                                files + [fname])
+    total_size = sum(size for size, _, _ in modules.itervalues())
+    evicted = 0
+    for module_name, (size, _, files) in sorted(modules.iteritems(),
+                                                key=lambda item: item[1][1]):
+        if total_size <= size_limit:
+            break
+        if module_name in keep:
+            continue
+        for fname in files:
+            os.remove(os.path.join(cache_dir, fname))
+        total_size -= size
+        evicted += 1
+    return evicted
+
+
+def _module_filename(module_name, cache_dir):
+    '''
+    Return the file name of the extension module `module_name` in
+    `cache_dir`, or ``None`` if it does not exist.
+    '''
+    for suffix, _, kind in imp.get_suffixes():
+        if kind == imp.C_EXTENSION:
+            fname = os.path.join(cache_dir, module_name + suffix)
+            if os.path.exists(fname):
+                return fname
+    return None
+
+
+def _load_module(module_name, cache_dir):
+    '''
+    Load the extension module `module_name` from `cache_dir`, returns
+    ``None`` if it does not exist.
+    '''
+    fname = _module_filename(module_name, cache_dir)
+    if fname is None:
+        return None
+    # Mark the module as recently used
+    os.utime(fname, None)
+    return imp.load_dynamic(module_name, fname)
+
 
 def weave_data_type(dtype):
     '''
@@ -75,6 +204,11 @@ class WeaveCodeObject(CodeObject):
     The ``code`` should be a `~brian2.codegen.languages.templates.MultiTemplate`
     object with two macros defined, ``main`` (for the main loop code) and
     ``support_code`` for any support code (e.g. function definitions).
+
+    The values of the namespace are passed as positional arguments to the
+    compiled function. The list of arguments is kept between calls, only the
+    values that change every time step (e.g. ``t``) and the arrays of dynamic
+    arrays that have been resized are replaced.
     '''
     templater = Templater('brian2.codegen.runtime.weave_rt',
                           env_globals={'c_data_type': weave_data_type,
@@ -91,6 +225,7 @@ class WeaveCodeObject(CodeObject):
         self.extra_compile_args = brian_prefs['codegen.runtime.weave.extra_compile_args']
         self.include_dirs = brian_prefs['codegen.runtime.weave.include_dirs']
         self.python_code_namespace = {'_owner': owner}
+        self._awaiting_build = False
         self.variables_to_namespace()
 
     def variables_to_namespace(self):
@@ -102,6 +237,9 @@ class WeaveCodeObject(CodeObject):
 
         # A list containing tuples of name and a function giving the value
         self.nonconstant_values = []
+        # A list containing tuples of the name of the array and of its size,
+        # the variable and the DynamicArray object for all dynamic arrays
+        self.dynamic_arrays = []
 
         for name, var in self.variables.iteritems():
 
@@ -122,41 +260,168 @@ class WeaveCodeObject(CodeObject):
             if isinstance(var, DynamicArrayVariable):
                 dyn_array_name = self.language.get_array_name(var,
                                                               access_data=False)
-                self.namespace[dyn_array_name] = self.device.get_value(var,
-                                                                       access_data=False)
-
-            # There are two kinds of objects that we have to inject into the
-            # namespace with their current value at each time step:
-            # * non-constant AttributeValue (this might be removed since it only
-            #   applies to "t" currently)
-            # * Dynamic arrays that change in size during runs (i.e. not
-            #   synapses but e.g. the structures used in monitors)
+                dyn_array = self.device.get_value(var, access_data=False)
+                self.namespace[dyn_array_name] = dyn_array
+                self.dynamic_arrays.append((self.device.get_array_name(var,
+                                                                       self.variables),
+                                            '_num'+name, var, dyn_array))
+
+            # Non-constant AttributeVariables (e.g. "t") have to be injected
+            # into the namespace with their current value at each time step.
+            # Dynamic arrays (e.g. the structures used in monitors) only have
+            # to be updated when they have been resized (see update_namespace)
             if isinstance(var, AttributeVariable) and not var.constant:
                 self.nonconstant_values.append((name, var.get_value))
                 if not var.scalar:
                     self.nonconstant_values.append(('_num'+name, var.get_len))
-            elif (isinstance(var, DynamicArrayVariable) and
-                  not var.constant_size):
-                self.nonconstant_values.append((self.device.get_array_name(var,
-                                                                           self.variables),
-                                                var.get_value))
-                self.nonconstant_values.append(('_num'+name, var.get_len))
+
+        #: The `DynamicArray.generation` of the dynamic arrays for the values
+        #: in the namespace
+        self.dynamic_array_generations = [dyn_array.generation
+                                          for _, _, _, dyn_array
+                                          in self.dynamic_arrays]
+        #: The names of the arguments of the compiled function
+        self.argument_names = sorted(self.namespace)
+        self.argument_indices = dict((name, index) for index, name
+                                     in enumerate(self.argument_names))
+        #: The values of the arguments of the compiled function
+        self.arguments = [self.namespace[name] for name in self.argument_names]
 
     def update_namespace(self):
-        # update the values of the non-constant values in the namespace
+        # update the values of the non-constant values in the namespace and
+        # in the arguments of the compiled function
         for name, func in self.nonconstant_values:
-            self.namespace[name] = func()
-            
+            self._set_value(name, func())
+        # the values of dynamic arrays only change if they have been resized
+        generations = self.dynamic_array_generations
+        for index, (name, num_name, var, dyn_array) in enumerate(self.dynamic_arrays):
+            if dyn_array.generation != generations[index]:
+                generations[index] = dyn_array.generation
+                self._set_value(name, dyn_array.data)
+                self._set_value(num_name, var.get_len())
+        if self.draws_random_numbers:
+            rng.next_execution()
+
+    def _set_value(self, name, value):
+        self.namespace[name] = value
+        index = self.argument_indices.get(name, None)
+        if index is not None:
+            self.arguments[index] = value
+
+    def __call__(self, **kwds):
+        self.update_namespace()
+        for name, value in kwds.iteritems():
+            self._set_value(name, value)
+        return self.run()
+
     def compile(self):
         CodeObject.compile(self)
         if hasattr(self.code, 'python_pre'):
             self.compiled_python_pre = compile(self.code.python_pre, '(string)', 'exec')
         if hasattr(self.code, 'python_post'):
             self.compiled_python_post = compile(self.code.python_post, '(string)', 'exec')
+        self.compiled_function = None
+        if brian_prefs['codegen.runtime.weave.extension_cache']:
+            self.extension_key = self._extension_key()
+            self.compiled_function = self.load_extension()
+            if self.compiled_function is None:
+                self._awaiting_build = True
+                if not defer_compilation(self, self.extension_key):
+                    self.build()
+                    self.compiled_function = self.load_extension()
+        else:
+            self.extension_key = None
+
+    def _argument_types(self):
+        # The generated code for converting the arguments depends on their
+        # types (and for arrays, on their dtype and dimensions)
+        types = []
+        for name, value in sorted(self.namespace.iteritems()):
+            if isinstance(value, numpy.ndarray):
+                types.append((name, 'array', value.dtype.str, value.ndim))
+            else:
+                types.append((name, type(value).__name__))
+        return types
+
+    def _extension_key(self):
+        # The hash of everything that has an influence on the compiled module
+        # The compiled function takes the arguments in the order of
+        # argument_names (i.e. sorted by name, as in _argument_types)
+        return hashlib.sha1('\n'.join([self.code.main,
+                                       self.code.support_code,
+                                       'positional arguments',
+                                       repr(self._argument_types()),
+                                       repr((self.compiler,
+                                             self.extra_compile_args,
+                                             self.include_dirs)),
+                                       weave.__version__,
+                                       numpy.__version__])).hexdigest()
+
+    def load_extension(self):
+        '''
+        Return a function that runs the code with the arguments from the
+        namespace given as positional arguments (in the order of
+        `argument_names`), or ``None`` if the code has not
+        been compiled yet. The code is compiled into an extension module that
+        is stored in the cache directory, under a name that is based on a hash
+        of the code, the types of the arguments and the compiler settings.
+        Code objects with the same hash reuse the same module.
+        '''
+        key = self.extension_key
+        if key in _compiled_functions:
+            _cache_statistics['memory_hits'] += 1
+            self._awaiting_build = False
+            return _compiled_functions[key]
+
+        module_name = 'brian_weave_' + key
+        cache_dir = brian_prefs['codegen.runtime.weave.cache_directory']
+        module = _load_module(module_name, cache_dir)
+        if module is None:
+            return None
+        if self._awaiting_build:
+            # The module has been built for this code object
+            self._awaiting_build = False
+            _cache_statistics['compilations'] += 1
+            size_limit = brian_prefs['codegen.runtime.weave.cache_size_limit']
+            loaded = set('brian_weave_' + k for k in _compiled_functions)
+            loaded.add(module_name)
+            _cache_statistics['evictions'] += _evict_modules(cache_dir,
+                                                             size_limit*1024*1024,
+                                                             keep=loaded)
+        else:
+            _cache_statistics['disk_hits'] += 1
+        _compiled_functions[key] = module.compiled_function
+        return module.compiled_function
+
+    def build(self):
+        module_name = 'brian_weave_' + self.extension_key
+        cache_dir = brian_prefs['codegen.runtime.weave.cache_directory']
+        if _module_filename(module_name, cache_dir) is not None:
+            return  # already built
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        ext_module = ext_tools.ext_module(module_name)
+        ext_function = ext_tools.ext_function('compiled_function',
+                                              self.code.main,
+                                              self.argument_names,
+                                              local_dict=self.namespace)
+        ext_function.customize.add_support_code(self.code.support_code)
+        ext_module.add_function(ext_function)
+        ext_module.compile(location=cache_dir,
+                           compiler=self.compiler,
+                           extra_compile_args=self.extra_compile_args,
+                           include_dirs=self.include_dirs)
 
     def run(self):
         if hasattr(self, 'compiled_python_pre'):
             exec self.compiled_python_pre in self.python_code_namespace
+        if self.extension_key is not None:
+            if self.compiled_function is None:
+                # The compilation has been deferred (see Network.before_run)
+                # but the code is already needed
+                self.build()
+                self.compiled_function = self.load_extension()
+            return self.compiled_function(*self.arguments)
         return weave.inline(self.code.main, self.namespace.keys(),
                             local_dict=self.namespace,
                             support_code=self.code.support_code,
@@ -167,40 +432,3 @@ class WeaveCodeObject(CodeObject):
             exec self.compiled_python_post in self.python_code_namespace
 
 codegen_targets.add(WeaveCodeObject)
-
-
-# Use a special implementation for the randn function that makes use of numpy's
-# randn
-randn_code = {'support_code': '''
-        #define BUFFER_SIZE 1024
-        // A randn() function that returns a single random number. Internally
-        // it asks numpy's randn function for N (e.g. the number of neurons)
-        // random numbers at a time and then returns one number from this
-        // buffer.
-        // It needs a reference to the numpy_randn object (the original numpy
-        // function), because this is otherwise only available in
-        // compiled_function (where is is automatically handled by weave).
-        //
-        double _call_randn(py::object& numpy_randn) {
-            static PyArrayObject *randn_buffer = NULL;
-            static double *buf_pointer = NULL;
-            static npy_int curbuffer = 0;
-            if(curbuffer==0)
-            {
-                if(randn_buffer) Py_DECREF(randn_buffer);
-                py::tuple args(1);
-                args[0] = BUFFER_SIZE;
-                randn_buffer = (PyArrayObject *)PyArray_FromAny(numpy_randn.call(args), NULL, 1, 1, 0, NULL);
-                buf_pointer = (double*)PyArray_GETPTR1(randn_buffer, 0);
-            }
-            double number = buf_pointer[curbuffer];
-            curbuffer = curbuffer+1;
-            if (curbuffer == BUFFER_SIZE)
-                // This seems to be safer then using (curbuffer + 1) % BUFFER_SIZE, we might run into
-                // an integer overflow for big networks, otherwise.
-                curbuffer = 0;
-            return number;
-        }
-        ''', 'hashdefine_code': '#define _randn(_vectorisation_idx) _call_randn(_python_randn)'}
-DEFAULT_FUNCTIONS['randn'].implementations[WeaveCodeObject] = FunctionImplementation('_randn',
-                                                                                     code=randn_code)
@@ -61,6 +61,10 @@ class CodeObjectTemplate(object):
         self.variables = set([])
         #: The indices over which the template iterates completely
         self.iterate_all = set([])
+        #: Whether the template executes the ``scalar_code_lines`` once
+        #: before the loop over the elements
+        self.allows_scalar_code = re.search(r'\bscalar_code_lines\b',
+                                            template_source) is not None
         # This is the bit inside {} for USES_VARIABLES { list of words }
         specifier_blocks = re.findall(r'\bUSES_VARIABLES\b\s*\{(.*?)\}',
                                       template_source, re.M|re.S)
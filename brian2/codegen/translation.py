@@ -16,20 +16,26 @@ The input information needed:
 '''
 import re
 import collections
+import itertools
 
 import numpy as np
+import sympy
 
-from brian2.core.variables import Variable, Subexpression, AuxiliaryVariable
-from brian2.core.functions import Function
+from brian2.core.preferences import brian_prefs
+from brian2.core.variables import (Variable, Subexpression, AuxiliaryVariable,
+                                   ArrayVariable)
+from brian2.core.functions import Function, DEFAULT_FUNCTIONS
 from brian2.utils.stringtools import (deindent, strip_empty_lines,
                                       get_identifiers, word_substitute)
 from brian2.parsing.statements import parse_statement
+from brian2.parsing.sympytools import str_to_sympy, sympy_to_str
 
 from .statements import Statement
 
 
 __all__ = ['translate', 'make_statements', 'analyse_identifiers',
-           'get_identifiers_recursively']
+           'get_identifiers_recursively', 'optimise_statements',
+           'add_random_call_sites']
 
 DEBUG = False
 
@@ -247,6 +253,149 @@ def make_statements(code, variables, dtype):
     return statements
 
 
+def _is_scalar_variable(var):
+    '''
+    Whether a variable has the same floating point value for all elements
+    during one execution of a code object (e.g. ``dt``, ``t`` or an external
+    constant).
+    '''
+    return (getattr(var, 'scalar', False) and
+            not isinstance(var, (ArrayVariable, Subexpression, Function)) and
+            np.issubdtype(var.dtype, np.floating))
+
+
+def _is_arithmetic(s_expr):
+    '''
+    Whether a sympy expression only consists of numbers, symbols, arithmetic
+    operations and function calls with at least one argument (i.e. not
+    ``rand()``). For other expressions (e.g. involving ``%``), the conversion
+    back to a string does not necessarily give valid abstract code.
+    '''
+    for node in sympy.preorder_traversal(s_expr):
+        if node.is_Function:
+            if len(node.args) == 0 or isinstance(node, (sympy.Mod,
+                                                        sympy.Piecewise)):
+                return False
+        elif not (node.is_Add or node.is_Mul or node.is_Pow or
+                  node.is_Symbol or node.is_Number or node.is_NumberSymbol):
+            return False
+    return True
+
+
+def optimise_statements(statements, variables, counter=None):
+    '''
+    Split off the loop-invariant parts of a sequence of statements. All parts
+    of the right-hand sides that only depend on scalar values which are not
+    changed by the statements (e.g. ``exp(-dt/tau)`` with a constant ``tau``)
+    are replaced by new variables ``_lio_1``, ``_lio_2``, etc. Their values
+    are calculated by additional statements that only have to be executed
+    once for every execution of the code object, not for every element.
+
+    Only statements with floating point values that exclusively refer to
+    floating point variables are considered, since the expressions are
+    rewritten with sympy, which does not know about integer division.
+
+    Parameters
+    ----------
+    statements : list of `Statement`
+        The statements, as returned by `make_statements`.
+    variables : dict of `Variable`
+        The variables used in the statements.
+    counter : iterator, optional
+        An iterator providing the numbers for the new variable names, has to
+        be shared between all blocks of statements of a single code object.
+        Defaults to ``itertools.count(1)``.
+
+    Returns
+    -------
+    scalar_statements : list of `Statement`
+        The statements defining the loop-invariant values.
+    vector_statements : list of `Statement`
+        The statements that have to be executed for each element.
+    '''
+    if counter is None:
+        counter = itertools.count(1)
+    written = set(stmt.var for stmt in statements)
+    scalars = set(name for name, var in variables.iteritems()
+                  if name not in written and _is_scalar_variable(var))
+    functions = set(name for name, var in variables.iteritems()
+                    if isinstance(var, Function))
+    float_names = set(name for name, var in variables.iteritems()
+                      if not isinstance(var, Function) and
+                      np.issubdtype(var.dtype, np.floating))
+    float_names |= set(stmt.var for stmt in statements
+                       if np.issubdtype(stmt.dtype, np.floating))
+
+    # Maps the string representation of a hoisted expression to the symbol
+    # of the variable storing its value
+    hoisted = {}
+    scalar_statements = []
+
+    def is_scalar(s_expr):
+        return all(str(symbol) in scalars for symbol in s_expr.free_symbols)
+
+    def worth_hoisting(s_expr):
+        return not s_expr.is_Atom and len(s_expr.free_symbols) > 0
+
+    def hoisted_symbol(s_expr, dtype):
+        key = sympy_to_str(s_expr)
+        if key not in hoisted:
+            name = '_lio_%d' % next(counter)
+            hoisted[key] = sympy.Symbol(name, real=True)
+            scalar_statements.append(Statement(name, ':=', key, dtype,
+                                               constant=True))
+        return hoisted[key]
+
+    def hoist(s_expr, dtype):
+        if s_expr.is_Atom:
+            return s_expr
+        if is_scalar(s_expr):
+            if worth_hoisting(s_expr):
+                return hoisted_symbol(s_expr, dtype)
+            return s_expr
+        if s_expr.is_Add or s_expr.is_Mul:
+            # Collect all scalar terms/factors, e.g. dt and 1/tau in dt*v/tau
+            scalar_args = [arg for arg in s_expr.args if is_scalar(arg)]
+            new_args = [hoist(arg, dtype) for arg in s_expr.args
+                        if not is_scalar(arg)]
+            if len(scalar_args):
+                scalar_part = s_expr.func(*scalar_args)
+                if worth_hoisting(scalar_part):
+                    scalar_part = hoisted_symbol(scalar_part, dtype)
+                new_args.append(scalar_part)
+            return s_expr.func(*new_args)
+        return s_expr.func(*[hoist(arg, dtype) for arg in s_expr.args])
+
+    vector_statements = []
+    for stmt in statements:
+        identifiers = get_identifiers(stmt.expr)
+        if (not np.issubdtype(stmt.dtype, np.floating) or
+                not identifiers.issubset(float_names | functions)):
+            vector_statements.append(stmt)
+            continue
+        try:
+            s_expr = str_to_sympy(stmt.expr)
+        except SyntaxError:
+            # e.g. rand() which needs the _vectorisation_idx argument
+            vector_statements.append(stmt)
+            continue
+        if not _is_arithmetic(s_expr):
+            vector_statements.append(stmt)
+            continue
+        new_expr = hoist(s_expr, stmt.dtype)
+        if not new_expr.free_symbols.intersection(hoisted.values()):
+            # Nothing to hoist, keep the original formulation
+            vector_statements.append(stmt)
+        else:
+            vector_statements.append(Statement(stmt.var, stmt.op,
+                                               sympy_to_str(new_expr),
+                                               stmt.dtype,
+                                               constant=stmt.constant,
+                                               subexpression=stmt.subexpression))
+
+    return scalar_statements, vector_statements
+
+
 def translate_subexpression(subexpr, variables):
     substitutions = {}
     for name in get_identifiers(subexpr.expr):
@@ -291,22 +440,105 @@ def translate_subexpressions(subexpressions, variables):
     subexpressions.update(new_subexpressions)
     return subexpressions
 
+def add_random_call_sites(statements, variables, sites):
+    '''
+    Number the calls of the random number functions ``rand()`` and
+    ``randn()`` in a sequence of statements: the counter-based random number
+    generator (see `brian2.codegen.rng`) uses an independent stream of
+    random numbers for every call site. A call ``rand()`` is replaced by
+    ``rand(_vectorisation_idx, site)``, with the number of the call site as a
+    literal integer.
+
+    Parameters
+    ----------
+    statements : list of `Statement`
+        The statements, as returned by `make_statements`.
+    variables : dict-like
+        The variables used in the statements.
+    sites : iterator
+        An iterator providing the numbers for the call sites.
+
+    Returns
+    -------
+    statements : list of `Statement`
+        The statements with numbered calls.
+    '''
+    random_functions = [DEFAULT_FUNCTIONS['rand'], DEFAULT_FUNCTIONS['randn']]
+    names = [name for name, var in variables.iteritems()
+             if any(var is func for func in random_functions)]
+    if not names:
+        return statements
+    pattern = re.compile(r'\b(%s)\(\s*\)' % '|'.join(sorted(names)))
+    replace = lambda match: '%s(_vectorisation_idx, %d)' % (match.group(1),
+                                                            next(sites))
+    numbered_statements = []
+    for stmt in statements:
+        expr = pattern.sub(replace, str(stmt.expr))
+        if expr != str(stmt.expr):
+            stmt = Statement(stmt.var, stmt.op, expr, stmt.dtype,
+                             constant=stmt.constant,
+                             subexpression=stmt.subexpression)
+        numbered_statements.append(stmt)
+    return numbered_statements
+
+
 def translate(code, variables, dtype, codeobj_class,
-              variable_indices, iterate_all):
+              variable_indices, iterate_all, scalar_code=False):
     '''
     Translates an abstract code block into the target language.
 
     TODO
     
     Returns a multi-line string.
+
+    If the `codegen.loop_invariant_optimisations` preference is set, the
+    loop-invariant parts of the code are split off (see
+    `optimise_statements`). If ``scalar_code`` is ``True``, i.e. if the
+    template executes the ``scalar_code_lines`` once before the loop over the
+    elements, their translation is returned in the keywords under this name.
+    Otherwise, they are executed before the other statements (for vectorised
+    targets like numpy, this still avoids repeated calculations).
+
+    The calls of random number functions are numbered with
+    `add_random_call_sites`, the number of call sites is returned in the
+    keywords as ``random_call_sites`` (templates that draw random numbers
+    themselves use the following numbers).
     '''
+    counter = itertools.count(1)
+    sites = itertools.count()
+
+    def split_statements(abstract_code):
+        statements = make_statements(abstract_code, variables, dtype)
+        statements = add_random_call_sites(statements, variables, sites)
+        if brian_prefs['codegen.loop_invariant_optimisations']:
+            scalar_statements, vector_statements = optimise_statements(statements,
+                                                                       variables,
+                                                                       counter)
+        else:
+            scalar_statements, vector_statements = [], statements
+        if not scalar_code:
+            return [], scalar_statements + vector_statements
+        return scalar_statements, vector_statements
+
     if isinstance(code, dict):
+        scalar_statements = {}
         statements = {}
-        for ac_name, ac_code in code.iteritems():
-            statements[ac_name] = make_statements(ac_code, variables, dtype)
+        for ac_name, ac_code in sorted(code.iteritems()):
+            scalar_statements[ac_name], statements[ac_name] = split_statements(ac_code)
     else:
-        statements = make_statements(code, variables, dtype)
+        scalar_statements, statements = split_statements(code)
     language = codeobj_class.language
-    return language.translate_statement_sequence(statements, variables,
-                                                 variable_indices,
-                                                 iterate_all, codeobj_class)
+    # Has to be done first, the translation of the other statements can
+    # replace the Function objects in variables
+    if scalar_code:
+        scalar_code_lines = language.translate_scalar_statements(scalar_statements,
+                                                                 variables,
+                                                                 codeobj_class)
+    snippet, kwds = language.translate_statement_sequence(statements, variables,
+                                                          variable_indices,
+                                                          iterate_all,
+                                                          codeobj_class)
+    if scalar_code:
+        kwds['scalar_code_lines'] = scalar_code_lines
+    kwds['random_call_sites'] = next(sites)
+    return snippet, kwds
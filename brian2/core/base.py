@@ -59,6 +59,10 @@ class BrianObject(Nameable):
         self._code_objects = []
         
         self._active = True
+
+        #: The networks that prepared a schedule including this object, they
+        #: have to be notified when the `active` flag changes
+        self._networks = weakref.WeakSet()
         
         logger.debug("Created BrianObject with name {self.name}, "
                      "clock name {self.clock.name}, "
@@ -78,7 +82,10 @@ class BrianObject(Nameable):
         Called by `Network.before_run` before the main simulation loop is started.
         Objects such as `NeuronGroup` will generate internal objects such as
         state updaters in this method, taking into account changes in the
-        namespace or in constant parameter values.
+        namespace or in constant parameter values. When called from
+        `Network.run`, the interval of the object's clock has already been set
+        to the coming run, i.e. ``clock.i_end - clock.i`` is the number of
+        time steps that will be simulated.
         
         Parameters
         ----------
@@ -149,6 +156,8 @@ class BrianObject(Nameable):
     def _set_active(self, val):
         val = bool(val)
         self._active = val
+        for net in self._networks:
+            net._invalidate_run_schedule()
         for obj in self.contained_objects:
             obj.active = val
 
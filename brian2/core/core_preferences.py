@@ -16,5 +16,14 @@ brian_prefs.register_preferences('core', 'Core Brian preferences',
         Default dtype for all arrays of scalars (state variables, weights, etc.).'
         ''',
         representor=dtype_repr,
+        ),
+    parsing_cache_size=BrianPreference(
+        default=10000,
+        docs='''
+        The maximum number of entries in each of the caches for the results of
+        parsing expressions (conversion between strings and sympy expressions,
+        determining the units of an expression). Set to 0 to disable caching.
+        ''',
+        validator=lambda value: isinstance(value, int) and value >= 0
         )
     )
@@ -99,24 +99,27 @@ class FunctionImplementationContainer(collections.MutableMapping):
     '''
     Helper object to store implementations and give access in a dictionary-like
     fashion, using `Language` implementations as a fallback for `CodeObject`
-    implementations.
+    implementations. Implementations for a `CodeObject` or `Language` class
+    are also used for their subclasses (e.g. the numpy implementations are
+    used for `NumexprCodeObject`).
     '''
     def __init__(self):
         self._implementations = dict()
 
     def __getitem__(self, key):
-        fallback = None
+        candidates = [key]
         if hasattr(key, 'language'):
-            fallback = key.language.__class__
-
-        if key in self._implementations:
-            return self._implementations[key]
-        elif fallback in self._implementations:
-            return self._implementations[fallback]
-        else:
-            raise KeyError(('No implementation available for {key}. '
-                            'Available implementations: {keys}').format(key=key,
-                                                                        keys=self._implementations.keys()))
+            candidates.append(key.language.__class__)
+        candidates.extend(getattr(key, '__mro__', ())[1:])
+        if hasattr(key, 'language'):
+            candidates.extend(key.language.__class__.__mro__[1:])
+
+        for candidate in candidates:
+            if candidate in self._implementations:
+                return self._implementations[candidate]
+        raise KeyError(('No implementation available for {key}. '
+                        'Available implementations: {keys}').format(key=key,
+                                                                    keys=self._implementations.keys()))
 
     def __setitem__(self, key, value):
         self._implementations[key] = value
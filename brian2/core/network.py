@@ -1,5 +1,7 @@
 import weakref
 import time
+from bisect import bisect_left
+from fractions import Fraction, gcd
 
 from brian2.utils.logger import get_logger
 from brian2.core.names import Nameable
@@ -10,12 +12,18 @@ from brian2.units.allunits import second
 from brian2.core.preferences import brian_prefs
 from brian2.core.namespace import get_local_namespace
 from brian2.devices.device import device_override
+from brian2.codegen.codeobject import (deferred_compilation,
+                                      invalidate_preferences_cache_key)
 
 __all__ = ['Network']
 
 
 logger = get_logger(__name__)
 
+#: The maximum number of steps in the cycle of clock updates that is
+#: precomputed by `Network.before_run` (see `Network._calc_clock_cycle`)
+MAX_CLOCK_CYCLE_STEPS = 100000
+
 
 class Network(Nameable):
     '''
@@ -64,6 +72,18 @@ class Network(Nameable):
        The order in which the objects are called is described below.
     6. Increase `Clock.t` by `Clock.dt` for each of the clocks and return to
        step 2. 
+
+    If the time steps of all clocks are (close to) rational multiples of each
+    other, they are expressed as integer multiples of a common base time step.
+    The clocks are then updated in a periodic pattern with the least common
+    multiple of these integers as its period. This pattern is determined once
+    before the run, step 3 only looks up the next entry instead of comparing
+    floating point times. The list of
+    objects to update in step 5 is determined only once for each combination
+    of clocks and then reused, it is recomputed whenever objects are added or
+    removed or the `~BrianObject.active` flag of an object changes. Such a
+    change already applies to the objects that remain to be updated in the
+    current time step.
     
     The order in which the objects are updated in step 4 is determined by
     the `Network.schedule` and the objects `~BrianObject.when` and
@@ -90,6 +110,23 @@ class Network(Nameable):
         #: Stores references or `weakref.proxy` references to the objects
         #: (depending on `weak_references`)
         self.objects = []
+
+        #: The `run` methods of the active objects to call for a given set of
+        #: clocks (a dictionary mapping frozensets of `Clock` objects to
+        #: lists), filled during a run and emptied when it is invalidated
+        self._run_schedule = {}
+
+        #: Increased whenever `_run_schedule` is invalidated, allows to detect
+        #: changes made by an object during a time step
+        self._schedule_version = 0
+
+        #: The time steps of the clocks as integer multiples of a common base
+        #: time step (a dictionary mapping `Clock` objects to integers) or
+        #: ``None`` if the time steps are not multiples of each other
+        self._clock_periods = None
+
+        #: The periodic pattern of clock updates (see `_calc_clock_cycle`)
+        self._clock_cycle = None
         
         name = kwds.pop('name', 'network*')
 
@@ -162,6 +199,7 @@ class Network(Nameable):
                                                             weakref.CallableProxyType)):
                     obj = weakref.proxy(obj)
                 self.objects.append(obj)
+                self._invalidate_run_schedule()
                 self.add(obj.contained_objects)
             else:
                 try:
@@ -191,6 +229,7 @@ class Network(Nameable):
                     obj = weakref.proxy(obj)
                 # note that weakref.proxy(obj) is weakref.proxy(obj) is True
                 self.objects.remove(obj)
+                self._invalidate_run_schedule()
                 self.remove(obj.contained_objects)
             else:
                 try:
@@ -251,26 +290,102 @@ class Network(Nameable):
         '''
         when_to_int = dict((when, i) for i, when in enumerate(self.schedule))
         self.objects.sort(key=lambda obj: (when_to_int[obj.when], obj.order))
+
+    def _invalidate_run_schedule(self):
+        '''
+        Forget the objects to update for each combination of clocks, they will
+        be determined again when they are needed. Called when objects are
+        added or removed and when the `~BrianObject.active` flag of an object
+        changes.
+        '''
+        self._run_schedule.clear()
+        self._schedule_version += 1
+
+    def _get_run_functions(self, clocks):
+        '''
+        Return the `run` methods of all active objects using one of the given
+        clocks, in the order in which they should be called. Each method is
+        returned together with the index of its object in `Network.objects`.
+        '''
+        try:
+            return self._run_schedule[clocks]
+        except KeyError:
+            functions = [(index, obj.run)
+                         for index, obj in enumerate(self.objects)
+                         if obj.clock in clocks and obj.active]
+            self._run_schedule[clocks] = functions
+            return functions
+
+    def _run_objects(self, clocks):
+        '''
+        Call the `run` methods of all active objects using one of the given
+        clocks. If an object changes the `~BrianObject.active` flag of an
+        object or adds or removes objects, the remaining objects of this time
+        step are checked one by one.
+        '''
+        version = self._schedule_version
+        for index, run_function in self._get_run_functions(clocks):
+            run_function()
+            if self._schedule_version != version:
+                index += 1
+                while index < len(self.objects):
+                    obj = self.objects[index]
+                    if obj.clock in clocks and obj.active:
+                        obj.run()
+                    index += 1
+                break
+
+    def _calc_clock_periods(self):
+        '''
+        Express the time steps of all clocks as integer multiples of a common
+        base time step. Returns a dictionary mapping each clock to its number
+        of base time steps or ``None`` if the ratios between the time steps
+        are not (close to) simple fractions.
+        '''
+        min_dt = min(clock.dt_ for clock in self._clocks)
+        ratios = {}
+        for clock in self._clocks:
+            ratio = Fraction(clock.dt_ / min_dt).limit_denominator(1000)
+            if abs(float(ratio) * min_dt - clock.dt_) > Clock.epsilon * clock.dt_:
+                return None
+            ratios[clock] = ratio
+        base = 1
+        for ratio in ratios.itervalues():
+            # least common multiple of the denominators
+            base = base * ratio.denominator // gcd(base, ratio.denominator)
+        return dict((clock, int(ratio * base))
+                    for clock, ratio in ratios.iteritems())
     
     @device_override('network_before_run')
-    def before_run(self, namespace):
+    def before_run(self, namespace, duration=None):
         '''
-        before_run(namespace)
+        before_run(namespace, duration=None)
 
         Prepares the `Network` for a run.
         
         Objects in the `Network` are sorted into the correct running order, and
-        their `BrianObject.before_run` methods are called.
+        their `BrianObject.before_run` methods are called. The code objects
+        created in this step are compiled at the end, in parallel where
+        possible (see `codegen.max_compile_processes`).
 
         Parameters
         ----------
         namespace : dict-like, optional
             A namespace in which objects which do not define their own
             namespace will be run.
+        duration : `Quantity`, optional
+            The duration of the coming run. If given, the intervals of the
+            clocks are set before the objects are prepared, so that they know
+            the number of time steps of the run (e.g. `StateMonitor` uses this
+            to preallocate its storage).
         '''                
         brian_prefs.check_all_validated()
 
         self._clocks = set(obj.clock for obj in self.objects)
+        if duration is not None:
+            t_end = self.t+duration
+            for clock in self._clocks:
+                clock.set_interval(self.t, t_end)
         
         self._stopped = False
         Network._globally_stopped = False
@@ -283,8 +398,18 @@ class Network(Nameable):
                         objnames=', '.join(obj.name for obj in self.objects)),
                      "before_run")
         
+        invalidate_preferences_cache_key()
+        with deferred_compilation():
+            for obj in self.objects:
+                obj.before_run(namespace)
+
+        # Changes of the active flag of the objects invalidate the schedule
         for obj in self.objects:
-            obj.before_run(namespace)
+            obj._networks.add(self)
+        self._invalidate_run_schedule()
+        if self._clocks:
+            self._clock_periods = self._calc_clock_periods()
+            self._clock_cycle = self._calc_clock_cycle()
 
         logger.debug("Network {self.name} has {num} "
                      "clocks: {clocknames}".format(self=self,
@@ -300,12 +425,87 @@ class Network(Nameable):
         for obj in self.objects:
             obj.after_run()
         
+    def _calc_clock_cycle(self):
+        '''
+        Determine the periodic pattern of clock updates for clocks with
+        commensurate time steps (see `_calc_clock_periods`). The pattern
+        repeats after the least common multiple of the clock periods (in base
+        time steps). Returns a tuple of the length of the cycle and a list
+        of ``(offset, clock, clocks)`` tuples, sorted by ``offset``: at all
+        base time steps that are equal to ``offset`` modulo the length of the
+        cycle, the clocks in the frozenset ``clocks`` are updated, ``clock``
+        is the clock that determines the network time. Returns ``None`` if
+        the clock periods are not known or if the cycle would have more than
+        `MAX_CLOCK_CYCLE_STEPS` steps.
+        '''
+        periods = self._clock_periods
+        if periods is None:
+            return None
+        length = 1
+        for period in periods.itervalues():
+            length = length * period // gcd(length, period)
+        if sum(length // period
+               for period in periods.itervalues()) > MAX_CLOCK_CYCLE_STEPS:
+            return None
+        clocks_for_offset = {}
+        for clock, period in periods.iteritems():
+            for offset in xrange(0, length, period):
+                clocks_for_offset.setdefault(offset, set()).add(clock)
+        cycle = []
+        for offset, clocks in sorted(clocks_for_offset.iteritems()):
+            clock = min(clocks, key=lambda c: (periods[c], c.name))
+            cycle.append((offset, clock, frozenset(clocks)))
+        return length, cycle
+
     def _nextclocks(self):
         minclock = min(self._clocks, key=lambda c: c.t_)
-        curclocks = set(clock for clock in self._clocks if
-                        (clock.t_ == minclock.t_ or
-                         abs(clock.t_ - minclock.t_)<Clock.epsilon))
+        curclocks = frozenset(clock for clock in self._clocks if
+                              (clock.t_ == minclock.t_ or
+                               abs(clock.t_ - minclock.t_)<Clock.epsilon))
         return minclock, curclocks
+
+    def _clock_steps(self):
+        '''
+        Generator for the steps of a run. Yields the clock that determines
+        the network time and the set of clocks to update in each step, until
+        the first clock has reached the end of the run.
+        '''
+        if self._clock_cycle is None:
+            clock, curclocks = self._nextclocks()
+            while clock.running:
+                yield clock, curclocks
+                clock, curclocks = self._nextclocks()
+            return
+
+        periods = self._clock_periods
+        length, cycle = self._clock_cycle
+        # All times are measured as integer numbers of base time steps
+        start_ticks = [clock.i * periods[clock] for clock in self._clocks]
+        end_tick = min(clock.i_end * periods[clock] for clock in self._clocks)
+        # Clocks can start later if the start time of the run is not a
+        # multiple of their time step, until all of them have started, the
+        # clocks have to be checked individually
+        aligned_tick = max(start_ticks)
+        tick = min(start_ticks)
+        cycle_start = tick - tick % length
+        offsets = [offset for offset, _, _ in cycle]
+        position = bisect_left(offsets, tick % length)
+        while True:
+            if position == len(cycle):
+                position = 0
+                cycle_start += length
+            offset, clock, curclocks = cycle[position]
+            position += 1
+            tick = cycle_start + offset
+            if tick >= end_tick:
+                return
+            if tick < aligned_tick:
+                curclocks = frozenset(c for c in curclocks
+                                      if c.i * periods[c] == tick)
+                if not curclocks:
+                    continue
+                clock = min(curclocks, key=lambda c: (periods[c], c.name))
+            yield clock, curclocks
     
     @device_override('network_run')
     @check_units(duration=second, report_period=second)
@@ -348,27 +548,29 @@ class Network(Nameable):
         '''
         
         if namespace is not None:
-            self.before_run(('explicit-run-namespace', namespace))
+            self.before_run(('explicit-run-namespace', namespace),
+                            duration=duration)
         else:
             namespace = get_local_namespace(3 + level)
-            self.before_run(('implicit-run-namespace', namespace))
+            self.before_run(('implicit-run-namespace', namespace),
+                            duration=duration)
 
         if len(self.objects)==0:
             return # TODO: raise an error? warning?
 
+        # The intervals of the clocks have been set in before_run
         t_end = self.t+duration
-        for clock in self._clocks:
-            clock.set_interval(self.t, t_end)
             
         # TODO: progress reporting stuff
         
-        # Find the first clock to be updated (see note below)
-        clock, curclocks = self._nextclocks()
         if report is not None:
             start = current = time.time()
             next_report_time = start + 10
 
-        while clock.running and not self._stopped and not Network._globally_stopped:
+        # The clocks to update in each step (see note below)
+        for clock, curclocks in self._clock_steps():
+            if self._stopped or Network._globally_stopped:
+                break
             # update the network time to this clocks time
             self.t_ = clock.t_
             if report is not None:
@@ -380,19 +582,14 @@ class Network(Nameable):
                                             remaining=remaining)
                     next_report_time = current + 10
                 # update the objects with this clock
-            for obj in self.objects:
-                if obj.clock in curclocks and obj.active:
-                    obj.run()
+            self._run_objects(curclocks)
             # tick the clock forward one time step
             for c in curclocks:
                 c.tick()
-            # find the next clocks to be updated. The < operator for Clock
-            # determines that the first clock to be updated should be the one
-            # with the smallest t value, unless there are several with the 
-            # same t value in which case we update all of them
-            clock, curclocks = self._nextclocks()
 
         self.t = t_end
+        # Do not keep references to the objects' methods between runs
+        self._invalidate_run_schedule()
 
         if report is not None:
             print 'Took ', current-start, 's in total.'
@@ -143,6 +143,9 @@ class BrianGlobalPreferences(MutableMapping):
     def __init__(self):
         self.prefs = {}
         self.backup_prefs = {}
+        #: Increased whenever the value of a preference is set, allows to
+        #: detect changes without comparing all the values
+        self._version = 0
         self.prefs_unvalidated = {}
         self.pref_register = {}
         self.eval_namespace = {}
@@ -180,6 +183,7 @@ class BrianGlobalPreferences(MutableMapping):
                 raise PreferenceError(
                     "Value %s for preference %s is invalid." % (value, name))
             self.prefs[name] = value
+            self._version += 1
             if name in self.prefs_unvalidated:
                 del self.prefs_unvalidated[name]
         else:
@@ -277,6 +281,7 @@ class BrianGlobalPreferences(MutableMapping):
         Restore a copy of the values of the preferences backed up with `_backup`.
         '''
         self.prefs.update(**self.backup_prefs)
+        self._version += 1
 
     def _get_one_documentation(self, basename, link_targets):
         '''
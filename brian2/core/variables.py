@@ -131,6 +131,11 @@ class Variable(object):
         #: Whether the variable is read-only
         self.read_only = read_only
 
+        #: A counter that is increased whenever the variable's values or its
+        #: size are changed from outside of generated code (e.g. by the user
+        #: or when adding synapses). Allows to check for changes between runs.
+        self.generation = 0
+
     def get_value(self):
         '''
         Return the value associated with the variable (without units). This
@@ -422,6 +427,7 @@ class ArrayVariable(Variable):
 
     def set_value(self, value):
         self.device.fill_with_array(self, value)
+        self.generation += 1
 
     def get_len(self):
         return self.size
@@ -516,6 +522,7 @@ class DynamicArrayVariable(ArrayVariable):
         '''
         self.device.resize(self, new_size)
         self.size = new_size
+        self.generation += 1
 
 
 class Subexpression(Variable):
@@ -662,6 +669,8 @@ class VariableView(object):
         if variable.read_only:
             raise TypeError('Variable %s is read-only.' % self.name)
 
+        variable.generation += 1
+
         if isinstance(item, slice) and item == slice(None):
             item = 'True'
 
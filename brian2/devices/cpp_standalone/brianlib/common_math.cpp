@@ -0,0 +1,10 @@
+#include "common_math.h"
+
+uint64_t _brian_rng_key = 0;
+uint64_t _brian_rng_execution = 0;
+
+void _brian_seed_rng(uint64_t seed)
+{
+	_brian_rng_key = seed;
+	_brian_rng_execution = 0;
+}
@@ -3,7 +3,60 @@
 
 #include<limits>
 #include<stdlib.h>
+#include<stdint.h>
+#ifdef _OPENMP
+#include<omp.h>
+#endif
 
 #define inf (std::numeric_limits<double>::infinity())
 
+// The number of the calling thread and the number of threads in the current
+// team (0 and 1 when not compiled with OpenMP support)
+inline int _brian_thread_num()
+{
+#ifdef _OPENMP
+	return omp_get_thread_num();
+#else
+	return 0;
+#endif
+}
+
+inline int _brian_num_threads()
+{
+#ifdef _OPENMP
+	return omp_get_num_threads();
+#else
+	return 1;
+#endif
+}
+
+// The maximal number of threads in a team of a following parallel region
+// (1 when not compiled with OpenMP support)
+inline int _brian_max_threads()
+{
+#ifdef _OPENMP
+	return omp_get_max_threads();
+#else
+	return 1;
+#endif
+}
+
+// State of the counter-based random number generator: random numbers are a
+// function of the key (the seed), the execution of the code object that draws
+// them, the index and the call site. They therefore do not depend on the
+// number of threads.
+extern uint64_t _brian_rng_key;
+extern uint64_t _brian_rng_execution;
+
+// Sets the key and resets the execution counter, has to be called before any
+// random number is drawn
+void _brian_seed_rng(uint64_t seed);
+
+// Starts a new execution, called once by every code object that draws random
+// numbers (outside of any parallel region)
+inline uint64_t _brian_next_rng_execution()
+{
+	return ++_brian_rng_execution;
+}
+
 #endif
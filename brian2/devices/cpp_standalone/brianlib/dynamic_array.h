@@ -6,75 +6,48 @@
 /*
  * 2D Dynamic array class
  *
- * Efficiency note: if you are regularly resizing, make sure it is the first dimension that
- * is resized, not the second one.
+ * The data is stored contiguously in row-major order, i.e. the elements of a
+ * row follow each other and ``data()`` can be used to access all of them at
+ * once. Resizing the first dimension is cheap (the underlying vector grows
+ * geometrically, so adding one row at a time has an amortised constant cost),
+ * resizing the second dimension copies all the data.
  *
  */
 template<class T>
 class DynamicArray2D
 {
-	int old_n, old_m;
-	std::vector< std::vector<T>* > data;
+	std::vector<T> _data;
 public:
 	int n, m;
 	DynamicArray2D(int _n=0, int _m=0)
 	{
-		old_n = 0;
-		old_m = 0;
+		n = 0;
+		m = _m;
 		resize(_n, _m);
 	};
-	~DynamicArray2D()
-	{
-		resize(0, 0); // handles deallocation
-	}
-	void resize()
-	{
-		if(old_n!=n)
-		{
-			if(n<old_n)
-			{
-				for(int i=n; i<old_n; i++)
-				{
-					if(data[i]) delete data[i];
-					data[i] = 0;
-				}
-			}
-			data.resize(n);
-			if(n>old_n)
-			{
-				for(int i=old_n; i<n; i++)
-				{
-					data[i] = new std::vector<T>;
-				}
-			}
-			if(old_m!=m)
-			{
-				for(int i=0; i<n; i++)
-					data[i]->resize(m);
-			} else if(n>old_n)
-			{
-				for(int i=old_n; i<n; i++)
-					data[i]->resize(m);
-			}
-		} else if(old_m!=m)
-		{
-			for(int i=0; i<n; i++)
-			{
-				data[i]->resize(m);
-			}
-		}
-		old_n = n;
-		old_m = m;
-	};
 	void resize(int _n, int _m)
 	{
+		if(_m!=m && n>0)
+		{
+			std::vector<T> new_data(_n*_m);
+			const int rows = _n<n ? _n : n;
+			const int cols = _m<m ? _m : m;
+			for(int i=0; i<rows; i++)
+				for(int j=0; j<cols; j++)
+					new_data[i*_m + j] = _data[i*m + j];
+			_data.swap(new_data);
+		} else
+			_data.resize(_n*_m);
 		n = _n;
 		m = _m;
-		resize();
 	}
 	inline T& operator()(int i, int j)
 	{
-		return (*data[i])[j];
+		return _data[i*m + j];
+	}
+	inline T* data()
+	{
+		return _data.empty() ? 0 : &_data[0];
 	}
 };
 
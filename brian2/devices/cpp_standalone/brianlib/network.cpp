@@ -1,10 +1,27 @@
 #include "network.h"
+#include<algorithm>
 
 #define Clock_epsilon 1e-14
+// The maximum number of steps in the precomputed cycle of clock updates
+#define Max_clock_cycle_steps 100000
+
+namespace {
+	long gcd(long a, long b)
+	{
+		while(b != 0)
+		{
+			long r = a % b;
+			a = b;
+			b = r;
+		}
+		return a;
+	};
+};
 
 Network::Network()
 {
 	t = 0.0;
+	curclocks = &filtered_clocks;
 }
 
 void Network::clear()
@@ -14,7 +31,7 @@ void Network::clear()
 
 void Network::add(Clock* clock, codeobj_func func)
 {
-	objects.push_back(std::make_pair<Clock*, codeobj_func>(clock, func));
+	objects.push_back(std::make_pair(clock, func));
 }
 
 void Network::run(double duration)
@@ -27,6 +44,7 @@ void Network::run(double duration)
 	{
 		(*i)->set_interval(t, t_end);
 	}
+	start_cycle();
 	Clock* clock = next_clocks();
 	while(clock->running())
 	{
@@ -35,13 +53,13 @@ void Network::run(double duration)
 		{
 			Clock *obj_clock = objects[i].first;
 			// Only execute the object if it uses the right clock for this step
-			if (curclocks.find(obj_clock) != curclocks.end())
+			if (curclocks->find(obj_clock) != curclocks->end())
 			{
                 codeobj_func func = objects[i].second;
                 func(t);
 			}
 		}
-		for(std::set<Clock*>::iterator i=curclocks.begin(); i!=curclocks.end(); i++)
+		for(std::set<Clock*>::iterator i=curclocks->begin(); i!=curclocks->end(); i++)
 		{
 			(*i)->tick();
 		}
@@ -58,10 +76,162 @@ void Network::compute_clocks()
 		Clock *clock = objects[i].first;
 		clocks.insert(clock);
 	}
+	if(compute_periods())
+		compute_cycle();
+}
+
+bool Network::compute_periods()
+{
+	// Express the time steps of all clocks as integer multiples of a common
+	// base time step (if they are close to simple fractions of each other)
+	periods.clear();
+	if(clocks.empty())
+		return false;
+	double min_dt = (*clocks.begin())->dt;
+	for(std::set<Clock*>::iterator i=clocks.begin(); i!=clocks.end(); i++)
+		min_dt = std::min(min_dt, (*i)->dt);
+	std::map<Clock*, std::pair<long, long> > ratios;
+	long base = 1;
+	for(std::set<Clock*>::iterator i=clocks.begin(); i!=clocks.end(); i++)
+	{
+		Clock *clock = *i;
+		double ratio = clock->dt / min_dt;
+		long numerator = 0;
+		long denominator;
+		for(denominator=1; denominator<=1000; denominator++)
+		{
+			numerator = (long)(ratio*denominator + 0.5);
+			if(fabs((double)numerator/denominator*min_dt - clock->dt) <= Clock_epsilon*clock->dt)
+				break;
+		}
+		if(denominator > 1000)
+			return false;
+		ratios[clock] = std::make_pair(numerator, denominator);
+		// least common multiple of the denominators
+		base = base / gcd(base, denominator) * denominator;
+	}
+	for(std::map<Clock*, std::pair<long, long> >::iterator i=ratios.begin(); i!=ratios.end(); i++)
+		periods[i->first] = i->second.first * (base / i->second.second);
+	return true;
+}
+
+void Network::compute_cycle()
+{
+	// Determine the periodic pattern of clock updates, it repeats after the
+	// least common multiple of the clock periods
+	cycle_offsets.clear();
+	cycle_clocks.clear();
+	cycle_minclocks.clear();
+	long max_period = 1;
+	for(std::map<Clock*, long>::iterator i=periods.begin(); i!=periods.end(); i++)
+		max_period = std::max(max_period, i->second);
+	cycle_length = 1;
+	for(std::map<Clock*, long>::iterator i=periods.begin(); i!=periods.end(); i++)
+	{
+		cycle_length = cycle_length / gcd(cycle_length, i->second) * i->second;
+		if(cycle_length > Max_clock_cycle_steps * max_period)
+		{
+			periods.clear();
+			return;
+		}
+	}
+	long steps = 0;
+	for(std::map<Clock*, long>::iterator i=periods.begin(); i!=periods.end(); i++)
+		steps += cycle_length / i->second;
+	if(steps > Max_clock_cycle_steps)
+	{
+		periods.clear();
+		return;
+	}
+	std::map<long, std::set<Clock*> > clocks_for_offset;
+	for(std::map<Clock*, long>::iterator i=periods.begin(); i!=periods.end(); i++)
+		for(long offset=0; offset<cycle_length; offset+=i->second)
+			clocks_for_offset[offset].insert(i->first);
+	for(std::map<long, std::set<Clock*> >::iterator i=clocks_for_offset.begin(); i!=clocks_for_offset.end(); i++)
+	{
+		Clock *minclock = *(i->second.begin());
+		for(std::set<Clock*>::iterator j=i->second.begin(); j!=i->second.end(); j++)
+			if(periods[*j] < periods[minclock])
+				minclock = *j;
+		cycle_offsets.push_back(i->first);
+		cycle_clocks.push_back(i->second);
+		cycle_minclocks.push_back(minclock);
+	}
+}
+
+void Network::start_cycle()
+{
+	// Determine the first step of the run in the cycle of clock updates (all
+	// times are measured as integer numbers of base time steps)
+	if(periods.empty())
+		return;
+	long start_tick = 0;
+	aligned_tick = 0;
+	end_tick = 0;
+	end_clock = NULL;
+	for(std::set<Clock*>::iterator i=clocks.begin(); i!=clocks.end(); i++)
+	{
+		Clock *clock = *i;
+		long clock_start = clock->i * periods[clock];
+		long clock_end = clock->i_end * periods[clock];
+		if(end_clock == NULL || clock_start < start_tick)
+			start_tick = clock_start;
+		// Clocks can start later if the start time of the run is not a
+		// multiple of their time step, until all of them have started, the
+		// clocks have to be checked individually
+		if(end_clock == NULL || clock_start > aligned_tick)
+			aligned_tick = clock_start;
+		if(end_clock == NULL || clock_end < end_tick)
+		{
+			end_tick = clock_end;
+			end_clock = clock;
+		}
+	}
+	cycle_start = start_tick - start_tick % cycle_length;
+	cycle_position = std::lower_bound(cycle_offsets.begin(), cycle_offsets.end(),
+	                                  start_tick % cycle_length) - cycle_offsets.begin();
 }
 
 Clock* Network::next_clocks()
 {
+	if(!periods.empty())
+	{
+		// Look up the next step in the cycle of clock updates
+		while(true)
+		{
+			if(cycle_position == cycle_offsets.size())
+			{
+				cycle_position = 0;
+				cycle_start += cycle_length;
+			}
+			long tick = cycle_start + cycle_offsets[cycle_position];
+			size_t position = cycle_position;
+			cycle_position++;
+			if(tick >= end_tick)
+			{
+				// The clock that reaches the end of the run first (it is no
+				// longer running)
+				return end_clock;
+			}
+			if(tick >= aligned_tick)
+			{
+				curclocks = &cycle_clocks[position];
+				return cycle_minclocks[position];
+			}
+			filtered_clocks.clear();
+			for(std::set<Clock*>::iterator i=cycle_clocks[position].begin(); i!=cycle_clocks[position].end(); i++)
+			{
+				Clock *clock = *i;
+				if(clock->i * periods[clock] == tick)
+					filtered_clocks.insert(clock);
+			}
+			if(!filtered_clocks.empty())
+			{
+				curclocks = &filtered_clocks;
+				return *filtered_clocks.begin();
+			}
+		}
+	}
 	// find minclock, clock with smallest t value
 	Clock *minclock = *clocks.begin();
 	for(std::set<Clock*>::iterator i=clocks.begin(); i!=clocks.end(); i++)
@@ -71,14 +241,15 @@ Clock* Network::next_clocks()
 			minclock = clock;
 	}
 	// find set of equal clocks
-	curclocks.clear();
+	filtered_clocks.clear();
 	double t = minclock->t();
 	for(std::set<Clock*>::iterator i=clocks.begin(); i!=clocks.end(); i++)
 	{
 		Clock *clock = *i;
 		double s = clock->t();
 		if(s==t or fabs(s-t)<=Clock_epsilon)
-			curclocks.insert(clock);
+			filtered_clocks.insert(clock);
 	}
+	curclocks = &filtered_clocks;
 	return minclock;
 }
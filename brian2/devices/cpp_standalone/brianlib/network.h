@@ -4,14 +4,34 @@
 #include<vector>
 #include<utility>
 #include<set>
+#include<map>
 #include "clocks.h"
 
 typedef void (*codeobj_func)(double);
 
 class Network
 {
-	std::set<Clock*> clocks, curclocks;
+	std::set<Clock*> clocks, filtered_clocks;
+	// The clocks to update in the current step
+	std::set<Clock*> *curclocks;
+	// The time steps of the clocks as integer multiples of a common base time
+	// step (empty if the time steps are not multiples of each other)
+	std::map<Clock*, long> periods;
+	// The periodic pattern of clock updates: the offsets (in base time steps)
+	// within the cycle at which clocks are updated, the clocks updated at
+	// these offsets and the clock determining the time
+	long cycle_length;
+	std::vector<long> cycle_offsets;
+	std::vector< std::set<Clock*> > cycle_clocks;
+	std::vector<Clock*> cycle_minclocks;
+	// The current position in the cycle during a run
+	long cycle_start, aligned_tick, end_tick;
+	size_t cycle_position;
+	Clock *end_clock;
 	void compute_clocks();
+	bool compute_periods();
+	void compute_cycle();
+	void start_cycle();
 	Clock* next_clocks();
 public:
 	std::vector< std::pair< Clock*, codeobj_func > > objects;
@@ -5,7 +5,8 @@ from brian2.codegen.codeobject import CodeObject
 from brian2.codegen.templates import Templater
 from brian2.codegen.languages.cpp_lang import CPPLanguage
 from brian2.devices.device import get_device
-from brian2.codegen.languages.cpp_lang import c_data_type
+from brian2.codegen.languages.cpp_lang import c_data_type, rng_support_code
+from brian2.core.functions import DEFAULT_FUNCTIONS, FunctionImplementation
 
 __all__ = ['CPPStandaloneCodeObject']
 
@@ -27,3 +28,19 @@ class CPPStandaloneCodeObject(CodeObject):
 
     def run(self):
         get_device().main_queue.append(('run_code_object', (self,)))
+
+
+# Random numbers are drawn from the same counter-based generator as in the
+# runtime targets. The key is set in main (see brianlib/common_math.h), every
+# code object that draws random numbers starts a new execution in its
+# %CONSTANTS% (see CPPStandaloneDevice.build). Random numbers do not depend on
+# the order in which they are drawn and therefore not on the number of threads.
+rng_code = {'support_code': rng_support_code,
+            'hashdefine_code': '''
+    #define _rand(_vectorisation_idx, _site) _philox_rand(_brian_rng_key, _rng_execution, _vectorisation_idx, _site)
+    #define _randn(_vectorisation_idx, _site) _philox_randn(_brian_rng_key, _rng_execution, _vectorisation_idx, _site)
+    '''}
+DEFAULT_FUNCTIONS['rand'].implementations[CPPStandaloneCodeObject] = FunctionImplementation('_rand',
+                                                                                            code=rng_code)
+DEFAULT_FUNCTIONS['randn'].implementations[CPPStandaloneCodeObject] = FunctionImplementation('_randn',
+                                                                                             code=rng_code)
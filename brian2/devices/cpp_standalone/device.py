@@ -3,6 +3,7 @@ Module implementing the C++ "standalone" device.
 '''
 import numpy
 import os
+import re
 import shutil
 import subprocess
 import inspect
@@ -15,9 +16,11 @@ from brian2.core.namespace import get_local_namespace
 from brian2.devices.device import Device, all_devices
 from brian2.core.preferences import brian_prefs
 from brian2.core.variables import *
+from brian2.parsing.statements import parse_statement
 from brian2.synapses.synapses import Synapses
-from brian2.utils.filetools import copy_directory, ensure_directory, in_directory
-from brian2.utils.stringtools import word_substitute
+from brian2.utils.filetools import (copy_directory, ensure_directory,
+                                    in_directory, write_file_if_changed)
+from brian2.utils.stringtools import word_substitute, deindent, strip_empty_lines
 from brian2.codegen.languages.cpp_lang import c_data_type
 from brian2.units.fundamentalunits import (Quantity, Unit, is_scalar_type,
                                            fail_for_dimension_mismatch,
@@ -45,6 +48,36 @@ def freeze(code, ns):
     return code
 
 
+def parallel_synaptic_index(abstract_code, variables, variable_indices):
+    '''
+    Determine how the synaptic propagation code can be split between threads.
+    The code can be run in parallel if all variables it writes to are
+    synaptic variables (returns ``'_idx'``), or if the only other variables it
+    writes to are either all pre- or all postsynaptic (returns
+    ``'_presynaptic_idx'`` or ``'_postsynaptic_idx'``, the synapses then have to
+    be partitioned according to that index). Returns ``None`` if the code has
+    to be run serially.
+    '''
+    indices = set()
+    for line in re.split(r'[;\n]', strip_empty_lines(deindent(abstract_code))):
+        if not line.strip():
+            continue
+        var, op, expr = parse_statement(line)
+        if var not in variables:
+            continue  # a temporary variable
+        if getattr(variables[var], 'scalar', False):
+            return None
+        indices.add(variable_indices[var])
+    indices.discard('_idx')
+    if len(indices) == 0:
+        return '_idx'
+    elif len(indices) == 1:
+        index = indices.pop()
+        if index in ('_presynaptic_idx', '_postsynaptic_idx'):
+            return index
+    return None
+
+
 class CPPStandaloneDevice(Device):
     '''
     The `Device` used for C++ standalone simulations.
@@ -194,6 +227,11 @@ class CPPStandaloneDevice(Device):
 
     def code_object(self, owner, name, abstract_code, variables, template_name,
                     variable_indices, codeobj_class=None, template_kwds=None):
+        if template_name == 'synapses':
+            template_kwds = dict(template_kwds or {})
+            template_kwds['_parallel_index'] = parallel_synaptic_index(abstract_code,
+                                                                       variables,
+                                                                       variable_indices)
         codeobj = super(CPPStandaloneDevice, self).code_object(owner, name, abstract_code, variables,
                                                                template_name, variable_indices,
                                                                codeobj_class=codeobj_class,
@@ -203,7 +241,47 @@ class CPPStandaloneDevice(Device):
         return codeobj
 
     def build(self, project_dir='output', compile_project=True, run_project=False, debug=True,
-              with_output=True):
+              with_output=True, jobs=None, openmp_threads=0, seed=None):
+        '''
+        Write the C++ project to ``project_dir`` and optionally compile and
+        run it.
+
+        The project is compiled with the generated ``makefile``. Source files
+        are only rewritten if their content changed, rebuilding a project in
+        the same directory therefore only recompiles the changed code objects.
+
+        Parameters
+        ----------
+        project_dir : str, optional
+            The directory for the project, defaults to ``'output'``.
+        compile_project : bool, optional
+            Whether to compile the project. Defaults to ``True``.
+        run_project : bool, optional
+            Whether to run the compiled project. Defaults to ``False``.
+        debug : bool, optional
+            Whether to compile with debug information instead of
+            optimizations. Defaults to ``True``.
+        with_output : bool, optional
+            Whether to show the output of the running project. Defaults to
+            ``True``.
+        jobs : int, optional
+            The number of files that are compiled in parallel. Defaults to
+            the `codegen.max_compile_processes` preference.
+        openmp_threads : int, optional
+            The number of threads used to run the simulation. If 0 (the
+            default), the project is compiled without OpenMP and runs in a
+            single thread. Otherwise, state updates, thresholds, resets,
+            summed variables and synaptic propagation are split between the
+            threads.
+        seed : int, optional
+            The seed for the random number generator. For a given seed, the
+            results of a simulation are reproducible (independent of the
+            number of threads).
+            Defaults to ``None``, meaning that the seed is based on the
+            current time.
+        '''
+        if jobs is None:
+            jobs = brian_prefs['codegen.max_compile_processes']
         ensure_directory(project_dir)
         for d in ['code_objects', 'results', 'static_arrays']:
             ensure_directory(os.path.join(project_dir, d))
@@ -243,8 +321,8 @@ class CPPStandaloneDevice(Device):
                                                             networks=networks,
                                                             )
         logger.debug("objects: "+str(arr_tmp))
-        open(os.path.join(project_dir, 'objects.cpp'), 'w').write(arr_tmp.cpp_file)
-        open(os.path.join(project_dir, 'objects.h'), 'w').write(arr_tmp.h_file)
+        write_file_if_changed(os.path.join(project_dir, 'objects.cpp'), arr_tmp.cpp_file)
+        write_file_if_changed(os.path.join(project_dir, 'objects.h'), arr_tmp.h_file)
 
         main_lines = []
         for func, args in self.main_queue:
@@ -328,11 +406,20 @@ class CPPStandaloneDevice(Device):
             ns = codeobj.variables
             # TODO: fix these freeze/CONSTANTS hacks somehow - they work but not elegant.
             code = freeze(codeobj.code.cpp_file, ns)
-            code = code.replace('%CONSTANTS%', '\n'.join(code_object_defs[codeobj.name]))
+            # Several names can refer to the same array, define it only once
+            defs = []
+            for line in code_object_defs[codeobj.name]:
+                if line not in defs:
+                    defs.append(line)
+            # Code objects drawing random numbers start a new execution of the
+            # random number generator every time they are run
+            if '_rng_execution' in code:
+                defs.append('const uint64_t _rng_execution = _brian_next_rng_execution();')
+            code = code.replace('%CONSTANTS%', '\n'.join(defs))
             code = '#include "objects.h"\n'+code
             
-            open(os.path.join(project_dir, 'code_objects', codeobj.name+'.cpp'), 'w').write(code)
-            open(os.path.join(project_dir, 'code_objects', codeobj.name+'.h'), 'w').write(codeobj.code.h_file)
+            write_file_if_changed(os.path.join(project_dir, 'code_objects', codeobj.name+'.cpp'), code)
+            write_file_if_changed(os.path.join(project_dir, 'code_objects', codeobj.name+'.h'), codeobj.code.h_file)
                     
         # The code_objects are passed in the right order to run them because they were
         # sorted by the Network object. To support multiple clocks we'll need to be
@@ -341,9 +428,11 @@ class CPPStandaloneDevice(Device):
                                                           main_lines=main_lines,
                                                           code_objects=self.code_objects.values(),
                                                           dt=float(defaultclock.dt),
+                                                          openmp_threads=openmp_threads,
+                                                          seed='time(NULL)' if seed is None else '%dULL' % seed,
                                                           )
         logger.debug("main: "+str(main_tmp))
-        open(os.path.join(project_dir, 'main.cpp'), 'w').write(main_tmp)
+        write_file_if_changed(os.path.join(project_dir, 'main.cpp'), main_tmp)
 
         # Copy the brianlibdirectory
         brianlib_dir = os.path.join(os.path.split(inspect.getsourcefile(CPPStandaloneCodeObject))[0],
@@ -351,17 +440,35 @@ class CPPStandaloneDevice(Device):
         copy_directory(brianlib_dir, os.path.join(project_dir, 'brianlib'))
 
         # Copy the CSpikeQueue implementation
-        shutil.copy(os.path.join(os.path.split(inspect.getsourcefile(Synapses))[0],
-                                    'cspikequeue.cpp'),
-                    os.path.join(project_dir, 'brianlib', 'spikequeue.h'))
+        with open(os.path.join(os.path.split(inspect.getsourcefile(Synapses))[0],
+                               'cspikequeue.cpp'), 'rb') as f:
+            write_file_if_changed(os.path.join(project_dir, 'brianlib', 'spikequeue.h'),
+                                  f.read())
+
+        # Write the makefile, only the current code objects are compiled (the
+        # directory might contain files from previous builds)
+        source_files = (['main.cpp', 'objects.cpp'] +
+                        ['code_objects/%s.cpp' % codeobj.name
+                         for codeobj in self.code_objects.itervalues()] +
+                        sorted('brianlib/' + fname
+                               for fname in os.listdir(brianlib_dir)
+                               if fname.endswith('.cpp')))
+        if debug:
+            compiler_flags = '-g'
+        else:
+            compiler_flags = '-O3 -ffast-math -march=native'
+        if openmp_threads:
+            compiler_flags += ' -fopenmp'
+        makefile_tmp = CPPStandaloneCodeObject.templater.makefile(None,
+                                                                  source_files=source_files,
+                                                                  compiler_flags=compiler_flags)
+        write_file_if_changed(os.path.join(project_dir, 'makefile'),
+                              makefile_tmp + '\n')
 
         # build the project
         if compile_project:
             with in_directory(project_dir):
-                if debug:
-                    x = os.system('g++ -I. -g *.cpp code_objects/*.cpp brianlib/*.cpp -o main')
-                else:
-                    x = os.system('g++ -I. -O3 -ffast-math -march=native *.cpp code_objects/*.cpp brianlib/*.cpp -o main')
+                x = os.system('make -j%d' % jobs)
                 if x==0:
                     if run_project:
                         if not with_output:
@@ -398,6 +505,8 @@ class CPPStandaloneDevice(Device):
         # running order, assuming that there is only one clock
         code_objects = []
         for obj in net.objects:
+            if not obj.active:
+                continue
             for codeobj in obj._code_objects:
                 code_objects.append((obj.clock, codeobj))
         
@@ -1,5 +1,6 @@
 #include<stdlib.h>
 #include "objects.h"
+#include "brianlib/common_math.h"
 #include<ctime>
 
 {% for codeobj in code_objects %}
@@ -13,7 +14,10 @@ int main(void)
 	std::clock_t start = std::clock();
 	_init_arrays();
 	_load_arrays();
-	srand((unsigned int)time(NULL));
+	{% if openmp_threads %}
+	omp_set_num_threads({{openmp_threads}});
+	{% endif %}
+	_brian_seed_rng((uint64_t){{seed}});
 	const double dt = {{dt}};
 	double t = 0.0;
 	{% for main_line in main_lines %}
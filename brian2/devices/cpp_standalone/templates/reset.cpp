@@ -5,7 +5,15 @@
 	const int *_spikes = {{_spikespace}};
 	const int _num_spikes = {{_spikespace}}[N];
 
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
 	//// MAIN CODE ////////////
+	// Every neuron appears at most once in the spike space, the spiking
+	// neurons can therefore be reset in parallel
+	#pragma omp parallel for schedule(static)
 	for(int _index_spikes=0; _index_spikes<_num_spikes; _index_spikes++)
 	{
 		const int _idx = _spikes[_index_spikes];
@@ -1,16 +1,47 @@
 {% extends 'common_group.cpp' %}
 
 {% block maincode %}
-    {# USES_VARIABLES { _t, _indices } #}
+    {# USES_VARIABLES { _t, _clock_i, _indices, _num_recorded, _window_start,
+                        _window_stop, _last_interval, _num_samples } #}
 
-    {{_dynamic__t}}.push_back(t);
+    // Only record in the recording windows, and every {{_every}} time steps
+    // (or in every time step, if values are averaged over the interval)
+    bool _record = false;
+    for (int _w = 0; _w < _num_window_start; _w++)
+    {
+        if (_clock_i >= {{_window_start}}[_w] && _clock_i < {{_window_stop}}[_w])
+        {
+            _record = true;
+            break;
+        }
+    }
+    {% if _mean %}
+    const int _interval = _clock_i / {{_every}};
+    const bool _new_row = _interval != {{_last_interval}}[0];
+    {% else %}
+    _record = _record && (_clock_i % {{_every}} == 0);
+    const bool _new_row = true;
+    {% endif %}
+    if (!_record)
+        return;
 
-    const int _new_size = {{_dynamic__t}}.size();
-    // Resize the dynamic arrays
-    {% for var in _recorded_variables.values() %}
-    {% set _recorded =  get_array_name(var, access_data=False) %}
-    {{_recorded}}.resize(_new_size, _num_indices);
-    {% endfor %}
+    int _n, _num_samples_row;
+    if (_new_row)
+    {
+        {{_dynamic__t}}.push_back(t);
+        _n = {{_dynamic__t}}.size() - 1;
+        // Resize the dynamic arrays (the storage grows geometrically, adding a
+        // row has an amortised constant cost)
+        {% for var in _recorded_variables.values() %}
+        {% set _recorded =  get_array_name(var, access_data=False) %}
+        {{_recorded}}.resize(_n + 1, _num_indices);
+        {% endfor %}
+        _num_samples_row = 1;
+    } else
+    {
+        _n = {{_dynamic__t}}.size() - 1;
+        _num_samples_row = {{_num_samples}}[0] + 1;
+    }
 
     for (int _i = 0; _i < _num_indices; _i++)
     {
@@ -21,11 +52,23 @@
 
             {% for varname, var in _recorded_variables.items() %}
             {% set _recorded =  get_array_name(var, access_data=False) %}
-            {{_recorded}}(_new_size-1, _i) = _to_record_{{varname}};
+            {% if _mean %}
+            if (_new_row)
+                {{_recorded}}(_n, _i) = _to_record_{{varname}};
+            else
+                {{_recorded}}(_n, _i) += (_to_record_{{varname}} - {{_recorded}}(_n, _i)) / _num_samples_row;
+            {% else %}
+            {{_recorded}}(_n, _i) = _to_record_{{varname}};
+            {% endif %}
             {% endfor %}
         {% endblock %}
     }
 
+    {{_num_recorded}}[0] = _n + 1;
+    {% if _mean %}
+    {{_last_interval}}[0] = _interval;
+    {% endif %}
+    {{_num_samples}}[0] = _num_samples_row;
 {% endblock %}
 
 {% block extra_functions_cpp %}
@@ -45,15 +88,12 @@ void _write_{{codeobj_name}}()
 	{% for varname, var in _recorded_variables.items() %}
 	{
 	    {% set _recorded =  get_array_name(var, access_data=False) %}
-	    const int _num_indices = {{_recorded}}.m;
-        const int _num_times = {{_dynamic__t}}.size();
         outfile.open("results/{{codeobj_name}}_{{varname}}", ios::binary | ios::out);
         if(outfile.is_open())
         {
-            for (int s=0; s<_num_times; s++)
-            {
-            	outfile.write(reinterpret_cast<char*>(&{{_recorded}}(s, 0)), _num_indices*sizeof({{_recorded}}(0, 0)));
-            }
+            // The values are stored contiguously, one row per time step
+            outfile.write(reinterpret_cast<char*>({{_recorded}}.data()),
+                          {{_recorded}}.n*{{_recorded}}.m*sizeof({{_recorded}}(0, 0)));
             outfile.close();
         } else
         {
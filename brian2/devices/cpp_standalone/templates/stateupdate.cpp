@@ -1 +1,20 @@
 {% extends 'common_group.cpp' %}
+
+{% block maincode %}
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
+	//// MAIN CODE ////////////
+	// The neurons are updated independently, the loop is split between the
+	// threads when compiled with OpenMP support
+	#pragma omp parallel for schedule(static)
+	for(int _idx=0; _idx<N; _idx++)
+	{
+		const int _vectorisation_idx = _idx;
+		{% for line in code_lines %}
+		{{line}}
+		{% endfor %}
+	}
+{% endblock %}
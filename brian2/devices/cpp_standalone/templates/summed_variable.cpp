@@ -3,15 +3,43 @@
 {% block maincode %}
     {# USES_VARIABLES { _synaptic_post, _synaptic_pre, N_post } #}
 	//// MAIN CODE ////////////
-	// Set all the target variable values to zero
-	for (int _target_idx=0; _target_idx<N_post; _target_idx++)
-	    _ptr{{_target_var_array}}[_target_idx] = 0.0;
-
-	for(int _idx=0; _idx<_num_synaptic_post; _idx++)
+	{% set _target_var_array = get_array_name(_target_var) %}
+	// The synapses are split into buckets by their target neuron and each
+	// thread sums the synaptic values for the target neurons of its buckets,
+	// the synapses are processed in the same order for any number of threads.
+	// Connectivity does not change during a run, the buckets are only
+	// determined again when the number of synapses or threads changed.
+	static std::vector< std::vector<int32_t> > _bucket_synapses;
+	static int _bucketed_synapses = -1;
+	const int _num_buckets = _brian_max_threads();
+	if (_bucketed_synapses != _num_synaptic_post ||
+		(int)_bucket_synapses.size() != _num_buckets)
+	{
+		_bucket_synapses.assign(_num_buckets, std::vector<int32_t>());
+		for(int _idx=0; _idx<_num_synaptic_post; _idx++)
+			_bucket_synapses[{{_synaptic_post}}[_idx] % _num_buckets].push_back(_idx);
+		_bucketed_synapses = _num_synaptic_post;
+	}
+	#pragma omp parallel
 	{
-		{% for line in code_lines %}
-		{{line}}
-		{% endfor %}
-		_ptr{{_target_var_array}}[_postsynaptic_idx] += _synaptic_var;
+		const int _thread = _brian_thread_num();
+		const int _num_threads = _brian_num_threads();
+		for (int _bucket=_thread; _bucket<_num_buckets; _bucket+=_num_threads)
+		{
+			// Set the target variable values of the bucket to zero
+			for (int _target_idx=_bucket; _target_idx<N_post; _target_idx+=_num_buckets)
+			    {{_target_var_array}}[_target_idx] = 0.0;
+
+			const std::vector<int32_t> &_synapses = _bucket_synapses[_bucket];
+			for(unsigned int _synapse_idx=0; _synapse_idx<_synapses.size(); _synapse_idx++)
+			{
+				const int32_t _idx = _synapses[_synapse_idx];
+				const int32_t _target_idx = {{_synaptic_post}}[_idx];
+				{% for line in code_lines %}
+				{{line}}
+				{% endfor %}
+				{{_target_var_array}}[_target_idx] += _synaptic_var;
+			}
+		}
 	}
 {% endblock %}
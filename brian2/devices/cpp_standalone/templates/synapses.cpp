@@ -2,18 +2,75 @@
 
 {% block maincode %}
     // This is only needed for the _debugmsg function below
-    {# USES_VARIABLES { _synaptic_pre } #}
+    {# USES_VARIABLES { _synaptic_pre, _synaptic_post } #}
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
 	std::vector<int32_t> *_spiking_synapses = {{pathway.name}}.queue->peek();
 	const unsigned int _num_spiking_synapses = _spiking_synapses->size();
+	{# _parallel_index is the index of the variables the code writes to (see
+	   CPPStandaloneDevice.code_object), None if the synapses have to be
+	   processed serially #}
+	{% if _parallel_index == '_postsynaptic_idx' %}
+	{% set _partition_array = _synaptic_post %}
+	{% elif _parallel_index == '_presynaptic_idx' %}
+	{% set _partition_array = _synaptic_pre %}
+	{% endif %}
+	{% if _partition_array is defined %}
+	// To avoid concurrent writes to the same neuron, the spiking synapses are
+	// split into buckets by the neuron they write to and each thread only
+	// processes the synapses of its buckets (in the order of the queue, the
+	// results therefore do not depend on the number of threads)
+	static std::vector< std::vector<int32_t> > _bucket_synapses;
+	const int _num_buckets = _brian_max_threads();
+	_bucket_synapses.resize(_num_buckets);
+	for(int _bucket=0; _bucket<_num_buckets; _bucket++)
+		_bucket_synapses[_bucket].clear();
 	for(unsigned int _spiking_synapse_idx=0;
 		_spiking_synapse_idx<_num_spiking_synapses;
 		_spiking_synapse_idx++)
 	{
 		const int32_t _idx = (*_spiking_synapses)[_spiking_synapse_idx];
-		const int32_t _vectorisation_idx = _idx;
-		{% for line in code_lines %}
-		{{line}}
-		{% endfor %}
+		_bucket_synapses[{{_partition_array}}[_idx] % _num_buckets].push_back(_idx);
+	}
+	{% endif %}
+	{% if _parallel_index is not none %}
+	#pragma omp parallel
+	{% endif %}
+	{
+		{% if _partition_array is defined %}
+		const int _thread = _brian_thread_num();
+		const int _num_threads = _brian_num_threads();
+		for (int _bucket=_thread; _bucket<_num_buckets; _bucket+=_num_threads)
+		{
+			const std::vector<int32_t> &_synapses = _bucket_synapses[_bucket];
+			for(unsigned int _synapse_idx=0; _synapse_idx<_synapses.size(); _synapse_idx++)
+			{
+				const int32_t _idx = _synapses[_synapse_idx];
+				const int32_t _vectorisation_idx = _idx;
+				{% for line in code_lines %}
+				{{line}}
+				{% endfor %}
+			}
+		}
+		{% else %}
+		{% if _parallel_index == '_idx' %}
+		// The code only changes synaptic variables
+		#pragma omp for schedule(static)
+		{% endif %}
+		for(unsigned int _spiking_synapse_idx=0;
+			_spiking_synapse_idx<_num_spiking_synapses;
+			_spiking_synapse_idx++)
+		{
+			const int32_t _idx = (*_spiking_synapses)[_spiking_synapse_idx];
+			const int32_t _vectorisation_idx = _idx;
+			{% for line in code_lines %}
+			{{line}}
+			{% endfor %}
+		}
+		{% endif %}
 	}
 {% endblock %}
 
@@ -1,13 +1,62 @@
 {% extends 'common_group.cpp' %}
 
+{% block extra_headers %}
+#include<algorithm>
+#include<vector>
+{% endblock %}
+
 {% block maincode %}
 	{# USES_VARIABLES { t, _spikespace } #}
 	// not_refractory and lastspike are added as needed_variables in the
 	// Thresholder class, we cannot use the USES_VARIABLE mechanism
 	// conditionally
 
+	//// SCALAR CODE //////////
+	{% for line in scalar_code_lines %}
+	{{line}}
+	{% endfor %}
+
 	//// MAIN CODE ////////////
 	long _cpp_numspikes = 0;
+	#ifdef _OPENMP
+	// With a static schedule, every thread checks the condition for a
+	// contiguous chunk of neurons, chunks being assigned in order of the
+	// thread numbers. Each thread collects its spikes locally, they are then
+	// copied to the spike space at the offset given by the spike counts of
+	// the preceding threads, keeping the spike space sorted.
+	std::vector<long> _thread_offsets(omp_get_max_threads() + 1, 0);
+	#pragma omp parallel
+	{
+		std::vector<int32_t> _local_spikes;
+		#pragma omp for schedule(static)
+		for(int _idx=0; _idx<N; _idx++)
+		{
+			const int _vectorisation_idx = _idx;
+			{% for line in code_lines %}
+			{{line}}
+			{% endfor %}
+			if(_cond) {
+				_local_spikes.push_back(_idx);
+				{% if _uses_refractory %}
+				{{not_refractory}}[_idx] = false;
+				{{lastspike}}[_idx] = t;
+				{% endif %}
+			}
+		}
+		const int _thread = omp_get_thread_num();
+		_thread_offsets[_thread + 1] = _local_spikes.size();
+		#pragma omp barrier
+		#pragma omp single
+		{
+			const int _num_threads = omp_get_num_threads();
+			for(int _t=0; _t<_num_threads; _t++)
+				_thread_offsets[_t + 1] += _thread_offsets[_t];
+			_cpp_numspikes = _thread_offsets[_num_threads];
+		}
+		std::copy(_local_spikes.begin(), _local_spikes.end(),
+				  {{_spikespace}} + _thread_offsets[_thread]);
+	}
+	#else
 	for(int _idx=0; _idx<N; _idx++)
 	{
 	    const int _vectorisation_idx = _idx;
@@ -25,5 +74,6 @@
 			{% endif %}
 		}
 	}
+	#endif
 	{{_spikespace}}[N] = _cpp_numspikes;
 {% endblock %}
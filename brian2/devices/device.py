@@ -342,7 +342,7 @@ class Device(object):
                     value.implementations[codeobj_class]
                 except KeyError as ex:
                     # if we are dealing with numpy, add the default implementation
-                    if codeobj_class is NumpyCodeObject:
+                    if issubclass(codeobj_class, NumpyCodeObject):
                         add_numpy_implementation(value, value.pyfunc)
                     else:
                         raise NotImplementedError(('Cannot use function '
@@ -358,7 +358,8 @@ class Device(object):
                                   dtype=brian_prefs['core.default_scalar_dtype'],
                                   codeobj_class=codeobj_class,
                                   variable_indices=variable_indices,
-                                  iterate_all=iterate_all)
+                                  iterate_all=iterate_all,
+                                  scalar_code=template.allows_scalar_code)
         # Add the array names as keywords as well
         for varname, var in variables.iteritems():
             if isinstance(var, ArrayVariable):
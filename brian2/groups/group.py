@@ -265,9 +265,8 @@ class GroupCodeRunner(BrianObject):
             additional_variables = self.variables
         else:
             additional_variables = None
-        if self.check_units:
-            check_code_units(self.abstract_code, self.group,
-                             additional_variables, namespace)
+        # The units are checked in create_runner_codeobj (unless a code object
+        # from a previous run can be reused)
         self.codeobj = create_runner_codeobj(group=self.group,
                                              code=self.abstract_code,
                                              template_name=self.template,
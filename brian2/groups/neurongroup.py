@@ -10,6 +10,7 @@ from brian2.equations.equations import (Equations, DIFFERENTIAL_EQUATION,
                                         STATIC_EQUATION, PARAMETER)
 from brian2.equations.refractory import add_refractoriness
 from brian2.stateupdaters.base import StateUpdateMethod
+from brian2.stateupdaters.cache import cached_stateupdate_code
 from brian2.codegen.codeobject import check_code_units
 from brian2.core.preferences import brian_prefs
 from brian2.core.namespace import create_namespace
@@ -93,8 +94,9 @@ class StateUpdater(GroupCodeRunner):
         # Update the not_refractory variable for the refractory period mechanism
         self.abstract_code = get_refractory_code(self.group)
         
-        self.abstract_code += self.method(self.group.equations,
-                                          self.group.variables)
+        self.abstract_code += cached_stateupdate_code(self.method,
+                                                      self.group.equations,
+                                                      self.group.variables)
 
 
 class Thresholder(GroupCodeRunner):
@@ -153,6 +155,47 @@ class Resetter(GroupCodeRunner):
         self.abstract_code = self.group.reset
 
 
+class FusedUpdater(GroupCodeRunner):
+    '''
+    The `GroupCodeRunner` that performs the state update and the thresholding
+    of a `NeuronGroup` in a single code object, i.e. in a single loop over all
+    neurons (see the ``fused`` argument of `NeuronGroup`). It uses the
+    abstract code of the group's `StateUpdater` and `Thresholder`. The reset
+    is still performed by the group's `Resetter` in the 'resets' slot, after
+    the objects in the 'thresholds' and 'synapses' slots.
+    '''
+    def __init__(self, group):
+        if group._refractory is False:
+            template_kwds = {'_uses_refractory': False}
+            needed_variables = []
+        else:
+            template_kwds = {'_uses_refractory': True}
+            needed_variables = ['t', 'not_refractory', 'lastspike']
+        GroupCodeRunner.__init__(self, group,
+                                 'fused_update',
+                                 when=(group.clock, 'groups'),
+                                 name=group.name + '_fusedupdater*',
+                                 check_units=False,
+                                 needed_variables=needed_variables,
+                                 template_kwds=template_kwds)
+
+    def update_abstract_code(self):
+        self.abstract_code = {}
+        for key, runner in [('stateupdate', self.group.state_updater),
+                            ('threshold', self.group.thresholder)]:
+            if runner is not None:
+                runner.update_abstract_code()
+                self.abstract_code[key] = runner.abstract_code
+
+    def before_run(self, namespace):
+        # Generates the abstract code, units are not checked for the state
+        # update code (see StateUpdater)
+        GroupCodeRunner.before_run(self, namespace)
+        if 'threshold' in self.abstract_code:
+            check_code_units(self.abstract_code['threshold'], self.group,
+                             additional_namespace=namespace)
+
+
 class NeuronGroup(Group, SpikeSource):
     '''
     A group of neurons.
@@ -196,6 +239,10 @@ class NeuronGroup(Group, SpikeSource):
         The update clock to be used, or defaultclock if not specified.
     name : str, optional
         A unique name for the group, otherwise use ``neurongroup_0``, etc.
+    fused : bool, optional
+        Whether to perform the state update and the thresholding in a single
+        code object (i.e. with a single loop over the neurons in each time
+        step). Defaults to ``False``, see Notes below.
         
     Notes
     -----
@@ -203,7 +250,15 @@ class NeuronGroup(Group, SpikeSource):
     these are run at the 'groups', 'thresholds' and 'resets' slots (i.e. the
     values of `Scheduler.when` take these values). The `Scheduler.order`
     attribute is set to 0 initially, but this can be modified using the
-    attributes `state_updater`, `thresholder` and `resetter`.    
+    attributes `state_updater`, `thresholder` and `resetter`.
+
+    With ``fused=True``, the state update and the thresholding are instead
+    performed by a single `FusedUpdater` (stored in the `fused_updater`
+    attribute) in the 'groups' slot. This reduces the overhead per time step,
+    which can be significant for small groups. The `Resetter` is not fused,
+    it still runs in the 'resets' slot so that the results are the same as
+    without fusing (e.g. the reset overwrites synaptic effects received in
+    the time step of a spike).
     '''
     def __init__(self, N, model, method=None,
                  threshold=None,
@@ -212,7 +267,7 @@ class NeuronGroup(Group, SpikeSource):
                  namespace=None,
                  dtype=None,
                  clock=None, name='neurongroup*',
-                 codeobj_class=None):
+                 codeobj_class=None, fused=False):
         Group.__init__(self, when=clock, name=name)
 
         self.codeobj_class = codeobj_class
@@ -296,10 +351,23 @@ class NeuronGroup(Group, SpikeSource):
         #: Performs numerical integration step
         self.state_updater = StateUpdater(self, method)
 
+        #: Performs state update and thresholding at once (only used if the
+        #: group was created with ``fused=True``)
+        self.fused_updater = None
+
         # Creation of contained_objects that do the work
-        self.contained_objects.append(self.state_updater)
-        if self.thresholder is not None:
-            self.contained_objects.append(self.thresholder)
+        if fused:
+            self.fused_updater = FusedUpdater(self)
+            self.contained_objects.append(self.fused_updater)
+            # The state updater and thresholder only provide the abstract
+            # code, they should not run when collected by the MagicNetwork
+            self.state_updater.active = False
+            if self.thresholder is not None:
+                self.thresholder.active = False
+        else:
+            self.contained_objects.append(self.state_updater)
+            if self.thresholder is not None:
+                self.contained_objects.append(self.thresholder)
         if self.resetter is not None:
             self.contained_objects.append(self.resetter)
 
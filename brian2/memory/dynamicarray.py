@@ -41,7 +41,10 @@ class DynamicArray(object):
         resize in the first dimension.
         
     The array is initialised with zeros. The data is stored in the attribute
-    ``data`` which is a Numpy array.
+    ``data`` which is a Numpy array. The attribute ``generation`` is increased
+    whenever ``data`` is replaced by a new array (i.e. when the array is
+    resized), code holding on to ``data`` can use it to check whether it has
+    to fetch the array again.
     
     
     Some numpy methods are implemented and can work directly on the array object,
@@ -86,6 +89,7 @@ class DynamicArray(object):
         self.factor = factor
         self.use_numpy_resize = use_numpy_resize
         self.refcheck = refcheck
+        self.generation = 0
     
     def resize(self, newshape):
         '''
@@ -123,6 +127,7 @@ class DynamicArray(object):
                 self._data = newdata
         self.data = self._data[getslices(newshape)]
         self.shape = self.data.shape
+        self.generation += 1
         
     def shrink(self, newshape):
         '''
@@ -143,6 +148,7 @@ class DynamicArray(object):
             self._data = newdata
             self.shape = tuple(newshapearr)
             self.data = self._data
+            self.generation += 1
     
     def __getitem__(self, item):
         return self.data.__getitem__(item)
@@ -173,7 +179,7 @@ class DynamicArray1D(DynamicArray):
     '''
     def resize(self, newshape):
         shape, = self.shape # we work with int shapes only
-        if newshape<=shape:
+        if newshape==shape:
             return
         datashape, = self._data.shape
         if newshape>datashape:
@@ -187,6 +193,7 @@ class DynamicArray1D(DynamicArray):
                 self._data = newdata
         self.data = self._data[:newshape]
         self.shape = (newshape,)      
+        self.generation += 1
     
             
 if __name__=='__main__':
@@ -1,3 +1,4 @@
 from spikemonitor import *
 from statemonitor import *
-from ratemonitor import *
\ No newline at end of file
+from ratemonitor import *
+from storage import *
\ No newline at end of file
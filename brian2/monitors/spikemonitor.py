@@ -3,9 +3,11 @@ import numpy as np
 from brian2.core.base import BrianObject
 from brian2.core.scheduler import Scheduler
 from brian2.core.variables import Variables
+from brian2.devices.device import get_device, RuntimeDevice
 from brian2.units.allunits import second
 from brian2.units.fundamentalunits import Unit, Quantity
 from brian2.groups.group import GroupCodeRunner
+from brian2.monitors.storage import FileStorage
 
 __all__ = ['SpikeMonitor']
 
@@ -29,10 +31,22 @@ class SpikeMonitor(GroupCodeRunner):
         ``source.name+'_spikemonitor_0'``, etc.
     codeobj_class : class, optional
         The `CodeObject` class to run code with.
+    storage : `FileStorage`, optional
+        Store the recorded spikes in files instead of in memory, `i` and `t`
+        are then memory-mapped from the files.
     '''
     def __init__(self, source, record=True, when=None, name='spikemonitor*',
-                 codeobj_class=None):
+                 codeobj_class=None, storage=None):
         self.record = bool(record)
+        if storage is not None and not isinstance(storage, FileStorage):
+            raise TypeError(('storage has to be a FileStorage object, not '
+                             '%r.') % storage)
+        #: The `FileStorage` for the recorded spikes or ``None`` if they are
+        #: stored in memory
+        self.storage = storage
+        # The files for the arrays (created in the first run)
+        self._files = None
+        self._steps_since_flush = 0
 
         # run by default on source clock at the end
         scheduler = Scheduler(when)
@@ -67,27 +81,72 @@ class SpikeMonitor(GroupCodeRunner):
         '''
         raise NotImplementedError()
 
+    def before_run(self, namespace):
+        GroupCodeRunner.before_run(self, namespace)
+        if self.storage is not None and self._files is None:
+            if not isinstance(get_device(), RuntimeDevice):
+                raise NotImplementedError('Storing the recorded spikes in '
+                                          'files is only supported for the '
+                                          'runtime targets.')
+            self._files = dict((name, self.storage.open(self.name + name,
+                                                        self.variables[name].dtype))
+                               for name in ['_i', '_t'])
+
+    def run(self):
+        GroupCodeRunner.run(self)
+        if self.storage is not None:
+            self._steps_since_flush += 1
+            if self._steps_since_flush >= self.storage.flush_every:
+                self._flush()
+                self._steps_since_flush = 0
+
+    def after_run(self):
+        if self.storage is not None:
+            self._flush()
+
+    def _flush(self):
+        '''
+        Write the spikes in the buffer to the files of the storage and empty
+        the buffer.
+        '''
+        if len(self.variables['_i'].get_value()) == 0:
+            return
+        for name, npy_file in self._files.iteritems():
+            self.storage.write(npy_file, self.variables[name].get_value())
+            self.variables[name].resize(0)
+
+    def _recorded_values(self, name):
+        '''
+        Return a copy of the recorded values of the array `name` (``'_i'`` or
+        ``'_t'``) or, for spikes stored in files, a read-only memory-mapped
+        array.
+        '''
+        if self._files is not None:
+            self._flush()
+            self.storage.wait()
+            return self._files[name].read()
+        return self.variables[name].get_value().copy()
+
     @property
     def i(self):
         '''
         Array of recorded spike indices, with corresponding times `t`.
         '''
-        return self.variables['_i'].get_value().copy()
+        return self._recorded_values('_i')
     
     @property
     def t(self):
         '''
         Array of recorded spike times, with corresponding indices `i`.
         '''
-        return Quantity(self.variables['_t'].get_value(), dim=second.dim,
-                        copy=True)
+        return Quantity(self._recorded_values('_t'), dim=second.dim)
 
     @property
     def t_(self):
         '''
         Array of recorded spike times without units, with corresponding indices `i`.
         '''
-        return self.variables['_t'].get_value().copy()
+        return self._recorded_values('_t')
     
     @property
     def it(self):
@@ -5,13 +5,34 @@ import numpy as np
 
 from brian2.core.variables import (Variables, get_dtype)
 from brian2.core.base import BrianObject
+from brian2.core.clocks import Clock
 from brian2.core.scheduler import Scheduler
 from brian2.codegen.codeobject import create_runner_codeobj
-from brian2.units.fundamentalunits import Unit, Quantity
+from brian2.devices.device import get_device, RuntimeDevice
+from brian2.monitors.storage import FileStorage
+from brian2.units.fundamentalunits import (Unit, Quantity,
+                                           fail_for_dimension_mismatch)
 from brian2.units.allunits import second
 
 __all__ = ['StateMonitor']
 
+#: The largest time step number used for the recording windows (the clocks
+#: of C++ standalone use ``int`` for the time step)
+MAX_TIME_STEP = 2**31 - 1
+
+
+def _time_step(t, dt):
+    '''
+    The first time step of a clock with time step `dt` at or after the time
+    `t` (both in seconds), using the rounding of `Clock.set_interval`.
+    '''
+    if t >= MAX_TIME_STEP*dt:
+        return MAX_TIME_STEP
+    i = int(round(t/dt))
+    if abs(i*dt - t) > Clock.epsilon*abs(i*dt):
+        i = int(np.ceil(t/dt))
+    return i
+
 
 class StateMonitorView(object):
     def __init__(self, monitor, item):
@@ -34,16 +55,15 @@ class StateMonitorView(object):
 
         mon = self.monitor
         if item == 't':
-            return Quantity(mon.variables['_t'].get_value(), dim=second.dim,
-                            copy=True)
+            return Quantity(mon._recorded_values('_t'), dim=second.dim)
         elif item == 't_':
-            return mon._t.data.copy()
+            return mon._recorded_values('_t')
         elif item in mon.record_variables:
             unit = mon.variables[item].unit
-            return Quantity(mon.variables['_recorded_'+item].get_value().T[self.indices],
-                            dim=unit.dim, copy=True)
+            return Quantity(mon._recorded_values('_recorded_'+item).T[self.indices],
+                            dim=unit.dim)
         elif item.endswith('_') and item[:-1] in mon.record_variables:
-            return mon.variables['_recorded_'+item[:-1]].get_value().T[self.indices].copy()
+            return mon._recorded_values('_recorded_'+item[:-1]).T[self.indices]
         else:
             raise AttributeError('Unknown attribute %s' % item)
 
@@ -93,6 +113,24 @@ class StateMonitor(BrianObject):
     `mon.v[[0, 2]]` will return the values for the first and third *recorded*
     neurons, i.e. for neurons 0 and 4.
 
+    By default, values are recorded in every time step of the monitor's
+    clock. The ``dt`` or ``every`` arguments set a longer recording interval,
+    and the ``start`` and ``stop`` arguments restrict the recording to one or
+    several time windows. With ``mean=True``, the value recorded for a time
+    ``t`` is the mean over all time steps from ``t`` to the next recording
+    time (or the end of the time window) instead of the value at ``t``.
+
+    The values are stored in contiguous arrays with one row per recorded time
+    step, the storage for all recordings of a run is allocated before the
+    run. The recorded values are returned as read-only views on this storage,
+    without copying them (except when indexing with several indices). With
+    a `FileStorage` as the ``storage`` argument, the values are instead
+    written to files during the run and the storage in memory is only used
+    as a buffer, the recorded values are then memory-mapped from the files.
+    With ``mean=True``, values are copied instead if the last recording
+    interval continues after the end of the run, since its row in the files
+    is updated by the next run.
+
     Parameters
     ----------
     source : `Group`
@@ -112,6 +150,25 @@ class StateMonitor(BrianObject):
         ``source.name+'statemonitor_0'``, etc.
     codeobj_class : `CodeObject`, optional
         The `CodeObject` class to create.
+    dt : `Quantity`, optional
+        The interval between two recordings, has to be a multiple of the
+        time step of the monitor's clock. Cannot be combined with ``every``.
+    every : int, optional
+        Record every ``every`` time steps of the monitor's clock. Cannot be
+        combined with ``dt``. Values are recorded at the time steps that are
+        multiples of the recording interval, i.e. at the same times as for a
+        monitor with a clock of time step ``dt``.
+    start : `Quantity` or sequence of `Quantity`, optional
+        The start time(s) of the recording window(s), defaults to 0s.
+    stop : `Quantity` or sequence of `Quantity`, optional
+        The end time(s) of the recording window(s), defaults to infinity. A
+        window includes its start but not its end time.
+    mean : bool, optional
+        Whether to record the mean over the recording interval instead of the
+        current value (only possible for floating point variables). Defaults
+        to ``False``.
+    storage : `FileStorage`, optional
+        Store the recorded values in files instead of in memory.
 
     Examples
     --------
@@ -130,9 +187,17 @@ class StateMonitor(BrianObject):
         plot(M.t, M.V.T)
         show()
 
+    Record the mean of ``V`` over intervals of 1ms between 10ms and 20ms and
+    between 50ms and 60ms::
+
+        M = StateMonitor(G, 'V', record=True, dt=1*ms, mean=True,
+                         start=[10, 50]*ms, stop=[20, 60]*ms)
+
     '''
     def __init__(self, source, variables, record=None, when=None,
-                 name='statemonitor*', codeobj_class=None):
+                 name='statemonitor*', codeobj_class=None, dt=None,
+                 every=None, start=None, stop=None, mean=False,
+                 storage=None):
         self.source = weakref.proxy(source)
         self.codeobj_class = codeobj_class
 
@@ -167,7 +232,56 @@ class StateMonitor(BrianObject):
             
         #: The array of recorded indices
         self.indices = record
-        
+
+        if dt is not None and every is not None:
+            raise ValueError('Specify either the dt or the every argument, '
+                             'not both.')
+        if dt is not None:
+            fail_for_dimension_mismatch(dt, second, ('The recording interval '
+                                                     'has to be specified in '
+                                                     'units of seconds'))
+            every = int(round(float(dt) / self.clock.dt_))
+            if (every < 1 or
+                    abs(every*self.clock.dt_ - float(dt)) > Clock.epsilon*float(dt)):
+                raise ValueError(('The recording interval %s is not a '
+                                  'multiple of the time step %s of the '
+                                  'clock.') % (dt, self.clock.dt))
+        elif every is None:
+            every = 1
+        elif int(every) != every or every < 1:
+            raise ValueError(('every has to be a positive integer, not '
+                              '%r.') % every)
+        #: The number of time steps of the clock between two recordings
+        self.record_every = int(every)
+
+        if start is None:
+            start = 0*second
+        if stop is None:
+            stop = np.inf*second
+        for argname, value in [('start', start), ('stop', stop)]:
+            fail_for_dimension_mismatch(Quantity(value), second,
+                                        ('The %s time has to be specified in '
+                                         'units of seconds') % argname)
+        start, stop = np.broadcast_arrays(np.atleast_1d(np.asarray(start, dtype=float)),
+                                          np.atleast_1d(np.asarray(stop, dtype=float)))
+        if start.ndim != 1 or np.any(stop < start):
+            raise ValueError('The recording windows have to be given as '
+                             'sequences of start and stop times, with each '
+                             'start time before the stop time.')
+        #: The start times of the recording windows
+        self.record_start = Quantity(start, dim=second.dim, copy=True)
+        #: The end times of the recording windows
+        self.record_stop = Quantity(stop, dim=second.dim, copy=True)
+
+        if mean:
+            for varname in variables:
+                if not np.issubdtype(source.variables[varname].dtype, np.floating):
+                    raise TypeError(('Cannot record the mean of variable "%s", '
+                                     'it is not a floating point '
+                                     'variable.') % varname)
+        #: Whether to record the mean over the recording interval
+        self.record_mean = bool(mean)
+
         # Setup variables
         self.variables = Variables(self)
         for varname in variables:
@@ -181,14 +295,56 @@ class StateMonitor(BrianObject):
                                              constant=False,
                                              constant_size=False,
                                              is_bool=var.is_bool)
+            self.variables.add_auxiliary_variable('_to_record_' + varname,
+                                                  unit=var.unit,
+                                                  dtype=var.dtype,
+                                                  scalar=var.scalar,
+                                                  is_bool=var.is_bool)
 
         self.variables.add_dynamic_array('_t', size=0, unit=Unit(1),
                                          constant=False, constant_size=False)
         self.variables.add_attribute_variable('_clock_t', second, self.clock, 't_')
+        self.variables.add_attribute_variable('_clock_i', Unit(1), self.clock, 'i')
         self.variables.add_array('_indices', size=len(self.indices),
                                  unit=Unit(1), dtype=self.indices.dtype,
                                  constant=True, read_only=True)
         self.variables['_indices'].set_value(self.indices)
+        # The number of recorded time steps -- the arrays storing the values
+        # can be longer, they are preallocated for the run (see `before_run`)
+        self.variables.add_array('_num_recorded', size=1, unit=Unit(1),
+                                 dtype=np.int32, read_only=True)
+        self.variables['_num_recorded'].set_value(0)
+        # The recording windows as time steps of the clock (see `before_run`)
+        self.variables.add_array('_window_start', size=len(start),
+                                 unit=Unit(1), dtype=np.int32, constant=True,
+                                 read_only=True)
+        self.variables.add_array('_window_stop', size=len(stop),
+                                 unit=Unit(1), dtype=np.int32, constant=True,
+                                 read_only=True)
+        # For averaged values: the recording interval (the time step divided
+        # by record_every) of the last recorded row and the number of values
+        # it averages
+        self.variables.add_array('_last_interval', size=1, unit=Unit(1),
+                                 dtype=np.int32, read_only=True)
+        self.variables['_last_interval'].set_value(-1)
+        self.variables.add_array('_num_samples', size=1, unit=Unit(1),
+                                 dtype=np.int32, read_only=True)
+        self.variables['_num_samples'].set_value(0)
+        #: Whether the storage has been preallocated for the current run
+        self._preallocated = False
+
+        if storage is not None and not isinstance(storage, FileStorage):
+            raise TypeError(('storage has to be a FileStorage object, not '
+                             '%r.') % storage)
+        #: The `FileStorage` for the recorded values or ``None`` if they are
+        #: stored in memory
+        self.storage = storage
+        # The files for the arrays (created in the first run)
+        self._files = None
+        self._steps_since_flush = 0
+        # Whether the row of averaged values for the last recording interval
+        # has been written to the files (see `_flush`)
+        self._last_row_on_disk = False
 
         self._group_attribute_access_active = True
 
@@ -202,14 +358,6 @@ class StateMonitor(BrianObject):
                 for v in self.record_variables]
         code = '\n'.join(code)
 
-        for varname in self.record_variables:
-            var = self.source.variables[varname]
-            self.variables.add_auxiliary_variable('_to_record_' + varname,
-                                                  unit=var.unit,
-                                                  dtype=var.dtype,
-                                                  scalar=var.scalar,
-                                                  is_bool=var.is_bool)
-
         recorded_variables = dict([(name,
                                    self.variables['_recorded_'+name])
                                    for name in self.record_variables])
@@ -222,10 +370,163 @@ class StateMonitor(BrianObject):
                                              additional_variables=self.variables,
                                              additional_namespace=namespace,
                                              template_kwds={'_recorded_variables':
-                                                                recorded_variables},
+                                                                recorded_variables,
+                                                            '_every': self.record_every,
+                                                            '_mean': self.record_mean},
                                              check_units=False)
         self._code_objects[:] = [weakref.proxy(self.codeobj)]
 
+        dt = self.clock.dt_
+        window_start = [_time_step(t, dt) for t in np.asarray(self.record_start)]
+        window_stop = [_time_step(t, dt) for t in np.asarray(self.record_stop)]
+        self.variables['_window_start'].set_value(window_start)
+        self.variables['_window_stop'].set_value(window_stop)
+
+        # Preallocate the storage for all values recorded during the run, the
+        # values are then stored at the position given by _num_recorded
+        # without resizing the arrays in every time step. The number of time
+        # steps is only known for runs executed by `Network.run` (the clocks
+        # of a standalone device are not set in Python).
+        num_recordings = 0
+        every = self.record_every
+        for start, stop in zip(window_start, window_stop):
+            first = max(start, self.clock.i)
+            last = min(stop, self.clock.i_end)
+            if last <= first:
+                continue
+            if self.record_mean:
+                # All recording intervals overlapping with the window
+                num_recordings += (last - 1)//every - first//every + 1
+            else:
+                # All multiples of the recording interval in the window
+                num_recordings += (last - 1)//every - (first - 1)//every
+        # Overlapping windows are counted twice, the unused storage is
+        # discarded after the run
+        if self.storage is not None:
+            self._open_files()
+            # The storage is only a buffer for the values recorded between two
+            # writes to the files (plus a row that is still being averaged)
+            num_recordings = min(num_recordings, self.storage.flush_every + 1)
+        if num_recordings > 0:
+            self._resize_storage(self._get_num_recorded() + num_recordings)
+            self._preallocated = True
+
+    def run(self):
+        if self.storage is None:
+            BrianObject.run(self)
+            return
+        if self._last_row_on_disk:
+            if self._last_row_continues():
+                self._reload_last_row()
+            else:
+                # Start a new row in the next recording
+                self.variables['_last_interval'].set_value(-1)
+                self._last_row_on_disk = False
+        BrianObject.run(self)
+        self._steps_since_flush += 1
+        if self._steps_since_flush >= self.storage.flush_every:
+            self._flush()
+            self._steps_since_flush = 0
+
+    def after_run(self):
+        if self.storage is not None:
+            self._flush(final=True)
+        # Discard the storage for time steps that have not been recorded
+        # (e.g. if the run has been stopped)
+        if self._preallocated:
+            self._resize_storage(self._get_num_recorded())
+            self._preallocated = False
+
+    def _get_num_recorded(self):
+        return int(self.variables['_num_recorded'].get_value()[0])
+
+    def _resize_storage(self, num_steps):
+        self.variables['_t'].resize(num_steps)
+        for varname in self.record_variables:
+            self.variables['_recorded_'+varname].resize((num_steps,
+                                                         len(self.indices)))
+
+    def _open_files(self):
+        if not isinstance(get_device(), RuntimeDevice):
+            raise NotImplementedError('Storing the recorded values in files '
+                                      'is only supported for the runtime '
+                                      'targets.')
+        if self._files is not None:
+            return
+        self._files = {'_t': self.storage.open(self.name + '_t',
+                                               self.variables['_t'].dtype)}
+        for varname in self.record_variables:
+            name = '_recorded_' + varname
+            self._files[name] = self.storage.open(self.name + '_' + varname,
+                                                  self.variables[name].dtype,
+                                                  (len(self.indices), ))
+
+    def _flush(self, final=False):
+        '''
+        Write the values in the buffer to the files of the storage. Unless
+        `final` is set, the last row of averaged values is kept in the buffer
+        since its recording interval has not necessarily ended.
+        '''
+        num_recorded = self._get_num_recorded()
+        num_flushed = num_recorded
+        if self.record_mean and not final and num_recorded > 0:
+            num_flushed -= 1
+        if num_flushed == 0:
+            return
+        for name, npy_file in self._files.iteritems():
+            values = self.variables[name].get_value()
+            self.storage.write(npy_file, values[:num_flushed])
+            values[:num_recorded-num_flushed] = values[num_flushed:num_recorded]
+        self.variables['_num_recorded'].set_value(num_recorded - num_flushed)
+        if self.record_mean and final:
+            self._last_row_on_disk = True
+
+    def _last_row_continues(self):
+        '''
+        Whether the recording interval of the last row of averaged values
+        continues at the current time step (or later), i.e. whether the row
+        is still updated.
+        '''
+        last_interval = int(self.variables['_last_interval'].get_value()[0])
+        first = self.clock.i
+        last = (last_interval + 1) * self.record_every
+        windows = zip(self.variables['_window_start'].get_value(),
+                      self.variables['_window_stop'].get_value())
+        return any(max(start, first) < min(stop, last)
+                   for start, stop in windows)
+
+    def _reload_last_row(self):
+        # Move the averaged values written at the end of a run (or when the
+        # values were accessed) back to the buffer, their recording interval
+        # might continue
+        self.storage.wait()
+        if len(self.variables['_t'].get_value()) == 0:
+            self._resize_storage(1)
+        for name, npy_file in self._files.iteritems():
+            self.variables[name].get_value()[0] = npy_file.pop()
+        self.variables['_num_recorded'].set_value(1)
+        self._last_row_on_disk = False
+
+    def _recorded_values(self, name):
+        '''
+        Return a read-only view on the values of the array `name` (``'_t'`` or
+        ``'_recorded_'`` followed by the variable name) for the recorded time
+        steps, without units. For values stored in files, this is a
+        memory-mapped array, unless the last row of averaged values is still
+        updated in the next run (its file is then overwritten in place).
+        '''
+        if self._files is not None:
+            self._flush(final=True)
+            self.storage.wait()
+            values = self._files[name].read()
+            if self._last_row_on_disk and self._last_row_continues():
+                values = np.array(values)
+                values.flags.writeable = False
+            return values
+        values = self.variables[name].get_value()[:self._get_num_recorded()]
+        values.flags.writeable = False
+        return values
+
     def __getitem__(self, item):
         dtype = get_dtype(item)
         if np.issubdtype(dtype, np.int):
@@ -254,16 +555,15 @@ class StateMonitor(BrianObject):
 
         # TODO: Decide about the interface
         if item == 't':
-            return Quantity(self.variables['_t'].get_value(),
-                            dim=second.dim, copy=True)
+            return Quantity(self._recorded_values('_t'), dim=second.dim)
         elif item == 't_':
-            return self.variables['_t'].get_value().copy()
+            return self._recorded_values('_t')
         elif item in self.record_variables:
             unit = self.variables[item].unit
-            return Quantity(self.variables['_recorded_'+item].get_value().T,
-                            dim=unit.dim, copy=True)
+            return Quantity(self._recorded_values('_recorded_'+item).T,
+                            dim=unit.dim)
         elif item.endswith('_') and item[:-1] in self.record_variables:
-            return self.variables['_recorded_'+item[:-1]].get_value().T
+            return self._recorded_values('_recorded_'+item[:-1]).T
         else:
             raise AttributeError('Unknown attribute %s' % item)
 
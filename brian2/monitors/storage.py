@@ -0,0 +1,274 @@
+'''
+Module providing the `FileStorage` class, a storage backend for monitors that
+writes the recorded values to files on disk during a run instead of keeping
+them in memory.
+'''
+import os
+import struct
+import threading
+import Queue
+
+import numpy as np
+
+__all__ = ['FileStorage']
+
+
+class NpyFile(object):
+    '''
+    A file in the ``.npy`` format for an array that grows along its first
+    dimension. The header has a fixed size and is rewritten with the new
+    shape whenever values are appended, the file can therefore be read with
+    `numpy.load` (e.g. with ``mmap_mode='r'``) at any time.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file, an existing file is overwritten.
+    dtype : `numpy.dtype`
+        The data type of the values.
+    row_shape : tuple of int, optional
+        The shape of a single element along the first dimension, e.g.
+        ``(n, )`` for an array of shape ``(length, n)``. Defaults to ``()``.
+    '''
+    #: The size of the header (including the magic string), a multiple of 16
+    #: as in the files written by numpy
+    HEADER_SIZE = 128
+
+    def __init__(self, filename, dtype, row_shape=()):
+        #: The name of the file
+        self.filename = filename
+        #: The data type of the values
+        self.dtype = np.dtype(dtype)
+        #: The shape of a single element along the first dimension
+        self.row_shape = tuple(row_shape)
+        #: The number of elements along the first dimension
+        self.length = 0
+        self._row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape))
+        self._file = open(filename, 'w+b')
+        self._write_header()
+
+    def _write_header(self):
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+            np.lib.format.dtype_to_descr(self.dtype),
+            (self.length, ) + self.row_shape)
+        # The magic string and the version take 8 bytes, followed by the
+        # length of the header (2 bytes) and the header ending with a newline
+        header = header.ljust(self.HEADER_SIZE - 11) + '\n'
+        self._file.seek(0)
+        self._file.write(np.lib.format.magic(1, 0) +
+                         struct.pack('<H', len(header)) + header)
+
+    def append(self, values):
+        '''
+        Append `values`, an array of shape ``(n, ) + row_shape``.
+        '''
+        if self._file.closed:
+            raise ValueError('Cannot append values to the closed file '
+                             '"%s".' % self.filename)
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        if values.shape[1:] != self.row_shape:
+            raise ValueError(('Cannot append values of shape %s to an array '
+                              'with elements of shape '
+                              '%s.') % (values.shape, self.row_shape))
+        # Values removed with `pop` are overwritten, the file is never
+        # truncated since it might be memory-mapped
+        self._file.seek(self.HEADER_SIZE + self.length*self._row_bytes)
+        values.tofile(self._file)
+        self.length += len(values)
+        self._write_header()
+
+    def pop(self):
+        '''
+        Remove the last element and return it.
+        '''
+        if self.length == 0:
+            raise IndexError('Cannot remove an element from an empty array.')
+        self._file.flush()
+        self._file.seek(self.HEADER_SIZE + (self.length - 1)*self._row_bytes)
+        element = np.fromfile(self._file, dtype=self.dtype,
+                              count=int(np.prod(self.row_shape)))
+        self.length -= 1
+        self._write_header()
+        return element.reshape(self.row_shape)
+
+    def read(self):
+        '''
+        Return all values as a read-only memory-mapped array.
+        '''
+        if not self._file.closed:
+            self._file.flush()
+        if self.length == 0:
+            # Empty files cannot be memory-mapped
+            values = np.zeros((0, ) + self.row_shape, dtype=self.dtype)
+            values.flags.writeable = False
+            return values
+        return np.load(self.filename, mmap_mode='r')
+
+    def close(self):
+        '''
+        Close the file, values that have been memory-mapped stay valid.
+        '''
+        self._file.close()
+
+
+class FileStorage(object):
+    '''
+    Storage for the values recorded by `SpikeMonitor` and `StateMonitor`
+    objects in files on disk. The monitors record into an in-memory buffer
+    that is appended to the files every ``flush_every`` time steps, the
+    memory needed during a run therefore does not grow with its duration.
+    After the run (or when accessing the values during the run), the
+    recorded values are memory-mapped from the files, so they can be used
+    like arrays without reading them into memory.
+
+    Every recorded array is stored in a file of the ``.npy`` format named
+    after the monitor and the array, e.g. ``statemonitor_v.npy`` or
+    ``spikemonitor_t.npy``, a `FileStorage` object can be shared by several
+    monitors. The first dimension of the stored arrays is always the time,
+    i.e. the values of a `StateMonitor` are stored with shape
+    ``(len(t), len(indices))``. Existing files are overwritten. The files
+    stay open (and the background thread running) until `close` is called.
+
+    Parameters
+    ----------
+    directory : str
+        The directory for the files, will be created if necessary.
+    flush_every : int, optional
+        The number of time steps of the monitor's clock between writing the
+        buffered values to the files. Defaults to 1000.
+    background : bool, optional
+        Whether to write the files on a background thread so that the
+        simulation does not wait for the disk. The buffered values are
+        copied, the memory used for them is bounded by the number of
+        pending writes. Defaults to ``False``.
+
+    Notes
+    -----
+    File storage is only available for the runtime targets, not for
+    standalone devices.
+
+    Examples
+    --------
+    >>> from brian2 import *
+    >>> import tempfile
+    >>> storage = FileStorage(tempfile.mkdtemp(), flush_every=100)
+    >>> G = NeuronGroup(10, 'dv/dt = -v / (10*ms) : 1')
+    >>> mon = StateMonitor(G, 'v', record=True, storage=storage)
+    >>> net = Network(G, mon)
+    >>> net.run(1*ms)
+    >>> print(mon.v.shape)
+    (10, 10)
+    >>> storage.close()
+    '''
+    #: The maximum number of writes waiting for the background thread
+    MAX_PENDING_WRITES = 4
+
+    def __init__(self, directory, flush_every=1000, background=False):
+        if int(flush_every) != flush_every or flush_every < 1:
+            raise ValueError(('flush_every has to be a positive integer, not '
+                              '%r.') % flush_every)
+        #: The directory for the files
+        self.directory = os.path.abspath(directory)
+        #: The number of time steps between two writes
+        self.flush_every = int(flush_every)
+        #: Whether the files are written on a background thread
+        self.background = bool(background)
+        self._queue = None
+        self._thread = None
+        self._errors = []
+        # The files opened with `open`
+        self._files = []
+
+    def open(self, name, dtype, row_shape=()):
+        '''
+        Create the file for an array.
+
+        Parameters
+        ----------
+        name : str
+            The name of the array (used as the file name).
+        dtype : `numpy.dtype`
+            The data type of the values.
+        row_shape : tuple of int, optional
+            The shape of an element along the first dimension.
+
+        Returns
+        -------
+        f : `NpyFile`
+            The file the values can be written to with `write`.
+        '''
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        npy_file = NpyFile(os.path.join(self.directory, name + '.npy'), dtype,
+                           row_shape)
+        self._files.append(npy_file)
+        return npy_file
+
+    def write(self, npy_file, values):
+        '''
+        Append `values` to `npy_file`. With background writing, this only
+        copies the values and returns immediately (unless the maximum number
+        of pending writes has been reached).
+        '''
+        if not self.background:
+            npy_file.append(values)
+            return
+        if self._thread is None:
+            self._queue = Queue.Queue(maxsize=self.MAX_PENDING_WRITES)
+            self._thread = threading.Thread(target=self._write_pending,
+                                            name='FileStorage writer')
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put((npy_file, np.array(values, copy=True)))
+
+    def _write_pending(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                # Stop the thread (see `close`)
+                self._queue.task_done()
+                return
+            npy_file, values = item
+            try:
+                npy_file.append(values)
+            except Exception as ex:
+                self._errors.append(ex)
+            finally:
+                self._queue.task_done()
+
+    def wait(self):
+        '''
+        Wait until all pending writes are finished. Raises an error that
+        occured when writing in the background.
+        '''
+        if self._queue is not None:
+            self._queue.join()
+        if self._errors:
+            error = self._errors[0]
+            del self._errors[:]
+            raise error
+
+    def close(self):
+        '''
+        Finish all pending writes, stop the background thread and close all
+        files. Values that have been memory-mapped from the files stay valid,
+        but the monitors using this storage cannot record any more values.
+        Raises an error that occured when writing in the background.
+        '''
+        if self._thread is not None:
+            # Pending writes are finished before the thread stops
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+        for npy_file in self._files:
+            npy_file.close()
+        del self._files[:]
+        self.wait()
+
+    def __repr__(self):
+        description = '{classname}({directory!r}, flush_every={flush_every}, background={background})'
+        return description.format(classname=self.__class__.__name__,
+                                  directory=self.directory,
+                                  flush_every=self.flush_every,
+                                  background=self.background)
@@ -5,13 +5,19 @@ AST parsing based analysis of expressions
 import ast
 
 from brian2.units.fundamentalunits import (Unit, get_unit_fast,
+                                           get_dimensions,
                                            DimensionMismatchError,
                                            have_same_dimensions,
                                            )
+from brian2.utils.caching import LRUCache
+from brian2.utils.stringtools import get_identifiers
 
 __all__ = ['is_boolean_expression',
            'parse_expression_unit',]
 
+# Cache for the results of `parse_expression_unit`
+_unit_cache = LRUCache('parse_expression_unit')
+
 
 def is_boolean_expression(expr, namespace, variables):
     '''
@@ -215,11 +221,71 @@ def parse_expression_unit(expr, namespace, variables):
     -----
     
     Currently, functions do not work, see comments in function.
+
+    The results for string expressions are stored in a cache (see
+    `LRUCache`), its size is set by the `core.parsing_cache_size` preference.
     '''
-    # If we are working on a string, convert to the top level node    
     if isinstance(expr, basestring):
+        key = _unit_cache_key(expr, namespace, variables)
+        if key is not None:
+            unit = _unit_cache.get(key)
+            if unit is not None:
+                return unit
+        # Convert to the top level node
         mod = ast.parse(expr, mode='eval')
-        expr = mod.body
+        unit = _parse_expression_unit(mod.body, namespace, variables)
+        if key is not None:
+            _unit_cache[key] = unit
+        return unit
+    else:
+        return _parse_expression_unit(expr, namespace, variables)
+
+
+def _unit_cache_key(expr, namespace, variables):
+    '''
+    Return the key used for caching the result of `parse_expression_unit` or
+    ``None`` if the result should not be cached. The key consists of the
+    expression and the units of all identifiers, together with their values
+    if the expression contains a power (the unit of ``x**n`` depends on the
+    value of ``n``). Functions are identified by the objects themselves.
+    '''
+    with_values = '**' in expr
+    key = [expr]
+    try:
+        for name in sorted(get_identifiers(expr)):
+            if name in variables:
+                value = variables[name]
+                if hasattr(value, '_arg_units'):
+                    key.append((name, value))
+                    continue
+                item = (name, get_dimensions(value.unit))
+                if (with_values and getattr(value, 'constant', False) and
+                        getattr(value, 'scalar', False)):
+                    item += (value.get_value(), )
+            elif name in namespace:
+                value = namespace[name]
+                if hasattr(value, '_arg_units'):
+                    key.append((name, value))
+                    continue
+                item = (name, get_dimensions(value))
+                if with_values:
+                    item += (float(value), )
+            else:
+                # An unknown identifier will raise an error anyway
+                return None
+            key.append(item)
+        key = tuple(key)
+        hash(key)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return key
+
+
+def _parse_expression_unit(expr, namespace, variables):
+    '''
+    Returns the unit value of an expression given as an `ast` node, see
+    `parse_expression_unit`.
+    '''
     if expr.__class__ is ast.Name:
         name = expr.id
         if name in variables:
@@ -235,7 +301,7 @@ def parse_expression_unit(expr, namespace, variables):
     elif expr.__class__ is ast.BoolOp:
         # check that the units are valid in each subexpression
         for node in expr.values:
-            parse_expression_unit(node, namespace, variables)
+            _parse_expression_unit(node, namespace, variables)
         # but the result is a bool, so we just return 1 as the unit
         return get_unit_fast(1)
     elif expr.__class__ is ast.Compare:
@@ -243,7 +309,7 @@ def parse_expression_unit(expr, namespace, variables):
         subexprs = [expr.left]+expr.comparators
         subunits = []
         for node in subexprs:
-            subunits.append(parse_expression_unit(node, namespace, variables))
+            subunits.append(_parse_expression_unit(node, namespace, variables))
         for left, right in zip(subunits[:-1], subunits[1:]):
             if not have_same_dimensions(left, right):
                 raise DimensionMismatchError("Comparison of expressions with different units",
@@ -258,7 +324,7 @@ def parse_expression_unit(expr, namespace, variables):
         elif expr.kwargs is not None:
             raise ValueError("Keyword arguments not supported")
 
-        arg_units = [parse_expression_unit(arg, namespace, variables)
+        arg_units = [_parse_expression_unit(arg, namespace, variables)
                      for arg in expr.args]
 
         func = namespace.get(expr.func.id, variables.get(expr.func, None))
@@ -286,8 +352,8 @@ def parse_expression_unit(expr, namespace, variables):
 
     elif expr.__class__ is ast.BinOp:
         op = expr.op.__class__.__name__
-        left = parse_expression_unit(expr.left, namespace, variables)
-        right = parse_expression_unit(expr.right, namespace, variables)
+        left = _parse_expression_unit(expr.left, namespace, variables)
+        right = _parse_expression_unit(expr.right, namespace, variables)
         if op=='Add' or op=='Sub':
             u = left+right
         elif op=='Mult':
@@ -307,7 +373,7 @@ def parse_expression_unit(expr, namespace, variables):
     elif expr.__class__ is ast.UnaryOp:
         op = expr.op.__class__.__name__
         # check validity of operand and get its unit
-        u = parse_expression_unit(expr.operand, namespace, variables)
+        u = _parse_expression_unit(expr.operand, namespace, variables)
         if op=='Not':
             return get_unit_fast(1)
         else:
@@ -6,6 +6,15 @@ from sympy.printing.str import StrPrinter
 
 from brian2.core.functions import DEFAULT_FUNCTIONS, log10
 from brian2.parsing.rendering import SympyNodeRenderer
+from brian2.utils.caching import LRUCache
+
+# Caches for the results of `str_to_sympy` and `sympy_to_str`
+_str_to_sympy_cache = LRUCache('str_to_sympy')
+_sympy_to_str_cache = LRUCache('sympy_to_str')
+
+# The namespace used for evaluating rendered expressions in `str_to_sympy`,
+# created on first use
+_sympy_namespace = None
 
 
 def str_to_sympy(expr):
@@ -42,19 +51,29 @@ def str_to_sympy(expr):
     `ceil` to `ceiling`) and operator names (e.g. `and` to `&`), all unknown
     names are wrapped in `Symbol(...)` or `Function(...)`. The resulting string
     is then evaluated in the `from sympy import *` namespace.
+
+    The results are stored in a cache (see `LRUCache`), its size is set by
+    the `core.parsing_cache_size` preference.
     '''
-    namespace = {}
-    exec 'from sympy import *' in namespace
-    # also add the log10 function to the namespace
-    namespace['log10'] = log10
+    global _sympy_namespace
+    s_expr = _str_to_sympy_cache.get(expr)
+    if s_expr is not None:
+        return s_expr
+
+    if _sympy_namespace is None:
+        _sympy_namespace = {}
+        exec 'from sympy import *' in _sympy_namespace
+        # also add the log10 function to the namespace
+        _sympy_namespace['log10'] = log10
     rendered = SympyNodeRenderer().render_expr(expr)
 
     try:
-        s_expr = eval(rendered, namespace)
+        s_expr = eval(rendered, _sympy_namespace)
     except (TypeError, ValueError, NameError) as ex:
         raise SyntaxError('Error during evaluation of sympy expression: '
                           + str(ex))
 
+    _str_to_sympy_cache[expr] = s_expr
     return s_expr
 
 
@@ -85,6 +104,30 @@ class CustomSympyPrinter(StrPrinter):
 PRINTER = CustomSympyPrinter()
 
 
+class _StructuralKey(object):
+    '''
+    Wraps a sympy expression to use it as a dictionary key. Sympy considers
+    e.g. ``2*x`` and ``2.0*x`` as equal, but they have to be converted to
+    different strings. Two keys are therefore only equal if the expressions
+    are structurally identical.
+    '''
+    __slots__ = ['expr', '_hash']
+
+    def __init__(self, expr):
+        self.expr = expr
+        self._hash = hash(expr)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return (isinstance(other, _StructuralKey) and
+                self.expr.compare(other.expr) == 0)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
 def sympy_to_str(sympy_expr):
     '''
     Converts a sympy expression into a string. This could be as easy as 
@@ -101,8 +144,22 @@ def sympy_to_str(sympy_expr):
     Returns
     str_expr : str
         A string representing the sympy expression.
+
+    Notes
+    -----
+    The results are stored in a cache (see `LRUCache`), its size is set by
+    the `core.parsing_cache_size` preference.
     '''
-    
+    try:
+        key = _StructuralKey(sympy_expr)
+    except TypeError:
+        # not hashable
+        key = None
+    if key is not None:
+        str_expr = _sympy_to_str_cache.get(key)
+        if str_expr is not None:
+            return str_expr
+
     # replace the standard functions by our names if necessary
     replacements = dict((f.sympy_func, sympy.Function(name)) for
                         name, f in DEFAULT_FUNCTIONS.iteritems()
@@ -111,7 +168,10 @@ def sympy_to_str(sympy_expr):
                         and str(f.sympy_func) != name)
 
     sympy_expr = sympy_expr.subs(replacements)
-    
-    return PRINTER.doprint(sympy_expr)
+
+    str_expr = PRINTER.doprint(sympy_expr)
+    if key is not None:
+        _sympy_to_str_cache[key] = str_expr
+    return str_expr
 
     
\ No newline at end of file
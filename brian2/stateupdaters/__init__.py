@@ -1,8 +1,14 @@
 '''
 Module for transforming model equations into "abstract code" that can be then be
 further translated into executable code by the `codegen` module.
+
+Preferences
+-----------
+.. document_brian_prefs:: stateupdaters
+
 '''  
 from .base import *
+from .cache import *
 from .exact import *
 from .explicit import *
 from .exponential_euler import *
@@ -7,6 +7,7 @@ for example in `NeuronGroup` when no state updater is given explicitly.
 from abc import abstractmethod, ABCMeta
 
 from brian2.utils.logger import get_logger
+from brian2.stateupdaters.cache import cached_can_integrate
 
 __all__ = ['StateUpdateMethod']
 
@@ -128,13 +129,18 @@ class StateUpdateMethod(object):
         method : {callable, str, ``None``}, optional
             A callable usable as a state updater, the name of a registered
             state updater or ``None`` (the default) 
+
+        Notes
+        -----
+        The results of the ``can_integrate`` methods are stored on disk and
+        reused for identical equations, see `cached_can_integrate`.
         '''
         if hasattr(method, '__call__'):
             # if this is a standard state updater, i.e. if it has a
             # can_integrate method, check this method and raise a warning if it
             # claims not to be applicable.
             try:
-                priority = method.can_integrate(equations, variables)
+                priority = cached_can_integrate(method, equations, variables)
                 if priority == 0:
                     logger.warn(('The manually specified state updater '
                                  'claims that it does not support the given '
@@ -156,7 +162,7 @@ class StateUpdateMethod(object):
             if stateupdater is None:
                 raise ValueError('No state updater with the name "%s" '
                                  'is known' % method)
-            if not stateupdater.can_integrate(equations, variables):
+            if not cached_can_integrate(stateupdater, equations, variables):
                 raise ValueError(('The state updater "%s" cannot be used for '
                                   'the given equations' % method))
             return stateupdater
@@ -165,7 +171,7 @@ class StateUpdateMethod(object):
         best_stateupdater = None
         for name, stateupdater in StateUpdateMethod.stateupdaters:
             try:
-                if stateupdater.can_integrate(equations, variables):
+                if cached_can_integrate(stateupdater, equations, variables):
                     best_stateupdater = (name, stateupdater)
                     break
             except KeyError:
@@ -0,0 +1,281 @@
+'''
+A persistent cache for the results of state updaters. Determining whether a
+state updater can integrate a set of equations and generating the abstract
+code for a state update step needs a lot of symbolic computation with sympy.
+The results only depend on the equations, on a few properties of the
+variables referred to in the equations and on the state updater itself
+(including the source code of its module and of the `brian2.stateupdaters`
+package). If the `stateupdaters.use_cache` preference is set, they are
+therefore stored on disk and reused by later runs of the same (or of any
+other) script.
+'''
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+
+import sympy
+
+import brian2
+from brian2.core.preferences import brian_prefs, BrianPreference
+from brian2.units.fundamentalunits import get_dimensions
+from brian2.utils.caching import LRUCache
+from brian2.utils.logger import get_logger
+
+__all__ = ['cached_can_integrate', 'cached_stateupdate_code',
+           'clear_stateupdater_cache']
+
+logger = get_logger(__name__)
+
+brian_prefs.register_preferences(
+    'stateupdaters',
+    'State updater preferences',
+    use_cache=BrianPreference(
+        default=False,
+        docs='''
+        Whether to store the results of state updaters (whether they can
+        integrate the given equations and the generated abstract code) on disk
+        and to reuse them for identical equations. This is opt-in: stored
+        results are invalidated when the source code of the state updater
+        changes, but not by changes in other parts of Brian (apart from its
+        version number).
+        '''
+        ),
+    cache_directory=BrianPreference(
+        default=os.path.join(os.path.expanduser('~'), '.brian',
+                             'stateupdater_cache'),
+        docs='''
+        The directory where the results of state updaters are stored, see
+        `stateupdaters.use_cache`.
+        '''
+        )
+    )
+
+# Results that have already been used in this process
+_memory_cache = LRUCache('stateupdater')
+
+# Hashes of source files, by file name
+_source_hashes = {}
+
+
+def _source_hash(filenames):
+    '''
+    Return a hash of the contents of the given source files or ``None`` if
+    one of them cannot be read.
+    '''
+    sha1 = hashlib.sha1()
+    for filename in sorted(filenames):
+        if filename not in _source_hashes:
+            try:
+                with open(filename, 'rb') as f:
+                    _source_hashes[filename] = hashlib.sha1(f.read()).hexdigest()
+            except (IOError, OSError):
+                return None
+        sha1.update(_source_hashes[filename])
+    return sha1.hexdigest()
+
+
+def _source_files(stateupdater):
+    '''
+    Return the names of the source files a state updater's results depend
+    on: all modules of the `brian2.stateupdaters` package and the module
+    defining the state updater's class. Returns ``None`` if the source of the
+    latter cannot be found.
+    '''
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    filenames = set(os.path.join(package_dir, filename)
+                    for filename in os.listdir(package_dir)
+                    if filename.endswith('.py'))
+    try:
+        module = sys.modules[type(stateupdater).__module__]
+        filename = inspect.getsourcefile(module)
+    except (KeyError, TypeError):
+        return None
+    if filename is None:
+        return None
+    filenames.add(os.path.abspath(filename))
+    return filenames
+
+
+def _method_description(stateupdater):
+    '''
+    Return a string uniquely describing a state updater or ``None`` if the
+    state updater cannot be described (it is not a `StateUpdateMethod` or
+    does not define a ``__repr__`` method).
+    '''
+    cls = type(stateupdater)
+    if (not hasattr(stateupdater, 'can_integrate') or
+            cls.__repr__ is object.__repr__):
+        return None
+    return '%s.%s: %r' % (cls.__module__, cls.__name__, stateupdater)
+
+
+def _canonical_key(operation, stateupdater, equations, variables):
+    '''
+    Return a string describing everything a state updater result depends on
+    or ``None`` if the result should not be cached. Besides the equations
+    themselves, this is whether the identifiers used in the equations refer
+    to model variables, whether these are constant and scalar and (for scalar
+    constants) their values.
+    '''
+    method = _method_description(stateupdater)
+    if method is None:
+        return None
+    filenames = _source_files(stateupdater)
+    if filenames is None:
+        return None
+    source_hash = _source_hash(filenames)
+    if source_hash is None:
+        return None
+    key = ['brian2 %s, sympy %s' % (brian2.__version__, sympy.__version__),
+           'source %s' % source_hash, operation, method]
+    for eq in equations.ordered:
+        key.append('%s %s = %s : %s %s %s' % (eq.type, eq.varname,
+                                              '' if eq.expr is None else eq.expr.code,
+                                              get_dimensions(eq.unit),
+                                              eq.is_bool, sorted(eq.flags)))
+    for name in sorted(equations.identifiers | equations.names):
+        if name not in variables:
+            key.append('%s: external' % name)
+            continue
+        var = variables[name]
+        constant = getattr(var, 'constant', False)
+        scalar = getattr(var, 'scalar', False)
+        description = '%s: %s constant=%s scalar=%s' % (name,
+                                                        var.__class__.__name__,
+                                                        constant, scalar)
+        if constant and scalar:
+            try:
+                description += ' value=%r' % float(var.get_value())
+            except (TypeError, ValueError, AttributeError):
+                return None
+        key.append(description)
+    return '\n'.join(key)
+
+
+def _cache_filename(key):
+    return os.path.join(brian_prefs['stateupdaters.cache_directory'],
+                        hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+
+def _load(key):
+    result = _memory_cache.get(key)
+    if result is not None:
+        return result
+    try:
+        with open(_cache_filename(key), 'r') as f:
+            stored = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if stored.get('key') != key:
+        # Hash collision or corrupted file
+        return None
+    result = stored['result']
+    if isinstance(result, unicode):
+        result = str(result)
+    result = (result, )
+    _memory_cache[key] = result
+    return result
+
+
+def _store(key, result):
+    _memory_cache[key] = (result, )
+    directory = brian_prefs['stateupdaters.cache_directory']
+    try:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        # Write to a temporary file first and then rename it, so that
+        # processes running in parallel never see a partially written file
+        fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'key': key, 'result': result}, f)
+        os.rename(tmp_filename, _cache_filename(key))
+    except (IOError, OSError) as ex:
+        logger.debug('Could not store state updater result on disk: %s' % ex)
+
+
+def _cached(operation, func, stateupdater, equations, variables):
+    if variables is None:
+        variables = {}
+    key = None
+    if brian_prefs['stateupdaters.use_cache']:
+        key = _canonical_key(operation, stateupdater, equations, variables)
+    if key is not None:
+        result = _load(key)
+        if result is not None:
+            return result[0]
+    result = func(equations, variables)
+    if key is not None:
+        _store(key, result)
+    return result
+
+
+def cached_can_integrate(stateupdater, equations, variables):
+    '''
+    Return the result of ``stateupdater.can_integrate(equations, variables)``,
+    using a previously stored result if possible.
+
+    Parameters
+    ----------
+    stateupdater : `StateUpdateMethod`
+        The state updater.
+    equations : `Equations`
+        The model equations.
+    variables : dict
+        The `Variable` objects for the model variables.
+
+    Returns
+    -------
+    ability : bool
+        Whether the state updater is able to integrate the equations.
+    '''
+    return bool(_cached('can_integrate', stateupdater.can_integrate,
+                        stateupdater, equations, variables))
+
+
+def cached_stateupdate_code(stateupdater, equations, variables):
+    '''
+    Return the abstract code generated by
+    ``stateupdater(equations, variables)``, using a previously stored result
+    if possible. Errors raised by the state updater are never stored.
+
+    Parameters
+    ----------
+    stateupdater : callable
+        The state updater. Results of state updaters that are not
+        `StateUpdateMethod` objects with a ``__repr__`` method are not
+        cached.
+    equations : `Equations`
+        The model equations.
+    variables : dict
+        The `Variable` objects for the model variables.
+
+    Returns
+    -------
+    code : str
+        The abstract code performing a state update step.
+    '''
+    return _cached('code', stateupdater, stateupdater, equations, variables)
+
+
+def clear_stateupdater_cache(disk=True):
+    '''
+    Remove all stored state updater results.
+
+    Parameters
+    ----------
+    disk : bool, optional
+        Whether to also delete the results stored in the directory given by
+        the `stateupdaters.cache_directory` preference. Defaults to ``True``.
+    '''
+    _memory_cache.clear()
+    if not disk:
+        return
+    directory = brian_prefs['stateupdaters.cache_directory']
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.endswith('.json') or filename.endswith('.tmp'):
+            os.remove(os.path.join(directory, filename))
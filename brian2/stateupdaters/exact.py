@@ -189,6 +189,9 @@ class IndependentStateUpdater(StateUpdateMethod):
 
         return '\n'.join(code)
 
+    def __repr__(self):
+        return '%s()' % self.__class__.__name__
+
 
 class LinearStateUpdater(StateUpdateMethod):    
     '''
@@ -125,4 +125,7 @@ class ExponentialEulerStateUpdater(StateUpdateMethod):
     # Copy doc from parent class
     __call__.__doc__ = StateUpdateMethod.__call__.__doc__
 
+    def __repr__(self):
+        return '%s()' % self.__class__.__name__
+
 exponential_euler = ExponentialEulerStateUpdater() 
\ No newline at end of file
@@ -37,7 +37,10 @@ cdef class SpikeQueue:
 
     def prepare(self, np.ndarray[double, ndim=1, mode='c'] real_delays,
                 double dt,
-                np.ndarray[int32_t, ndim=1, mode='c'] sources):
+                np.ndarray[int32_t, ndim=1, mode='c'] sources,
+                synapses_changed=True):
+        # The C++ queue is always completely re-prepared, synapses_changed is
+        # only accepted for compatibility with the Python SpikeQueue
         self.thisptr.prepare(<double*>real_delays.data,
                              <int32_t*>sources.data,
                              real_delays.shape[0], dt)
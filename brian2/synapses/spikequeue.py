@@ -88,7 +88,7 @@ class SpikeQueue(object):
         #: The dt used for storing the spikes (will be set in `prepare`)
         self._dt = None
 
-    def prepare(self, delays, dt, synapse_sources):
+    def prepare(self, delays, dt, synapse_sources, synapses_changed=True):
         '''
         Prepare the data structure and pre-compute offsets.
         This is called every time the network is run. The size of the
@@ -96,17 +96,28 @@ class SpikeQueue(object):
         delay in `delays`, if necessary. Offsets are calculated, unless
         the option `precompute_offsets` is set to ``False``. A flag is set if
         delays are homogeneous, in which case insertion will use a faster method
-        implemented in `insert_homogeneous`.        
-        '''
-        n_synapses = len(synapse_sources)
+        implemented in `insert_homogeneous`.
 
-        if self._dt is not None:
-            # store the current spikes
+        Parameters
+        ----------
+        delays : ndarray
+            The delays (in seconds) of all synapses (or a single value for
+            homogeneous delays).
+        dt : float
+            The timestep (in seconds) of the source group.
+        synapse_sources : ndarray of int
+            The source neuron for each synapse.
+        synapses_changed : bool, optional
+            Whether the synapses (or the source neurons of the synapses)
+            changed since the last call. If set to ``False``, the mapping from
+            source neurons to synapses is reused and only the delay-dependent
+            parts are updated. Defaults to ``True``.
+        '''
+        if self._dt is not None and self._dt != dt:
+            # adapt the stored spikes to the new dt
             spikes = self._extract_spikes()
-            # adapt the spikes to the new dt if it changed
-            if self._dt != dt:
-                spiketimes = spikes[:, 0] * self._dt
-                spikes[:, 0] = np.round(spiketimes / dt).astype(np.int)
+            spiketimes = spikes[:, 0] * self._dt
+            spikes[:, 0] = np.round(spiketimes / dt).astype(np.int)
         else:
             spikes = None
 
@@ -119,19 +130,26 @@ class SpikeQueue(object):
 
         self._delays = delays
 
-        # Prepare the data structure used in propagation
-        self._neurons_to_synapses =  []
-
-        max_events = 0
-        synapse_sources = synapse_sources[:]
-        for source in xrange(self._source_end - self._source_start):
-            indices = np.flatnonzero(synapse_sources == (source +
-                                                         self._source_start))
-            size = len(indices)
-            self._neurons_to_synapses.append(indices)
-            max_events = max(max_events, size)
+        synapse_sources = np.asarray(synapse_sources) - self._source_start
+        if synapses_changed or self._dt is None:
+            # Prepare the data structure used in propagation: a compressed
+            # sparse row representation, the synapses of source neuron i are
+            # given by
+            # self._synapses_sorted[self._synapses_ptr[i]:self._synapses_ptr[i+1]]
+            n_sources = self._source_end - self._source_start
+            # merge sort preserves the order of synapses for each source neuron
+            self._synapses_sorted = np.argsort(synapse_sources,
+                                               kind='mergesort').astype(np.int32)
+            counts = np.bincount(synapse_sources, minlength=n_sources)
+            self._synapses_ptr = np.zeros(n_sources + 1, dtype=np.int64)
+            np.cumsum(counts, out=self._synapses_ptr[1:])
+            self._max_events = counts.max() if len(counts) else 0
 
         n_steps = max_delays + 1
+        max_events = self._max_events
+        if spikes is not None and len(spikes):
+            # Make sure that there is space for all the stored spikes
+            n_steps = max(n_steps, spikes[:, 0].max() + 1)
         
         # Adjust the maximum delay and number of events per timestep if necessary
         # Check if delays are homogeneous
@@ -139,16 +157,20 @@ class SpikeQueue(object):
 
         # Resize
         if (n_steps > self.X.shape[0]) or (max_events > self.X.shape[1]): # Resize
+            if spikes is None and self._dt is not None:
+                # store the current spikes
+                spikes = self._extract_spikes()
             # Choose max_delay if is is larger than the maximum delay
             n_steps = max(n_steps, self.X.shape[0])
             max_events = max(max_events, self.X.shape[1])
             self.X = np.zeros((n_steps, max_events), dtype=self.dtype) # target synapses
             self.X_flat = self.X.reshape(n_steps*max_events,)
             self.n = np.zeros(n_steps, dtype=int) # number of events in each time step
+            self.currenttime = 0
 
         # Precompute offsets
         if self._precompute_offsets:
-            self._do_precompute_offsets(n_synapses)
+            self._do_precompute_offsets(synapse_sources)
 
         # Re-insert the spikes into the data structure
         if spikes is not None:
@@ -167,13 +189,11 @@ class SpikeQueue(object):
             The first column gives the time (as integer time steps) and the
             second column gives the index of the target synapse.
         '''
-        spikes = np.zeros((np.sum(self.n), 2))
-        counter = 0
-        for idx, n in enumerate(self.n):
-            t = (idx - self.currenttime) % len(self.n)
-            for target in self.X[idx, :n]:
-                spikes[counter, :] = np.array([t, target])
-                counter += 1
+        stored = np.arange(self.X.shape[1])[np.newaxis, :] < self.n[:, np.newaxis]
+        rows = np.nonzero(stored)[0]
+        spikes = np.empty((len(rows), 2), dtype=np.int)
+        spikes[:, 0] = (rows - self.currenttime) % len(self.n)
+        spikes[:, 1] = self.X[stored]
         return spikes
 
     def _store_spikes(self, spikes):
@@ -191,10 +211,14 @@ class SpikeQueue(object):
         '''
         # Clear all spikes
         self.n[:] = 0
-        for t, target in spikes:
-            row_idx = (t + self.currenttime) % len(self.n)
-            self.X[row_idx, self.n[row_idx]] = target
-            self.n[row_idx] += 1
+        if not len(spikes):
+            return
+        rows = (spikes[:, 0] + self.currenttime) % len(self.n)
+        counts = np.bincount(rows, minlength=len(self.n))
+        if counts.max() > self.X.shape[1]:
+            self._resize(counts.max())
+        self.X[rows, self._calc_offsets(rows)] = spikes[:, 1]
+        self.n[:] = counts
 
     ################################ SPIKE QUEUE DATASTRUCTURE ################
     def advance(self):
@@ -230,38 +254,82 @@ class SpikeQueue(object):
             if stop <= sources[-1]:
                 stop_idx = bisect.bisect_left(sources, stop, lo=start_idx)
             else:
-                stop_idx = len(self._neurons_to_synapses)
+                stop_idx = len(sources)
             sources = sources[start_idx:stop_idx]
-            synapse_indices = self._neurons_to_synapses
-            indices = np.concatenate([synapse_indices[source - start]
-                                      for source in sources]).astype(np.int32)
+            if not len(sources):
+                return
+            indices = self._synapses_for_sources(sources - start)
 
             if self._homogeneous:  # homogeneous delays
                 self._insert_homogeneous(self._delays[0], indices)
-            elif self._offsets is None:  # vectorise over synaptic events
-                # there are no precomputed offsets, this is the case
-                # (in particular) when there are dynamic delays
+            elif self._offsets is None or len(sources) > 1:
+                # vectorise over synaptic events -- there are no precomputed
+                # offsets (in particular when there are dynamic delays) or
+                # several neurons spiked, in which case their precomputed
+                # offsets (only unique per source neuron) could collide
                 self._insert(self._delays[indices], indices)
             else: # offsets are precomputed
                 self._insert(self._delays[indices], indices, self._offsets[indices])
-                # Note: the trick can only work if offsets are ordered in the right way
 
-    def _do_precompute_offsets(self, n_synapses):
+    def _synapses_for_sources(self, sources):
+        '''
+        Return the concatenated synapse indices for the given source neurons.
+
+        Parameters
+        ----------
+        sources : ndarray of int
+            The (sorted) indices of the source neurons, relative to the start
+            of the source group.
+
+        Returns
+        -------
+        indices : ndarray of int
+            The synapse indices, ordered by source neuron.
+        '''
+        ptr = self._synapses_ptr
+        starts = ptr[sources]
+        stops = ptr[sources + 1]
+        if len(sources) == 1 or stops[-1] - starts[0] == np.sum(stops - starts):
+            # A single neuron or a contiguous block of neurons: a simple slice
+            return self._synapses_sorted[starts[0]:stops[-1]]
+        lengths = stops - starts
+        # Index into the sorted synapses: for every synaptic event, the start of
+        # its neuron's block plus its position inside the block
+        cum_lengths = np.cumsum(lengths)
+        positions = (np.arange(cum_lengths[-1]) +
+                     np.repeat(starts - (cum_lengths - lengths), lengths))
+        return self._synapses_sorted[positions]
+
+    def _do_precompute_offsets(self, synapse_sources):
         '''
         Precompute all offsets corresponding to delays. This assumes that
-        delays will not change during the simulation.
+        delays will not change during the simulation. The offset of a synapse
+        is its position among the synapses of the same source neuron that have
+        the same delay.
         '''
+        n_synapses = len(synapse_sources)
         if len(self._delays) == 1 and n_synapses != 1:
             # We have a scalar delay value
             delays = self._delays.repeat(n_synapses)
         else:
             delays = self._delays
         self._offsets = np.zeros_like(delays)
-        index = 0
-        for targets in self._neurons_to_synapses:
-            target_delays = delays[targets]
-            self._offsets[index:index+len(target_delays)] = self._calc_offsets(target_delays)
-            index += len(target_delays)
+        if n_synapses == 0:
+            return
+        # Sort the synapses by source and then delay (both sorts are stable,
+        # synapses with the same source and delay stay in ascending order)
+        by_source = self._synapses_sorted
+        order = by_source[np.lexsort((delays[by_source],
+                                      synapse_sources[by_source]))]
+        sorted_sources = synapse_sources[order]
+        sorted_delays = delays[order]
+        group_start = np.ones(n_synapses, dtype=bool)
+        group_start[1:] = ((sorted_sources[1:] != sorted_sources[:-1]) |
+                           (sorted_delays[1:] != sorted_delays[:-1]))
+        positions = np.arange(n_synapses)
+        first_in_group = np.maximum.accumulate(np.where(group_start,
+                                                        positions, 0))
+        self._offsets[order] = positions - first_in_group
 
     def _calc_offsets(self, delay):
         '''
@@ -280,8 +348,8 @@ class SpikeQueue(object):
         xs = delay[I]
         J = xs[1:]!=xs[:-1]
         A = np.hstack((0, np.cumsum(J)))
-        B = np.hstack((0, np.cumsum(-J)))
-        BJ = np.hstack((0, B[J]))
+        B = np.hstack((0, np.cumsum(~J)))
+        BJ = np.hstack((0, B[:-1][J]))
         ei = B-BJ[A]
         ofs = np.zeros_like(delay)
         ofs[I] = np.array(ei, dtype=ofs.dtype) # maybe types should be signed?
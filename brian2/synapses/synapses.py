@@ -20,6 +20,7 @@ from brian2.equations.equations import (Equations, SingleEquation,
                                         PARAMETER)
 from brian2.groups.group import Group, GroupCodeRunner
 from brian2.stateupdaters.base import StateUpdateMethod
+from brian2.stateupdaters.cache import cached_stateupdate_code
 from brian2.stateupdaters.exact import independent
 from brian2.units.fundamentalunits import (Unit, Quantity,
                                            fail_for_dimension_mismatch)
@@ -59,8 +60,9 @@ class StateUpdater(GroupCodeRunner):
                                                                self.group.variables,
                                                                self.method_choice)
         
-        self.abstract_code = self.method(self.group.equations,
-                                         self.group.variables)
+        self.abstract_code = cached_stateupdate_code(self.method,
+                                                     self.group.equations,
+                                                     self.group.variables)
 
 
 class SummedVariableUpdater(GroupCodeRunner):
@@ -173,6 +175,10 @@ class SynapticPathway(GroupCodeRunner, Group):
         #: The `SpikeQueue`
         self.queue = None
 
+        #: The generations of the synapse sources and delays and the dt used
+        #: when the `SpikeQueue` was last prepared
+        self._queue_state = None
+
         #: The `CodeObject` initalising the `SpikeQueue` at the begin of a run
         self._initialise_queue_codeobj = None
 
@@ -225,8 +231,17 @@ class SynapticPathway(GroupCodeRunner, Group):
         # Update the dt (might have changed between runs)
         self.dt = self.synapses.clock.dt_
 
+        # Only prepare the queue if something changed since the last run
+        queue_state = (self.synapse_sources.generation,
+                       self._delays.generation, self.dt)
+        if queue_state == self._queue_state:
+            return
+        synapses_changed = (self._queue_state is None or
+                            queue_state[0] != self._queue_state[0])
         self.queue.prepare(self._delays.get_value(), self.dt,
-                           self.synapse_sources.get_value())
+                           self.synapse_sources.get_value(),
+                           synapses_changed=synapses_changed)
+        self._queue_state = queue_state
 
     def push_spikes(self):
         # Push new spikes into the queue
@@ -564,7 +579,10 @@ class Synapses(Group):
         return self._N
 
     def before_run(self, namespace):
-        self.lastupdate = self.clock.t
+        # Refer to the time variable instead of using its current value, the
+        # generated code is then the same for every run (and does not have to
+        # be compiled again)
+        self.lastupdate = 't'
         super(Synapses, self).before_run(namespace)
 
     def _add_updater(self, code, prepost, objname=None):
@@ -721,7 +739,10 @@ class Synapses(Group):
         p : float, optional
             The probability to create `n` synapses wherever the condition
             given as `pre_or_cond` evaluates to true or for the given
-            pre/post indices.
+            pre/post indices. If `p` is a small constant, the condition is only
+            evaluated for randomly drawn candidate pairs, i.e. the time
+            needed to create the synapses does not scale with the number of
+            all possible pairs but with the number of candidates.
         n : int, optional
             The number of synapses to create per pre/post connection pair.
             Defaults to 1.
@@ -877,13 +898,22 @@ class Synapses(Group):
                     variable_indices[varname] = '_all_post'
             variable_indices['_all_pre'] = 'i'
             variable_indices['_all_post'] = 'j'
+            # With a small constant probability, the templates can directly draw
+            # the candidate pairs instead of evaluating the condition for all
+            # pairs of neurons and drawing a random number for each of them
+            # (for larger probabilities, the latter is faster)
+            if isinstance(p, float) and 0 < p < 0.25:
+                template_kwds = {'_sparse_p': p}
+            else:
+                template_kwds = {'_sparse_p': None}
             codeobj = create_runner_codeobj(self,
                                             abstract_code,
                                             'synapses_create',
                                             variable_indices=variable_indices,
                                             additional_variables=variables,
                                             additional_namespace=additional_namespace,
-                                            check_units=False
+                                            check_units=False,
+                                            template_kwds=template_kwds
                                             )
             codeobj()
 
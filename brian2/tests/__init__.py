@@ -1,4 +1,39 @@
 import os
+import shutil
+import tempfile
+
+#: Preferences for cache directories that are replaced by temporary
+#: directories during the test run
+_cache_directory_prefs = ['stateupdaters.cache_directory',
+                          'codegen.runtime.cython.cache_directory']
+_old_cache_dirs = {}
+_cache_dirs = {}
+
+
+def setup_package():
+    '''
+    Store the results of state updaters and the compiled Cython modules in
+    temporary directories during the test run, the tests should neither use
+    nor fill the user's caches.
+    '''
+    from brian2.core.preferences import brian_prefs
+    for pref in _cache_directory_prefs:
+        _old_cache_dirs[pref] = brian_prefs[pref]
+        _cache_dirs[pref] = tempfile.mkdtemp()
+        brian_prefs[pref] = _cache_dirs[pref]
+    # Tests calling restore_initial_state restore the backed up preferences
+    brian_prefs._backup()
+
+
+def teardown_package():
+    from brian2.core.preferences import brian_prefs
+    from brian2.stateupdaters.cache import clear_stateupdater_cache
+    for pref in _cache_directory_prefs:
+        brian_prefs[pref] = _old_cache_dirs.pop(pref)
+    brian_prefs._backup()
+    clear_stateupdater_cache(disk=False)
+    for pref in _cache_directory_prefs:
+        shutil.rmtree(_cache_dirs.pop(pref), ignore_errors=True)
 
 
 def run():
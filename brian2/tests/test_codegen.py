@@ -1,13 +1,30 @@
+import os
+import time
+import shutil
+import tempfile
 from collections import namedtuple
 
 import numpy as np
-from numpy.testing import assert_raises
+from numpy.testing import assert_raises, assert_allclose
+from nose import SkipTest, with_setup
 
 from brian2.codegen.translation import (analyse_identifiers,
                                         get_identifiers_recursively,
-                                        translate_subexpression)
-from brian2.core.variables import Subexpression, Variable
-from brian2.units.fundamentalunits import Unit
+                                        translate_subexpression,
+                                        make_statements,
+                                        optimise_statements)
+from brian2.codegen.codeobject import (CodeObject, defer_compilation,
+                                       deferred_compilation,
+                                       get_code_object_cache_statistics,
+                                       clear_code_object_cache,
+                                       _preferences_cache_key)
+from brian2.codegen.runtime.weave_rt.weave_rt import _evict_modules
+from brian2.core.functions import DEFAULT_FUNCTIONS
+from brian2.core.preferences import brian_prefs
+from brian2.core.variables import Subexpression, Variable, Constant
+from brian2.units.fundamentalunits import Unit, DimensionMismatchError
+from brian2.utils.stringtools import get_identifiers
+from brian2 import restore_initial_state
 
 FakeGroup = namedtuple('FakeGroup', ['variables'])
 
@@ -64,7 +81,346 @@ def test_translate_subexpression():
     # an error
     assert_raises(KeyError, lambda: translate_subexpression(sub, G3.variables))
 
+
+def test_weave_cache_eviction():
+    '''
+    Test that the least recently used modules are deleted from the weave
+    extension cache when it grows too large.
+    '''
+    cache_dir = tempfile.mkdtemp()
+    try:
+        now = time.time()
+        for idx, name in enumerate(['a', 'b', 'c', 'd']):
+            for ext in ['.cpp', '.so']:
+                fname = os.path.join(cache_dir, 'brian_weave_' + name + ext)
+                with open(fname, 'w') as f:
+                    f.write('x' * 100)
+                # "a" is the least recently used module
+                os.utime(fname, (now - 100 + idx, now - 100 + idx))
+        # unrelated files are ignored
+        open(os.path.join(cache_dir, 'other.so'), 'w').close()
+        assert _evict_modules(cache_dir, 1000) == 0
+        assert _evict_modules(cache_dir, 500, keep=['brian_weave_a']) == 2
+        assert sorted(os.listdir(cache_dir)) == ['brian_weave_a.cpp',
+                                                 'brian_weave_a.so',
+                                                 'brian_weave_d.cpp',
+                                                 'brian_weave_d.so',
+                                                 'other.so']
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+class FileCodeObject(CodeObject):
+    '''
+    A code object that "compiles" its code by writing it to a file.
+    '''
+    def __init__(self, code, directory):
+        CodeObject.__init__(self, None, code, {}, name='filecodeobject*')
+        self.fname = os.path.join(directory, code)
+        self.compiled = 0
+
+    def compile(self):
+        if (not os.path.exists(self.fname) and
+                not defer_compilation(self, self.code)):
+            self.build()
+        self.compiled += 1
+
+    def build(self):
+        with open(self.fname, 'a') as f:
+            f.write('x')
+
+
+def test_deferred_compilation():
+    '''
+    Test that code objects created in a `deferred_compilation` block are
+    built at its end, with each distinct source being built only once.
+    '''
+    old_processes = brian_prefs['codegen.max_compile_processes']
+    directory = tempfile.mkdtemp()
+    try:
+        for processes in [1, 2]:
+            brian_prefs['codegen.max_compile_processes'] = processes
+            codeobjs = []
+            with deferred_compilation():
+                for code in ['a', 'b', 'a', 'c']:
+                    codeobj = FileCodeObject(code + str(processes), directory)
+                    codeobj.compile()
+                    assert not os.path.exists(codeobj.fname)
+                    codeobjs.append(codeobj)
+            for codeobj in codeobjs:
+                with open(codeobj.fname) as f:
+                    assert f.read() == 'x'
+                assert codeobj.compiled == 2
+        # Without a deferred_compilation block, code is built immediately
+        codeobj = FileCodeObject('d', directory)
+        codeobj.compile()
+        assert os.path.exists(codeobj.fname)
+    finally:
+        brian_prefs['codegen.max_compile_processes'] = old_processes
+        shutil.rmtree(directory)
+
+
+def test_code_object_cache():
+    '''
+    Test that code objects are reused for repeated runs as long as nothing
+    relevant changed.
+    '''
+    from brian2 import NeuronGroup, Network, ms, second, NumpyCodeObject
+    clear_code_object_cache()
+    G = NeuronGroup(1, 'dv/dt = -v/tau : 1', codeobj_class=NumpyCodeObject)
+    G.v = 1
+    net = Network(G)
+    tau = 10*ms
+    net.run(1*ms, namespace={'tau': tau})
+    codeobj = G.state_updater.codeobj
+    misses = get_code_object_cache_statistics()['misses']
+    net.run(1*ms, namespace={'tau': tau})
+    assert G.state_updater.codeobj is codeobj
+    statistics = get_code_object_cache_statistics()
+    assert statistics['misses'] == misses
+    assert statistics['hits'] >= 1
+    assert abs(G.v[0] - np.exp(-2*ms/tau)) < 1e-6
+    # A changed constant leads to a new code object
+    tau = 20*ms
+    net.run(1*ms, namespace={'tau': tau})
+    assert G.state_updater.codeobj is not codeobj
+    assert get_code_object_cache_statistics()['misses'] == misses + 1
+    assert abs(G.v[0] - np.exp(-2*ms/(10*ms))*np.exp(-1*ms/tau)) < 1e-6
+    # The preference part of the key is reused until a preference is set
+    prefs_key = _preferences_cache_key()
+    assert _preferences_cache_key() is prefs_key
+    old_optimisations = brian_prefs['codegen.loop_invariant_optimisations']
+    brian_prefs['codegen.loop_invariant_optimisations'] = not old_optimisations
+    try:
+        assert _preferences_cache_key() != prefs_key
+        codeobj = G.state_updater.codeobj
+        net.run(1*ms, namespace={'tau': tau})
+        assert G.state_updater.codeobj is not codeobj
+    finally:
+        brian_prefs['codegen.loop_invariant_optimisations'] = old_optimisations
+    # Changing the unit has to trigger the unit check again
+    tau = 20*second/second
+    assert_raises(DimensionMismatchError, lambda: net.run(1*ms, namespace={'tau': tau}))
+    clear_code_object_cache()
+    assert get_code_object_cache_statistics() == {'hits': 0, 'misses': 0}
+
+
+def test_optimise_statements():
+    '''
+    Test that loop-invariant expressions are split off from the statements.
+    '''
+    from brian2 import NeuronGroup, Network, ms, NumpyCodeObject
+    G = NeuronGroup(1, 'dv/dt = -v/tau : 1', codeobj_class=NumpyCodeObject)
+    variables = dict(G.variables)
+    variables['tau'] = Constant('tau', Unit(1), 10.0)
+    variables['exp'] = DEFAULT_FUNCTIONS['exp']
+    variables['rand'] = DEFAULT_FUNCTIONS['rand']
+    code = '''
+    _v = v * exp(-dt/tau) + v*dt/tau
+    v = _v
+    y = i * dt / tau
+    x = rand() * dt / tau
+    '''
+    statements = make_statements(code, variables, np.float64)
+    scalar, vector = optimise_statements(statements, variables)
+    assert len(scalar) == 2
+    assert all(stmt.op == ':=' and stmt.constant for stmt in scalar)
+    for stmt in scalar:
+        assert get_identifiers(stmt.expr).issubset(set(['dt', 'tau', 'exp']))
+    assert not 'tau' in get_identifiers(vector[0].expr)
+    assert get_identifiers(vector[0].expr) == set(['v', '_lio_1', '_lio_2'])
+    # Statements involving integers or rand() are not changed
+    assert [stmt.expr for stmt in vector[1:]] == [stmt.expr for stmt in statements[1:]]
+
+    # The results do not depend on the optimisation
+    results = []
+    for optimise in [True, False]:
+        brian_prefs['codegen.loop_invariant_optimisations'] = optimise
+        try:
+            G = NeuronGroup(5, 'dv/dt = -v/tau + v0/(2*tau) : 1\nv0 : 1',
+                            codeobj_class=NumpyCodeObject)
+            G.v = 'i'
+            G.v0 = '2 * i'
+            net = Network(G)
+            net.run(1*ms, namespace={'tau': 10*ms})
+            results.append(G.v[:])
+        finally:
+            brian_prefs['codegen.loop_invariant_optimisations'] = True
+    assert np.allclose(results[0], results[1])
+
+
+def test_numpy_inplace_operations():
+    '''
+    Test that the numpy state update code using scratch buffers gives the
+    same results as the standard code.
+    '''
+    from brian2 import (NeuronGroup, Synapses, Network, ms, NumpyCodeObject,
+                        defaultclock)
+    eqs = '''dv/dt = (I - v + 0.1*sin(w) - x**2)/tau : 1
+             dw/dt = -w/(3*tau) + abs(v)/tau : 1
+             x = v*0.5 : 1
+             I : 1'''
+    results = []
+    for inplace in [False, True]:
+        brian_prefs['codegen.runtime.numpy.inplace_operations'] = inplace
+        try:
+            for method in ['euler', 'rk4']:
+                for fused in [False, True]:
+                    G = NeuronGroup(10, eqs, method=method, threshold='v>1',
+                                    reset='v=0', fused=fused,
+                                    codeobj_class=NumpyCodeObject)
+                    G.I = 'i*0.2'
+                    S = Synapses(G, G, 'dg/dt = (v_post - g)/tau : 1',
+                                 pre='w += 0.1', connect='i!=j',
+                                 codeobj_class=NumpyCodeObject)
+                    net = Network(G, S)
+                    net.run(5*ms, namespace={'tau': 10*ms})
+                    results.append((G.v[:], G.w[:], S.g[:]))
+                    if inplace:
+                        if fused:
+                            codeobj = G.fused_updater.codeobj
+                        else:
+                            codeobj = G.state_updater.codeobj
+                        assert '_scratch_buffers' in codeobj.code
+                        assert len(codeobj.scratch_buffers) > 0
+        finally:
+            brian_prefs['codegen.runtime.numpy.inplace_operations'] = False
+    num = len(results) // 2
+    for standard, inplace in zip(results[:num], results[num:]):
+        for standard_values, inplace_values in zip(standard, inplace):
+            assert np.allclose(standard_values, inplace_values)
+
+
+def test_numexpr_fallback():
+    '''
+    Test that statements that numexpr cannot evaluate are evaluated with
+    numpy.
+    '''
+    try:
+        import numexpr
+    except ImportError:
+        raise SkipTest('numexpr is not available')
+    from brian2 import (NeuronGroup, Network, ms, NumpyCodeObject,
+                        NumexprCodeObject, TimedArray)
+    ta = TimedArray(np.linspace(0, 1, 10), dt=0.1*ms)
+    eqs = '''dv/dt = -v/tau : 1
+             w : 1
+             x : 1
+             y : 1'''
+    results = []
+    for codeobj_class in [NumpyCodeObject, NumexprCodeObject]:
+        G = NeuronGroup(5, eqs, threshold='v < 1 - 0.1*i', reset='''
+                        w = exp(-v) * x
+                        x = ta(v*ms) + v
+                        y = (v * 10) % 3''', codeobj_class=codeobj_class)
+        G.v = '0.5 + i'
+        net = Network(G)
+        net.run(1*ms, namespace={'tau': 10*ms, 'ta': ta, 'ms': ms})
+        results.append((G.v[:], G.w[:], G.x[:], G.y[:]))
+    lines = G.resetter.codeobj.code.split('\n')
+    evaluated = [line.split(' = ')[0] for line in lines
+                 if '_numexpr_evaluate' in line]
+    assert evaluated == ['w'], evaluated
+    assert '_numexpr_evaluate' in G.state_updater.codeobj.code
+    for numpy_values, numexpr_values in zip(*results):
+        assert np.allclose(numpy_values, numexpr_values)
+
+
+def test_cython_module_cache():
+    '''
+    Test that code objects with the same code reuse the compiled Cython
+    modules, either from memory or from the cache directory.
+    '''
+    try:
+        import Cython
+    except ImportError:
+        raise SkipTest('Cython is not available')
+    from brian2 import NeuronGroup, Network, ms, brian_prefs, CythonCodeObject
+    from brian2.codegen.runtime.cython_rt import cython_rt
+    cache_dir = tempfile.mkdtemp()
+    old_cache_dir = brian_prefs['codegen.runtime.cython.cache_directory']
+    brian_prefs['codegen.runtime.cython.cache_directory'] = cache_dir
+    old_modules = dict(cython_rt._compiled_modules)
+    try:
+        # The generated code depends on the name of the group, the same group
+        # is therefore used for all runs (the code objects are created anew
+        # for every run)
+        G = NeuronGroup(3, 'dv/dt = -v / (10*ms) : 1',
+                        codeobj_class=CythonCodeObject)
+        net = Network(G)
+        def run_group():
+            clear_code_object_cache()
+            G.v = [1, 2, 3]
+            before = cython_rt.get_cache_statistics()
+            net.run(0.5*ms)
+            after = cython_rt.get_cache_statistics()
+            return G.v[:], dict((key, after[key] - before[key])
+                                for key in after)
+        v, stats = run_group()
+        assert stats['compilations'] >= 1
+        assert np.allclose(v, np.array([1, 2, 3]) * np.exp(-0.05))
+        compiled = stats['compilations']
+        # same code in the same process: reuse the loaded modules
+        v2, stats = run_group()
+        assert stats['compilations'] == 0
+        assert stats['memory_hits'] >= compiled
+        assert np.allclose(v, v2)
+        # modules are loaded from the cache directory
+        cython_rt._compiled_modules.clear()
+        v3, stats = run_group()
+        assert stats['compilations'] == 0
+        assert stats['disk_hits'] >= compiled
+        assert np.allclose(v, v3)
+    finally:
+        cython_rt._compiled_modules.clear()
+        cython_rt._compiled_modules.update(old_modules)
+        brian_prefs['codegen.runtime.cython.cache_directory'] = old_cache_dir
+        clear_code_object_cache()
+        shutil.rmtree(cache_dir)
+
+
+@with_setup(teardown=restore_initial_state)
+def test_cython_argument_binding():
+    '''
+    Test that the compiled Cython code only takes the values that change every
+    time step as arguments and that arrays are bound again after they have
+    been resized (e.g. in monitors).
+    '''
+    try:
+        import Cython
+    except ImportError:
+        raise SkipTest('Cython is not available')
+    from brian2 import (NeuronGroup, SpikeMonitor, StateMonitor, Network, ms,
+                        Hz, NumpyCodeObject, CythonCodeObject)
+    results = []
+    for codeobj_class in [NumpyCodeObject, CythonCodeObject]:
+        G = NeuronGroup(5, '''dv/dt = (2*sin(2*pi*f*t) - v) / (5*ms) : 1
+                               f : Hz''', threshold='v > 0.5', reset='v = 0',
+                        codeobj_class=codeobj_class)
+        G.f = '(i + 1) * 50*Hz'
+        spike_mon = SpikeMonitor(G, codeobj_class=codeobj_class)
+        state_mon = StateMonitor(G, 'v', record=True,
+                                 codeobj_class=codeobj_class)
+        net = Network(G, spike_mon, state_mon)
+        net.run(20*ms)
+        results.append(spike_mon.it_ + (state_mon.v[:], ))
+        if codeobj_class is CythonCodeObject:
+            assert G.state_updater.codeobj.argument_names == ['t']
+            assert spike_mon.codeobj.argument_names == ['t']
+    assert len(results[0][0]) > 0
+    for numpy_values, cython_values in zip(*results):
+        assert_allclose(numpy_values, cython_values)
+
+
 if __name__ == '__main__':
     test_analyse_identifiers()
     test_get_identifiers_recursively()
     test_translate_subexpression()
+    test_weave_cache_eviction()
+    test_deferred_compilation()
+    test_code_object_cache()
+    test_optimise_statements()
+    test_numpy_inplace_operations()
+    test_numexpr_fallback()
+    test_cython_module_cache()
+    test_cython_argument_binding()
@@ -1,8 +1,10 @@
 import tempfile
 import os
+from collections import defaultdict
 
 from nose import with_setup
 import numpy
+from numpy.testing import assert_equal
 
 from brian2 import *
 from brian2.devices.cpp_standalone import *
@@ -56,8 +58,53 @@ def test_cpp_standalone(with_output=False):
     assert len(t)==17741
     assert t[0] == 0.
     assert t[-1] == float(100*ms - defaultclock.dt)
-    
+
+
+@with_setup(teardown=restore_device)
+def test_openmp_consistency(with_output=False):
+    Synapses.__instances__().clear()
+    set_device('cpp_standalone')
+    G = NeuronGroup(1000, '''dv/dt = (I - v)/(10*ms) + 0.1*xi/sqrt(ms) : 1 (unless refractory)
+                             I : 1
+                             s : 1''',
+                    threshold='v>1', reset='v=0', refractory=2*ms, name='gp')
+    G.v = 'rand()'
+    G.I = '0.5 + 1.0*i/1000'
+    S = Synapses(G, G, '''w : 1
+                          s_post = w : 1 (summed)''', pre='v += w')
+    S.connect('i!=j', p=0.05)
+    S.w = 0.01
+    M = SpikeMonitor(G)
+    net = Network(G, S, M)
+    net.run(20*ms)
+
+    results = defaultdict(list)
+    for threads, seed in [(0, 1), (3, 1), (3, 1), (3, 2)]:
+        tempdir = tempfile.mkdtemp()
+        build(project_dir=tempdir, compile_project=True, run_project=True,
+              with_output=with_output, openmp_threads=threads, seed=seed)
+        results[(threads, seed)].append([numpy.fromfile(os.path.join(tempdir, 'results', fname),
+                                                        dtype=dtype)
+                                         for fname, dtype in [('spikemonitor_codeobject_i', numpy.int32),
+                                                              ('_array_gp_v', numpy.float64),
+                                                              ('_array_gp_s', numpy.float64)]])
+    assert len(results[(0, 1)][0][0]) > 0
+    # Runs with the same seed give the same results
+    for first, second in zip(*results[(3, 1)]):
+        assert_equal(first, second)
+    # independent of the number of threads
+    for first, second in zip(results[(0, 1)][0], results[(3, 1)][0]):
+        assert_equal(first, second)
+    # but different seeds lead to different results
+    assert not all([numpy.array_equal(first, second)
+                    for first, second in zip(results[(3, 1)][0],
+                                             results[(3, 2)][0])])
+    # The summed variable does not depend on the random numbers or threads
+    assert_equal(results[(0, 1)][0][2], results[(3, 1)][0][2])
+
+
 if __name__=='__main__':
     # Print the debug output when testing this file only but not when running
     # via nose test
     test_cpp_standalone(with_output=True)
+    test_openmp_consistency(with_output=True)
@@ -0,0 +1,129 @@
+'''
+Tests for the Cython runtime target. Compiling the generated code takes some
+time, the general tests therefore only use the other targets and this module
+runs a few representative models with Cython, comparing the results to the
+ones obtained with numpy.
+'''
+import numpy as np
+from numpy.testing.utils import assert_equal, assert_allclose
+from nose import SkipTest, with_setup
+
+from brian2 import *
+
+
+def _run_with_targets(run_model):
+    '''
+    Run ``run_model(codeobj_class)`` with numpy and with Cython and return
+    both results.
+    '''
+    try:
+        import Cython
+    except ImportError:
+        raise SkipTest('Cython is not available')
+    return [run_model(codeobj_class)
+            for codeobj_class in [NumpyCodeObject, CythonCodeObject]]
+
+
+@with_setup(teardown=restore_initial_state)
+def test_cython_refractoriness():
+    def run_model(codeobj_class):
+        G = NeuronGroup(3, '''
+                        dv/dt = rate : 1 (unless refractory)
+                        dw/dt = rate : 1
+                        rate : Hz
+                        ''', threshold='v>1', reset='v=0;w=0',
+                        refractory='(t - lastspike) < 2*ms',
+                        codeobj_class=codeobj_class)
+        G.rate = '(i + 1) * 100*Hz'
+        mon = StateMonitor(G, ['v', 'w'], record=True,
+                           codeobj_class=codeobj_class)
+        spikes = SpikeMonitor(G, codeobj_class=codeobj_class)
+        net = Network(G, mon, spikes)
+        net.run(20*ms)
+        return mon.v[:], mon.w[:], spikes.i[:], spikes.t[:]
+
+    numpy_results, cython_results = _run_with_targets(run_model)
+    assert len(numpy_results[2]) > 0
+    for numpy_values, cython_values in zip(numpy_results, cython_results):
+        assert_allclose(numpy_values, cython_values)
+
+
+@with_setup(teardown=restore_initial_state)
+def test_cython_synapses():
+    def run_model(codeobj_class):
+        source = NeuronGroup(4, 'dv/dt = (i + 1) * 100*Hz : 1',
+                             threshold='v>1', reset='v=0',
+                             codeobj_class=codeobj_class)
+        target = NeuronGroup(3, '''dx/dt = -x / (5*ms) : 1
+                                   y : 1''', codeobj_class=codeobj_class)
+        S = Synapses(source[1:], target, '''w : 1
+                                            y_post = w : 1 (summed)''',
+                     pre='x += w', connect='i != j',
+                     codeobj_class=codeobj_class)
+        S.w = 'i + j'
+        S.delay = '(j + 1) * 0.1*ms'
+        mon = StateMonitor(target, ['x', 'y'], record=True,
+                           codeobj_class=codeobj_class)
+        net = Network(source, target, S, mon)
+        net.run(20*ms)
+        return mon.x[:], mon.y[:]
+
+    numpy_results, cython_results = _run_with_targets(run_model)
+    assert np.any(numpy_results[0] > 0)
+    for numpy_values, cython_values in zip(numpy_results, cython_results):
+        assert_allclose(numpy_values, cython_values)
+
+
+@with_setup(teardown=restore_initial_state)
+def test_cython_functions():
+    @make_function(codes={
+        'cython':{
+            'support_code':'''
+                cdef double usersin(double x):
+                    return sin(x)
+                ''',
+            },
+        })
+    @check_units(x=1, result=1)
+    def usersin(x):
+        return np.sin(x)
+
+    ta = TimedArray(np.linspace(0, 10, 11), .9*ms)
+
+    def run_model(codeobj_class):
+        G = NeuronGroup(4, '''func = usersin(variable) + ta(t) : 1
+                              variable : 1''',
+                        codeobj_class=codeobj_class)
+        G.variable = 'i'
+        mon = StateMonitor(G, 'func', record=True,
+                           codeobj_class=codeobj_class)
+        net = Network(G, mon)
+        net.run(11*ms, namespace={'usersin': usersin, 'ta': ta})
+        return mon.func_[:]
+
+    numpy_result, cython_result = _run_with_targets(run_model)
+    expected = (np.sin(np.arange(4))[:, None] +
+                np.clip(np.int_(np.arange(110) * 0.1 / 0.9 + 0.5), 0, 10))
+    assert_allclose(numpy_result, expected)
+    assert_equal(numpy_result, cython_result)
+
+
+@with_setup(teardown=restore_initial_state)
+def test_cython_poissongroup():
+    def run_model(codeobj_class):
+        P = PoissonGroup(2, np.array([0, 1./defaultclock.dt])*Hz,
+                         codeobj_class=codeobj_class)
+        spikes = SpikeMonitor(P, codeobj_class=codeobj_class)
+        net = Network(P, spikes)
+        net.run(2*defaultclock.dt)
+        return spikes.count[:]
+
+    for count in _run_with_targets(run_model):
+        assert_equal(count, np.array([0, 2]))
+
+
+if __name__ == '__main__':
+    test_cython_refractoriness()
+    test_cython_synapses()
+    test_cython_functions()
+    test_cython_poissongroup()
@@ -13,6 +13,13 @@ except ImportError:
     # Can't test C++
     codeobj_classes = [NumpyCodeObject]
 
+# numexpr is optional as well
+try:
+    import numexpr
+    codeobj_classes.append(NumexprCodeObject)
+except ImportError:
+    pass
+
 
 def test_math_functions():
     '''
@@ -322,6 +329,78 @@ def test_function_implementation_container():
     targets.codegen_targets = _previous_codegen_targets
 
 
+def test_philox_known_answers():
+    '''
+    Test the Philox-4x32-10 generator against the known-answer vectors of the
+    reference implementation.
+    '''
+    from brian2.codegen.rng import philox4x32
+    for counter, key, expected in [((0, 0, 0, 0), (0, 0),
+                                    (0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8)),
+                                   ((0xffffffff, )*4, (0xffffffff, )*2,
+                                    (0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd)),
+                                   ((0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344),
+                                    (0xa4093822, 0x299f31d0),
+                                    (0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1))]:
+        result = philox4x32(*([np.uint64(c) for c in counter] + list(key)))
+        assert_equal([int(r) for r in result], expected)
+
+
+def test_random_numbers():
+    '''
+    Test that rand() and randn() give the same numbers for all targets (with
+    the counter-based generator for numpy) and are reproducible with seed.
+    '''
+    old_counter_based = brian_prefs['codegen.runtime.numpy.counter_based_random']
+    try:
+        for counter_based in [False, True]:
+            brian_prefs['codegen.runtime.numpy.counter_based_random'] = counter_based
+            results = {}
+            for codeobj_class in codeobj_classes:
+                seed(4321)
+                G = NeuronGroup(1000, '''dv/dt = -v/(10*ms) + xi/sqrt(ms) : 1
+                                         x : 1
+                                         y : 1''', codeobj_class=codeobj_class)
+                G.x = 'rand()'
+                G.y = 'randn()'
+                # Every call draws its own random numbers
+                G.v = 'rand() - rand()'
+                values = [G.x[:].copy(), G.y[:].copy(), G.v[:].copy()]
+                net = Network(G)
+                net.run(1*ms)
+                values.append(G.v[:].copy())
+                results[codeobj_class] = values
+
+                x, y, v = values[:3]
+                assert np.all((x >= 0) & (x < 1))
+                assert 0.45 < np.mean(x) < 0.55
+                assert -0.1 < np.mean(y) < 0.1
+                assert 0.9 < np.std(y) < 1.1
+                assert np.sum(v == 0) < 2
+
+            if counter_based:
+                for codeobj_class in codeobj_classes[1:]:
+                    for first, second in zip(results[codeobj_classes[0]],
+                                             results[codeobj_class]):
+                        assert_allclose(first, second)
+
+            # The same seed gives the same numbers, but later executions of
+            # the same code give new numbers
+            G = NeuronGroup(100, 'x : 1', codeobj_class=NumpyCodeObject)
+            seed(4321)
+            G.x = 'rand()'
+            x1 = G.x[:].copy()
+            G.x = 'rand()'
+            x2 = G.x[:].copy()
+            seed(4321)
+            G.x = 'rand()'
+            assert_equal(G.x[:], x1)
+            assert not np.any(x1 == x2)
+    finally:
+        brian_prefs['codegen.runtime.numpy.counter_based_random'] = old_counter_based
+    assert_raises(ValueError, lambda: seed(-1))
+
+
 if __name__ == '__main__':
     test_math_functions()
     test_user_defined_function()
@@ -330,3 +409,5 @@ if __name__ == '__main__':
     test_user_defined_function_discarding_units()
     test_user_defined_function_discarding_units_2()
     test_function_implementation_container()
+    test_philox_known_answers()
+    test_random_numbers()
@@ -1,3 +1,7 @@
+import os
+import shutil
+import tempfile
+
 import numpy as np
 from numpy.testing.utils import assert_allclose, assert_equal, assert_raises
 
@@ -144,6 +148,190 @@ def test_state_monitor():
     brian_prefs.codegen.target = language_before
 
 
+def test_state_monitor_storage():
+    language_before = brian_prefs.codegen.target
+    for language in languages:
+        brian_prefs.codegen.target = language
+        defaultclock.t = 0*second
+        G = NeuronGroup(2, 'dv/dt = -v / (10*ms) : 1')
+        G.v = 1
+        mon = StateMonitor(G, 'v', record=True)
+        net = Network(G, mon)
+        net.run(5*defaultclock.dt)
+        # The storage is preallocated and only contains the recorded values
+        # after the run
+        assert_equal(mon.variables['_t'].get_value().shape, (5, ))
+        assert_equal(mon.variables['_recorded_v'].get_value().shape, (5, 2))
+        # The values are returned as read-only views without a copy
+        assert np.may_share_memory(mon.v_,
+                                   mon.variables['_recorded_v'].get_value())
+        assert np.may_share_memory(mon.t_, mon.variables['_t'].get_value())
+        assert not mon.v.flags.writeable
+        assert not mon[1].v_.flags.writeable
+
+        def set_values():
+            mon.v_[:] = 0
+        assert_raises(ValueError, set_values)
+
+        # Stop the run after three time steps, the storage for the remaining
+        # time steps is discarded
+        steps = [0]
+        @network_operation(when='end')
+        def stop_after_three_steps():
+            steps[0] += 1
+            if steps[0] == 3:
+                net.stop()
+        net.add(stop_after_three_steps)
+        net.run(10*defaultclock.dt)
+        assert_equal(len(mon.t), 8)
+        assert_equal(mon.variables['_recorded_v'].get_value().shape, (8, 2))
+        net.remove(stop_after_three_steps)
+        net.run(2*defaultclock.dt)
+        assert_equal(len(mon.t), 10)
+        assert_equal(mon.v.shape, (2, 10))
+        assert_allclose(mon.v_[0], np.exp(-np.arange(1, 11) *
+                                          float(defaultclock.dt / (10*ms))))
+        assert_equal(mon[0].v, mon.v[0])
+
+    brian_prefs.codegen.target = language_before
+
+
+def test_state_monitor_intervals():
+    language_before = brian_prefs.codegen.target
+    for language in languages:
+        brian_prefs.codegen.target = language
+        G = NeuronGroup(2, 'dv/dt = 1/ms : 1')
+        dt = defaultclock.dt
+        all_mon = StateMonitor(G, 'v', record=True)
+        every_mon = StateMonitor(G, 'v', record=True, every=3)
+        dt_mon = StateMonitor(G, 'v', record=[1], dt=5*dt)
+        window_mon = StateMonitor(G, 'v', record=True, start=[2, 10]*dt,
+                                  stop=[5, 13]*dt)
+        mean_mon = StateMonitor(G, 'v', record=True, every=4, mean=True,
+                                start=3*dt)
+        net = Network(G, all_mon, every_mon, dt_mon, window_mon, mean_mon)
+        net.run(10*dt)
+        net.run(5*dt)
+
+        assert_equal(len(all_mon.t), 15)
+        assert_allclose(every_mon.t, all_mon.t[::3])
+        assert_allclose(every_mon.v, all_mon.v[:, ::3])
+        assert_allclose(dt_mon.t, [0, 5, 10]*dt)
+        assert_allclose(dt_mon.v, all_mon.v[1:2, ::5])
+        assert_allclose(window_mon.t, [2, 3, 4, 10, 11, 12]*dt)
+        assert_allclose(window_mon.v, all_mon.v[:, [2, 3, 4, 10, 11, 12]])
+        # The mean over the time steps 3, 4-7, 8-11 and 12-14
+        assert_allclose(mean_mon.t, [3, 4, 8, 12]*dt)
+        assert_allclose(mean_mon.v[0], [all_mon.v[0, 3],
+                                        np.mean(all_mon.v[0, 4:8]),
+                                        np.mean(all_mon.v[0, 8:12]),
+                                        np.mean(all_mon.v[0, 12:15])])
+        # No storage is used for time steps that are not recorded
+        assert_equal(every_mon.variables['_recorded_v'].get_value().shape,
+                     (5, 2))
+        assert_equal(window_mon.variables['_t'].get_value().shape, (6, ))
+
+    brian_prefs.codegen.target = language_before
+
+
+def test_state_monitor_intervals_errors():
+    G = NeuronGroup(2, '''v : 1
+                           b : bool''')
+    dt = defaultclock.dt
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', dt=2*dt, every=2))
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', dt=1.5*dt))
+    assert_raises(DimensionMismatchError, lambda: StateMonitor(G, 'v', dt=2))
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', every=0))
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', every=1.5))
+    assert_raises(DimensionMismatchError,
+                  lambda: StateMonitor(G, 'v', start=[1, 2]))
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', start=[1, 2]*ms,
+                                                   stop=[2, 3, 4]*ms))
+    assert_raises(ValueError, lambda: StateMonitor(G, 'v', start=2*ms,
+                                                   stop=1*ms))
+    assert_raises(TypeError, lambda: StateMonitor(G, 'b', mean=True))
+
+
+def test_file_storage():
+    language_before = brian_prefs.codegen.target
+    directory = tempfile.mkdtemp()
+    try:
+        for language in languages:
+            for background in [False, True]:
+                brian_prefs.codegen.target = language
+                G = NeuronGroup(3, '''dv/dt = rate : 1
+                                      rate : Hz''', threshold='v>1',
+                                reset='v=0')
+                G.rate = [101, 1001, 2001] * Hz
+                dt = defaultclock.dt
+                storage = FileStorage(directory, flush_every=4,
+                                      background=background)
+                spike_mon = SpikeMonitor(G, storage=storage)
+                state_mon = StateMonitor(G, 'v', record=[0, 2],
+                                         storage=storage)
+                mean_mon = StateMonitor(G, 'v', record=True, every=3,
+                                        mean=True, storage=storage)
+                # The same monitors recording in memory
+                spike_mon_mem = SpikeMonitor(G)
+                state_mon_mem = StateMonitor(G, 'v', record=[0, 2])
+                mean_mon_mem = StateMonitor(G, 'v', record=True, every=3,
+                                            mean=True)
+                net = Network(G, spike_mon, state_mon, mean_mon,
+                              spike_mon_mem, state_mon_mem, mean_mon_mem)
+                net.run(10*dt)
+                # The last averaging interval continues in the next run, the
+                # values are therefore copied
+                mean_values = mean_mon.v_
+                mean_values_before = mean_values.copy()
+                # Accessing the values between two runs
+                net.run(11*dt)
+                assert_equal(state_mon.v.shape, (2, 21))
+                assert_equal(mean_values, mean_values_before)
+                net.run(30*dt)
+
+                assert_equal(spike_mon.i, spike_mon_mem.i)
+                assert_equal(spike_mon.t, spike_mon_mem.t)
+                assert_equal(spike_mon.count, spike_mon_mem.count)
+                assert_equal(state_mon.t, state_mon_mem.t)
+                assert_equal(state_mon.v, state_mon_mem.v)
+                assert_equal(state_mon[2].v, state_mon_mem[2].v)
+                # The averaging intervals continue over several runs
+                assert_equal(mean_mon.t, mean_mon_mem.t)
+                assert_allclose(mean_mon.v, mean_mon_mem.v)
+                # The values are memory-mapped from the files
+                assert isinstance(state_mon.v_.base, np.memmap)
+                assert not state_mon.v_.flags.writeable
+                # The last averaging interval has ended with the run
+                assert isinstance(mean_mon.v_.base, np.memmap)
+                values = np.load(os.path.join(directory,
+                                              state_mon.name + '_v.npy'))
+                assert_equal(values, state_mon_mem.v_.T)
+                # Only the values since the last write are in memory
+                assert len(state_mon.variables['_t'].get_value()) <= 5
+                assert len(spike_mon.variables['_i'].get_value()) == 0
+
+                storage.close()
+                assert storage._thread is None
+                for mon in [spike_mon, state_mon, mean_mon]:
+                    assert all([npy_file._file.closed
+                                for npy_file in mon._files.itervalues()])
+                # The values can still be accessed
+                assert_equal(state_mon.v, state_mon_mem.v)
+                assert_equal(spike_mon.i, spike_mon_mem.i)
+                if not background:
+                    assert_raises(ValueError,
+                                  lambda: storage.write(state_mon._files['_t'],
+                                                        np.zeros(1)))
+    finally:
+        brian_prefs.codegen.target = language_before
+        shutil.rmtree(directory)
+
+    assert_raises(ValueError, lambda: FileStorage(directory, flush_every=0))
+    G = NeuronGroup(1, 'v : 1')
+    assert_raises(TypeError, lambda: StateMonitor(G, 'v', storage=directory))
+    assert_raises(TypeError, lambda: SpikeMonitor(G, storage=directory))
+
+
 def test_rate_monitor():
     language_before = brian_prefs.codegen.target
     for language in languages:
@@ -173,4 +361,8 @@ def test_rate_monitor():
 if __name__ == '__main__':
     test_spike_monitor()
     test_state_monitor()
+    test_state_monitor_storage()
+    test_state_monitor_intervals()
+    test_state_monitor_intervals_errors()
+    test_file_storage()
     test_rate_monitor()
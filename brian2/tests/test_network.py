@@ -62,6 +62,44 @@ def test_network_different_clocks():
     net.run(10*ms)
     assert_equal(''.join(updates), 'xyxxxyxxxyxxxy')
 
+@with_setup(teardown=restore_initial_state)
+def test_network_rational_clocks():
+    # Clocks with time steps that are not integer multiples of each other
+    updates[:] = []
+    clock2 = Clock(dt=0.2*ms)
+    clock3 = Clock(dt=0.3*ms)
+    x = NameLister(name='x', when=(clock2, 0))
+    y = NameLister(name='y', when=(clock3, 1))
+    net = Network(x, y)
+    net.run(1.2*ms)
+    assert_equal(''.join(updates), 'xyxyxxyxyx')
+
+@with_setup(teardown=restore_initial_state)
+def test_network_clock_cycle():
+    # Clocks are updated in a periodic pattern, also for long runs and time
+    # steps that cannot be represented exactly
+    clock1 = Clock(dt=0.1*ms)
+    clock2 = Clock(dt=0.25*ms)
+    clock3 = Clock(dt=0.3*ms)
+    x = Counter(when=clock1)
+    y = Counter(when=clock2)
+    z = Counter(when=clock3)
+    net = Network(x, y, z)
+    net.run(3*second)
+    assert_equal(net._clock_cycle[0], 30)
+    assert_equal(x.count, 30000)
+    assert_equal(y.count, 12000)
+    assert_equal(z.count, 10000)
+    # A run that does not start at a multiple of all time steps
+    net.run(0.15*ms)
+    assert_equal(x.count, 30002)
+    assert_equal(y.count, 12001)
+    assert_equal(z.count, 10001)
+    net.run(0.15*ms)
+    assert_equal(x.count, 30003)
+    assert_equal(y.count, 12002)
+    assert_equal(z.count, 10001)
+
 @with_setup(teardown=restore_initial_state)
 def test_network_different_when():
     # Check that a network with different when attributes functions correctly
@@ -166,6 +204,49 @@ def test_network_active_flag():
     assert_equal(x.count, 10)
     assert_equal(y.count, 0)
 
+@with_setup(teardown=restore_initial_state)
+def test_network_active_flag_during_run():
+    # changing the active flag during a run takes effect immediately
+    x = Counter()
+    y = Counter()
+    @network_operation(when='end')
+    def switch():
+        if x.count == 5:
+            x.active = False
+            y.active = False
+    net = Network(x, y, switch)
+    net.run(1*ms)
+    assert_equal(x.count, 5)
+    assert_equal(y.count, 5)
+    x.active = True
+    net.run(1*ms)
+    assert_equal(x.count, 15)
+    assert_equal(y.count, 5)
+    # adding and removing objects between runs
+    z = Counter()
+    net.add(z)
+    net.remove(switch)
+    net.run(1*ms)
+    assert_equal(x.count, 25)
+    assert_equal(z.count, 10)
+
+@with_setup(teardown=restore_initial_state)
+def test_network_active_flag_within_time_step():
+    # changing the active flag applies to the remaining objects of the step
+    x = Counter(when='end')
+    y = Counter(when='end')
+    @network_operation(when='start')
+    def switch():
+        if 0.5*ms <= defaultclock.t < 0.7*ms:
+            x.active = False
+        elif defaultclock.t >= 0.7*ms and y in net.objects:
+            x.active = True
+            net.remove(y)
+    net = Network(x, y, switch)
+    net.run(1*ms)
+    assert_equal(x.count, 8)
+    assert_equal(y.count, 7)
+
 @with_setup(teardown=restore_initial_state)
 def test_network_t():
     # test that Network.t works as expected
@@ -324,12 +405,16 @@ if __name__=='__main__':
               test_network_single_object,
               test_network_two_objects,
               test_network_different_clocks,
+              test_network_rational_clocks,
+              test_network_clock_cycle,
               test_network_different_when,
               test_network_reinit_pre_post_run,
               test_magic_network,
               test_network_stop,
               test_network_operations,
               test_network_active_flag,
+              test_network_active_flag_during_run,
+              test_network_active_flag_within_time_step,
               test_network_t,
               test_network_remove,
               test_network_copy,
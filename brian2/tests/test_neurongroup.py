@@ -3,6 +3,8 @@ import numpy as np
 from numpy.testing.utils import assert_raises, assert_equal, assert_allclose
 
 from brian2.groups.neurongroup import NeuronGroup
+from brian2.synapses.synapses import Synapses
+from brian2.monitors.statemonitor import StateMonitor
 from brian2.core.network import Network
 from brian2.core.clocks import defaultclock
 from brian2.units.fundamentalunits import (DimensionMismatchError,
@@ -11,6 +13,7 @@ from brian2.units.allunits import second, volt
 from brian2.units.stdunits import ms, mV
 from brian2.codegen.runtime.weave_rt import WeaveCodeObject
 from brian2.codegen.runtime.numpy_rt import NumpyCodeObject
+from brian2.codegen.runtime.numexpr_rt import NumexprCodeObject
 from brian2.utils.logger import catch_logs
 
 # We can only test C++ if weave is available
@@ -21,6 +24,13 @@ except ImportError:
     # Can't test C++
     codeobj_classes = [NumpyCodeObject]
 
+# numexpr is optional as well
+try:
+    import numexpr
+    codeobj_classes.append(NumexprCodeObject)
+except ImportError:
+    pass
+
 
 def test_creation():
     '''
@@ -161,6 +171,61 @@ def test_threshold_reset():
         net.run(defaultclock.dt)
         assert_equal(G.v[:], np.array([0, 1, 0.5]))
 
+
+def test_fused_update():
+    '''
+    Test that performing state update, threshold and reset in a single code
+    object gives the same results as the separate code objects.
+    '''
+    for codeobj_class in codeobj_classes:
+        results = []
+        for fused in [False, True]:
+            G = NeuronGroup(10, '''dv/dt = (v0 - v) / (10*ms) : 1 (unless refractory)
+                                   v0 : 1''',
+                            threshold='v > 1', reset='v = 0', refractory=2*ms,
+                            codeobj_class=codeobj_class, fused=fused)
+            G.v0 = 'i * 0.3'
+            net = Network(G)
+            if fused:
+                assert G.fused_updater in net.objects
+                assert G.state_updater not in net.objects
+                assert G.thresholder not in net.objects
+                # Not run when collected by the MagicNetwork
+                assert not G.state_updater.active
+                assert not G.thresholder.active
+                # The reset is not fused
+                assert G.resetter in net.objects
+            net.run(20*ms)
+            results.append((G.v[:], G.lastspike[:]))
+        assert_equal(results[0][0], results[1][0])
+        assert_equal(results[0][1], results[1][1])
+
+        # Synaptic effects in the time step of a spike are overwritten by the
+        # reset in both cases
+        results = []
+        for fused in [False, True]:
+            G = NeuronGroup(2, 'dv/dt = 1/(2*ms) : 1', threshold='v > 0.5',
+                            reset='v = 0', codeobj_class=codeobj_class,
+                            fused=fused)
+            # Both neurons spike in the same time steps
+            G.v = 0.2
+            S = Synapses(G, G, pre='v_post += 0.5', connect='i!=j',
+                         codeobj_class=codeobj_class)
+            mon = StateMonitor(G, 'v', record=True)
+            net = Network(G, S, mon)
+            net.run(2*ms)
+            results.append(mon.v[:])
+        assert_equal(results[0], results[1])
+
+        # no threshold and reset
+        G = NeuronGroup(3, 'dv/dt = -v / (10*ms) : 1',
+                        codeobj_class=codeobj_class, fused=True)
+        G.v = 1
+        net = Network(G)
+        net.run(defaultclock.dt)
+        assert_allclose(G.v[:], np.exp(-float(defaultclock.dt) / 0.01),
+                        rtol=1e-4)
+
 def test_unit_errors_threshold_reset():
     '''
     Test that unit errors in thresholds and resets are detected.
@@ -434,6 +499,7 @@ if __name__ == '__main__':
     test_stochastic_variable()
     test_unit_errors()
     test_threshold_reset()
+    test_fused_update()
     test_unit_errors_threshold_reset()
     test_incomplete_namespace()
     test_namespace_errors()
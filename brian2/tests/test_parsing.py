@@ -5,6 +5,7 @@ from collections import namedtuple
 
 from numpy.testing import assert_allclose, assert_raises
 import numpy as np
+import sympy
 
 from brian2.core.preferences import brian_prefs
 from brian2.utils.stringtools import get_identifiers, deindent
@@ -20,6 +21,7 @@ from brian2.parsing.functions import (abstract_code_from_function,
                                       extract_abstract_code_functions,
                                       substitute_abstract_code_functions)
 from brian2.units import volt, amp, DimensionMismatchError, have_same_dimensions
+from brian2.utils.caching import clear_caches, get_cache_statistics
 from brian2.core.namespace import create_namespace
 
 try:
@@ -271,6 +273,68 @@ def test_parse_expression_unit():
         assert_raises(SyntaxError, parse_expression_unit, expr, varunits, {})
 
 
+def test_parsing_caches():
+    clear_caches()
+    try:
+        # The same string gives the same sympy expression
+        s_expr = str_to_sympy('a*b + c')
+        assert str_to_sympy('a*b + c') is s_expr
+        assert get_cache_statistics()['str_to_sympy']['hits'] == 1
+
+        # Expressions that sympy considers equal have to give different
+        # strings
+        a = sympy.Symbol('a')
+        assert sympy_to_str(sympy.Integer(2)*a) == '2*a'
+        assert sympy_to_str(sympy.Float(2)*a) == '2.0*a'
+        assert sympy_to_str(sympy.Integer(2)*a) == '2*a'
+        assert get_cache_statistics()['sympy_to_str']['hits'] == 1
+
+        # The result depends on the units of the identifiers and on the values
+        # of exponents
+        default_namespace = create_namespace({})
+        namespace = dict(default_namespace)
+        namespace.update({'a': volt, 'b': amp, 'n': 2})
+        assert have_same_dimensions(parse_expression_unit('a', namespace, {}),
+                                    volt)
+        assert have_same_dimensions(parse_expression_unit('a**n', namespace, {}),
+                                    volt**2)
+        namespace.update({'a': amp, 'n': 3})
+        assert have_same_dimensions(parse_expression_unit('a', namespace, {}),
+                                    amp)
+        assert have_same_dimensions(parse_expression_unit('a**n', namespace, {}),
+                                    amp**3)
+        assert have_same_dimensions(parse_expression_unit('a', namespace, {}),
+                                    amp)
+        assert get_cache_statistics()['parse_expression_unit']['hits'] == 1
+        # Errors are not cached
+        for _ in xrange(2):
+            assert_raises(DimensionMismatchError, parse_expression_unit,
+                          'a + n', namespace, {})
+
+        # A cache size of 0 switches off caching
+        old_size = brian_prefs['core.parsing_cache_size']
+        try:
+            clear_caches()
+            brian_prefs['core.parsing_cache_size'] = 0
+            str_to_sympy('x + y')
+            str_to_sympy('x + y')
+            assert get_cache_statistics()['str_to_sympy'] == {'size': 0,
+                                                              'hits': 0,
+                                                              'misses': 2}
+            # A small cache only keeps the most recently used entries
+            brian_prefs['core.parsing_cache_size'] = 2
+            for expr in ['x', 'y', 'x', 'z']:
+                str_to_sympy(expr)
+            assert get_cache_statistics()['str_to_sympy']['size'] == 2
+            str_to_sympy('x')  # still in the cache
+            str_to_sympy('y')  # has been removed
+            assert get_cache_statistics()['str_to_sympy']['hits'] == 2
+        finally:
+            brian_prefs['core.parsing_cache_size'] = old_size
+    finally:
+        clear_caches()
+
+
 def test_value_from_expression():
     # This function is used to get the value of an exponent, necessary for unit checking
 
@@ -377,6 +441,7 @@ if __name__=='__main__':
     test_abstract_code_dependencies()
     test_is_boolean_expression()
     test_parse_expression_unit()
+    test_parsing_caches()
     test_value_from_expression()
     test_abstract_code_from_function()
     test_extract_abstract_code_functions()
@@ -13,6 +13,13 @@ except ImportError:
     # Can't test C++
     codeobj_classes = [NumpyCodeObject]
 
+# numexpr is optional as well
+try:
+    import numexpr
+    codeobj_classes.append(NumexprCodeObject)
+except ImportError:
+    pass
+
 
 def test_add_refractoriness():
     eqs = Equations('''
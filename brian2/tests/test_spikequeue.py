@@ -58,5 +58,42 @@ def test_spikequeue():
         queue.advance()
 
 
+def test_spikequeue_heterogeneous():
+    # Synapses are not sorted by source and several source neurons have
+    # synapses with the same delays
+    N = 10
+    dt = float(0.1*ms)
+    np.random.seed(1)
+    sources = np.random.randint(0, N, 200).astype(np.int32)
+    delays = np.random.randint(0, 5, len(sources)) * dt
+    for precompute_offsets in [True, False]:
+        queue = SpikeQueue(source_start=0, source_end=N,
+                           precompute_offsets=precompute_offsets)
+        queue.prepare(delays, dt, sources)
+        for spikes in [np.array([3], dtype=np.int32),
+                       np.array([0, 1, 2, 5, 9], dtype=np.int32),
+                       np.arange(N, dtype=np.int32)]:
+            queue.push(spikes)
+            for step in xrange(5):
+                expected = np.flatnonzero(np.in1d(sources, spikes) &
+                                          (np.round(delays / dt) == step))
+                assert_equal(np.sort(queue.peek()), expected)
+                queue.advance()
+
+
+def test_spikequeue_subgroup():
+    dt = float(0.1*ms)
+    sources = np.array([7, 5, 6, 5, 7], dtype=np.int32)
+    delays = np.array([0, 1, 1, 0, 1]) * dt
+    queue = SpikeQueue(source_start=5, source_end=8)
+    queue.prepare(delays, dt, sources)
+    queue.push(np.array([1, 5, 7, 8], dtype=np.int32))
+    assert_equal(np.sort(queue.peek()), np.array([0, 3]))
+    queue.advance()
+    assert_equal(np.sort(queue.peek()), np.array([1, 4]))
+
+
 if __name__ == '__main__':
     test_spikequeue()
+    test_spikequeue_heterogeneous()
+    test_spikequeue_subgroup()
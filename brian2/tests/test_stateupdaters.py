@@ -1,11 +1,16 @@
+import os
 import re
+import shutil
+import tempfile
 from collections import namedtuple
 
 from numpy.testing.utils import assert_equal, assert_raises
 
 from brian2 import *
 from brian2.utils.logger import catch_logs
-from brian2.core.variables import ArrayVariable, AttributeVariable, Variable
+from brian2.core.variables import (ArrayVariable, AttributeVariable, Variable,
+                                   Constant)
+from brian2.stateupdaters import cache
 
 
 def test_explicit_stateupdater_parsing():
@@ -328,6 +333,89 @@ def test_static_equations():
         assert_equal(mon1.v, mon2.v, 'Results for method %s differed!' % method)
 
 
+def test_stateupdater_cache():
+    '''
+    Test that the results of state updaters are stored and reused.
+    '''
+    class CountingStateUpdater(StateUpdateMethod):
+        calls = 0
+
+        def can_integrate(self, equations, variables):
+            CountingStateUpdater.calls += 1
+            return True
+
+        def __call__(self, equations, variables=None):
+            CountingStateUpdater.calls += 1
+            return euler(equations, variables)
+
+        def __repr__(self):
+            return 'CountingStateUpdater()'
+
+    counting = CountingStateUpdater()
+    old_directory = brian_prefs['stateupdaters.cache_directory']
+    old_use_cache = brian_prefs['stateupdaters.use_cache']
+    tempdir = tempfile.mkdtemp()
+    brian_prefs['stateupdaters.cache_directory'] = tempdir
+    brian_prefs['stateupdaters.use_cache'] = True
+    try:
+        clear_stateupdater_cache()
+        eqs = Equations('dv/dt = -c*v / (10*ms) : 1')
+        variables = {'v': Variable(name='v', unit=None),
+                     'c': Constant('c', Unit(1), 1.0)}
+        assert cached_can_integrate(counting, eqs, variables)
+        code = cached_stateupdate_code(counting, eqs, variables)
+        assert code == euler(eqs, variables)
+        assert CountingStateUpdater.calls == 2
+        # Results are reused from memory and from disk
+        for clear_memory in [False, True]:
+            if clear_memory:
+                clear_stateupdater_cache(disk=False)
+            assert cached_can_integrate(counting, eqs, variables)
+            reused_code = cached_stateupdate_code(counting, eqs, variables)
+            assert reused_code == code and isinstance(reused_code, str)
+            assert CountingStateUpdater.calls == 2
+        assert len(os.listdir(tempdir)) == 2
+
+        # Different equations or values of scalar constants are not reused
+        cached_stateupdate_code(counting, Equations('dv/dt = -2*c*v / (10*ms) : 1'),
+                                variables)
+        assert CountingStateUpdater.calls == 3
+        variables['c'] = Constant('c', Unit(1), 2.0)
+        cached_stateupdate_code(counting, eqs, variables)
+        assert CountingStateUpdater.calls == 4
+        # The linear state updater inserts the values of scalar constants
+        for c in [1.0, 2.0, 1.0]:
+            variables['c'] = Constant('c', Unit(1), c)
+            assert (cached_stateupdate_code(linear, eqs, variables) ==
+                    linear(eqs, variables))
+
+        # Caching can be switched off
+        brian_prefs['stateupdaters.use_cache'] = False
+        cached_stateupdate_code(counting, eqs, variables)
+        assert CountingStateUpdater.calls == 5
+        brian_prefs['stateupdaters.use_cache'] = True
+
+        # Stored results are not reused after a change of the source code
+        old_hashes = dict(cache._source_hashes)
+        try:
+            for filename in cache._source_files(counting):
+                cache._source_hashes[filename] = 'changed'
+            clear_stateupdater_cache(disk=False)
+            cached_stateupdate_code(counting, eqs, variables)
+            assert CountingStateUpdater.calls == 6
+        finally:
+            cache._source_hashes.clear()
+            cache._source_hashes.update(old_hashes)
+
+        clear_stateupdater_cache()
+        assert len(os.listdir(tempdir)) == 0
+    finally:
+        brian_prefs['stateupdaters.cache_directory'] = old_directory
+        brian_prefs['stateupdaters.use_cache'] = old_use_cache
+        clear_stateupdater_cache(disk=False)
+        shutil.rmtree(tempdir)
+
+
 if __name__ == '__main__':
     test_determination()
     test_explicit_stateupdater_parsing()
@@ -336,3 +424,4 @@ if __name__ == '__main__':
     test_priority()
     test_registration()
     test_static_equations()
+    test_stateupdater_cache()
@@ -11,6 +11,13 @@ except ImportError:
     # Can't test C++
     codeobj_classes = [NumpyCodeObject]
 
+# numexpr is optional as well
+try:
+    import numexpr
+    codeobj_classes.append(NumexprCodeObject)
+except ImportError:
+    pass
+
 
 def test_state_variables():
     '''
@@ -168,7 +175,9 @@ def test_spike_monitor():
         SG = G[3:]
         s_mon = SpikeMonitor(G, codeobj_class=codeobj_class)
         sub_s_mon = SpikeMonitor(SG, codeobj_class=codeobj_class)
-        net = Network(G, s_mon, sub_s_mon)
+        # A subgroup excluding spiking neurons on both sides
+        middle_s_mon = SpikeMonitor(G[1:5], codeobj_class=codeobj_class)
+        net = Network(G, s_mon, sub_s_mon, middle_s_mon)
         net.run(defaultclock.dt)
         assert_equal(s_mon.i, np.array([0, 2, 5]))
         assert_equal(s_mon.t_, np.zeros(3))
@@ -180,6 +189,8 @@ def test_spike_monitor():
         expected = np.zeros(7, dtype=int)
         expected[[2]] = 1
         assert_equal(sub_s_mon.count, expected)
+        assert_equal(middle_s_mon.i, np.array([1]))
+        assert_equal(middle_s_mon.count, np.array([0, 1, 0, 0]))
 
 
 def test_wrong_indexing():
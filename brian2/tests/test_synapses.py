@@ -11,6 +11,13 @@ except ImportError:
     # Can't test C++
     codeobj_classes = [NumpyCodeObject]
 
+# numexpr is optional as well
+try:
+    import numexpr
+    codeobj_classes.append(NumexprCodeObject)
+except ImportError:
+    pass
+
 
 def _compare(synapses, expected):
     conn_matrix = np.zeros((len(synapses.source), len(synapses.target)))
@@ -201,6 +208,88 @@ def test_connection_random():
         S.connect([0, 1], [0, 2], p=0.3)
 
 
+def test_connection_block_size():
+    '''
+    Test that the synapse creation does not depend on the number of pairs of
+    neurons that are considered at once (numpy only).
+    '''
+    G = NeuronGroup(42, 'v: 1')
+    G.v = 'i'
+    G2 = NeuronGroup(17, 'v: 1')
+    old_block_size = brian_prefs['codegen.runtime.numpy.synapse_creation_block_size']
+    try:
+        results = []
+        for block_size in [1, 20, 42*17, 1000000]:
+            brian_prefs['codegen.runtime.numpy.synapse_creation_block_size'] = block_size
+            seed(42)
+            S = Synapses(G, G2, 'w:1', 'v+=w', codeobj_class=NumpyCodeObject)
+            S.connect('i!=j', p=0.3)
+            S.connect('v_pre > 20 and j < 10', n='j % 3')
+            S.connect('rand() < 0.1')
+            S.connect(True)
+            results.append((S.i[:], S.j[:]))
+            assert len(S.w[:]) == len(S)
+        for i, j in results[1:]:
+            assert_equal(i, results[0][0])
+            assert_equal(j, results[0][1])
+    finally:
+        brian_prefs['codegen.runtime.numpy.synapse_creation_block_size'] = old_block_size
+
+
+def test_connection_sparse_sampling():
+    '''
+    Test synapse creation with a small constant probability, where only
+    randomly drawn candidate pairs are considered.
+    '''
+    G = NeuronGroup(200, 'v: 1')
+    G.v = 'i'
+    G2 = NeuronGroup(300, 'v: 1')
+    for codeobj_class in codeobj_classes:
+        S = Synapses(G, G2, 'w:1', 'v+=w', codeobj_class=codeobj_class)
+        S.connect(True, p=0.1)
+        # The expected number is 6000 with a standard deviation of ~73
+        assert 5500 < len(S) < 6500
+        # No pair is connected twice and synapses are ordered by source
+        pairs = S.i[:] * len(G2) + S.j[:]
+        assert all(np.diff(pairs) > 0)
+        S2 = Synapses(G, G2, 'w:1', 'v+=w', codeobj_class=codeobj_class)
+        S2.connect('v_pre >= 100 and j != 5', p=0.1, n=2)
+        assert all(S2.i[:] >= 100)
+        assert all(S2.j[:] != 5)
+        assert 5000 < len(S2) < 7000
+        assert len(S2.w[:]) == len(S2)
+
+
+def test_connection_random_consistency():
+    '''
+    Test that random connections (with random numbers drawn for each pair of
+    neurons) are the same for all targets (with the counter-based generator
+    for numpy) and that all pairs use independent random numbers.
+    '''
+    G = NeuronGroup(50, 'v: 1')
+    G2 = NeuronGroup(40, 'v: 1')
+    results = []
+    old_counter_based = brian_prefs['codegen.runtime.numpy.counter_based_random']
+    brian_prefs['codegen.runtime.numpy.counter_based_random'] = True
+    try:
+        for codeobj_class in codeobj_classes:
+            seed(17)
+            S = Synapses(G, G2, 'w:1', 'v+=w', codeobj_class=codeobj_class)
+            S.connect('rand() < 0.5', p=0.5)
+            S.w = 'rand()'
+            results.append((S.i[:].copy(), S.j[:].copy(), S.w[:].copy()))
+            # The targets of a neuron do not repeat for the next neuron
+            targets = [set(S.j[:][S.i[:] == i]) for i in xrange(len(G))]
+            assert all([targets[i] != targets[i+1] for i in xrange(len(G) - 1)])
+            assert 300 < len(S) < 700
+    finally:
+        brian_prefs['codegen.runtime.numpy.counter_based_random'] = old_counter_based
+    for i, j, w in results[1:]:
+        assert_equal(i, results[0][0])
+        assert_equal(j, results[0][1])
+        assert_allclose(w, results[0][2])
+
+
 def test_connection_multiple_synapses():
     '''
     Test multiple synapses per connection.
@@ -399,6 +488,30 @@ def test_transmission():
                         target_mon.t[target_mon.i==1] - defaultclock.dt - delay[1])
 
 
+def test_transmission_repeated_targets():
+    for codeobj_class in codeobj_classes:
+        # Accumulating code (vectorised over repeated targets) and
+        # order-dependent code (has to loop over repeated targets)
+        for pre, expected in [('v_post += w', [8, 15]),
+                              ('v_post -= w\nx += 1', [-8, -15]),
+                              ('v_post = v_post + w', [8, 15]),
+                              ('v_post += w*v_post', [0, 0])]:
+            source = NeuronGroup(3, 'v : 1', threshold='v>1', reset='v=0',
+                                 codeobj_class=codeobj_class)
+            source.v = 1.1  # will spike immediately
+            target = NeuronGroup(2, 'v : 1', codeobj_class=codeobj_class)
+            S = Synapses(source, target, """w : 1
+                                            x : 1""",
+                         pre=pre, connect=True, codeobj_class=codeobj_class)
+            S.connect('i==j', n=2)
+            S.w = 'i + j + 1'
+            net = Network(source, target, S)
+            net.run(defaultclock.dt)
+            assert_equal(target.v[:], expected)
+            if 'x' in pre:
+                assert_equal(S.x[:], np.ones(len(S)))
+
+
 def test_changed_dt_spikes_in_queue():
     for codeobj_class in codeobj_classes:
         defaultclock.dt = .5*ms
@@ -426,6 +539,34 @@ def test_changed_dt_spikes_in_queue():
         assert_equal(mon.t, expected)
 
 
+def test_changed_delays_between_runs():
+    for codeobj_class in codeobj_classes:
+        defaultclock.dt = 0.1*ms
+        G1 = NeuronGroup(1, 'v:1', threshold='v>1', reset='v=0',
+                         codeobj_class=codeobj_class)
+        G2 = NeuronGroup(2, 'v:1', threshold='v>1', reset='v=0',
+                         codeobj_class=codeobj_class)
+        S = Synapses(G1, G2, pre='v+=1.1', connect=True,
+                     codeobj_class=codeobj_class)
+        S.delay = 'j*ms'
+        mon = SpikeMonitor(G2)
+        net = Network(G1, G2, S, mon)
+        G1.v = 1.1
+        net.run(5*ms)
+        # Nothing changed, the queue does not have to be prepared again
+        net.run(5*ms)
+        # Changed delays
+        S.delay = '2*j*ms'
+        G1.v = 1.1
+        net.run(5*ms)
+        # Changed synapses (the new synapse has a delay of 0ms)
+        S.connect(0, 1)
+        G1.v = 1.1
+        net.run(5*ms)
+        assert_allclose(mon.t, [0.1, 1.1, 10.1, 12.1, 15.1, 15.1, 17.1] * ms)
+        assert_equal(mon.i, [0, 1, 0, 1, 0, 1, 1])
+
+
 def test_summed_variable():
     for codeobj_class in codeobj_classes:
         source = NeuronGroup(2, 'v : 1', threshold='v>1', reset='v=0',
@@ -547,13 +688,18 @@ if __name__ == '__main__':
     test_creation()
     test_connection_string_deterministic()
     test_connection_random()
+    test_connection_block_size()
+    test_connection_sparse_sampling()
+    test_connection_random_consistency()
     test_connection_multiple_synapses()
     test_state_variable_assignment()
     test_state_variable_indexing()
     test_indices()
     test_delay_specification()
     test_transmission()
+    test_transmission_repeated_targets()
     test_changed_dt_spikes_in_queue()
+    test_changed_delays_between_runs()
     test_summed_variable()
     test_summed_variable_errors()
     test_event_driven()
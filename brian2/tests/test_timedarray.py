@@ -11,6 +11,13 @@ except ImportError:
     # Can't test C++
     codeobj_classes = [NumpyCodeObject]
 
+# numexpr is optional as well
+try:
+    import numexpr
+    codeobj_classes.append(NumexprCodeObject)
+except ImportError:
+    pass
+
 
 def test_timedarray_direct_use():
     ta = TimedArray(np.linspace(0, 10, 11), 1*ms)
@@ -1,4 +1,9 @@
+import os
+import shutil
+import tempfile
+
 from brian2.utils.environment import running_from_ipython
+from brian2.utils.filetools import write_file_if_changed
 
 def test_environment():
     '''
@@ -25,7 +30,28 @@ def test_environment():
         del builtins.__IPYTHON__
 
 
+def test_write_file_if_changed():
+    '''
+    Test that files are only rewritten if their content changed.
+    '''
+    tempdir = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(tempdir, 'test.cpp')
+        assert write_file_if_changed(fname, 'int x;\n')
+        # Set an old modification time to detect rewrites
+        os.utime(fname, (0, 0))
+        assert not write_file_if_changed(fname, 'int x;\n')
+        assert os.stat(fname).st_mtime == 0
+        assert write_file_if_changed(fname, 'int y;\n')
+        assert os.stat(fname).st_mtime > 0
+        with open(fname) as f:
+            assert f.read() == 'int y;\n'
+    finally:
+        shutil.rmtree(tempdir)
+
+
 if __name__ == '__main__':
     test_environment()
+    test_write_file_if_changed()
 
     
\ No newline at end of file
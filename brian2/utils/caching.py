@@ -0,0 +1,103 @@
+'''
+Bounded caches for the results of expensive functions without side effects,
+e.g. the parsing of expressions with sympy.
+'''
+from collections import OrderedDict
+
+from brian2.core.preferences import brian_prefs
+# Registers the core.parsing_cache_size preference
+import brian2.core.core_preferences
+
+__all__ = ['LRUCache', 'clear_caches', 'get_cache_statistics']
+
+# All caches created with `LRUCache`, used by `clear_caches` and
+# `get_cache_statistics`
+_caches = []
+
+
+class LRUCache(object):
+    '''
+    A dictionary-like cache with a limited number of entries. If the cache is
+    full, the least recently used entry is discarded.
+
+    Parameters
+    ----------
+    name : str
+        A name for the cache, used in `get_cache_statistics`.
+    size_preference : str, optional
+        The name of the preference determining the maximum number of entries.
+        The preference is read whenever a new entry is stored, a value of 0
+        disables the cache. Defaults to ``'core.parsing_cache_size'``.
+    '''
+    def __init__(self, name, size_preference='core.parsing_cache_size'):
+        self.name = name
+        self.size_preference = size_preference
+        self._entries = OrderedDict()
+        #: The number of successful lookups
+        self.hits = 0
+        #: The number of unsuccessful lookups
+        self.misses = 0
+        _caches.append(self)
+
+    def get(self, key, default=None):
+        '''
+        Return the value stored for ``key`` and mark it as recently used, or
+        return ``default`` if the key is not in the cache.
+        '''
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        maxsize = brian_prefs[self.size_preference]
+        if maxsize <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while len(self._entries) > maxsize:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        '''
+        Remove all entries from the cache and reset its statistics.
+        '''
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def clear_caches():
+    '''
+    Remove all entries from all caches. This is only necessary if something
+    that is not part of the cache keys changed, e.g. if a new function was
+    added to `DEFAULT_FUNCTIONS`.
+    '''
+    for cache in _caches:
+        cache.clear()
+
+
+def get_cache_statistics():
+    '''
+    Return the number of entries, hits and misses for all caches.
+
+    Returns
+    -------
+    statistics : dict
+        A dictionary mapping the names of the caches to dictionaries with the
+        keys ``'size'``, ``'hits'`` and ``'misses'``.
+    '''
+    return dict((cache.name, {'size': len(cache),
+                              'hits': cache.hits,
+                              'misses': cache.misses})
+                for cache in _caches)
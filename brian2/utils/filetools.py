@@ -4,7 +4,8 @@ File system tools
 
 import os
 
-__all__ = ['ensure_directory', 'ensure_directory_of_file', 'in_directory', 'copy_directory']
+__all__ = ['ensure_directory', 'ensure_directory_of_file', 'in_directory',
+           'copy_directory', 'write_file_if_changed']
 
 
 def ensure_directory_of_file(f):
@@ -48,9 +49,31 @@ class in_directory(object):
         os.chdir(self.orig_dir)
 
 
+def write_file_if_changed(filename, contents):
+    '''
+    Writes contents to filename, unless the file already exists with exactly
+    the same contents. Leaving unchanged files untouched keeps their
+    modification time, which allows build tools such as ``make`` to skip
+    recompiling them.
+
+    Returns
+    -------
+    changed : bool
+        Whether the file has been (re-)written.
+    '''
+    if os.path.exists(filename):
+        with open(filename, 'rb') as f:
+            if f.read() == contents:
+                return False
+    with open(filename, 'wb') as f:
+        f.write(contents)
+    return True
+
+
 def copy_directory(source, target):
     '''
-    Copies directory source to target.
+    Copies directory source to target. Files that already exist in target with
+    the same contents are not rewritten (see `write_file_if_changed`).
     '''
     sourcebase = os.path.normpath(source)+os.path.sep
     for root, dirnames, filenames in os.walk(source):
@@ -59,4 +82,5 @@ def copy_directory(source, target):
             relname = fullname.replace(sourcebase, '')
             tgtname = os.path.join(target, relname)
             ensure_directory_of_file(tgtname)
-            open(tgtname, 'w').write(open(fullname).read())
+            with open(fullname, 'rb') as f:
+                write_file_if_changed(tgtname, f.read())
@@ -90,9 +90,24 @@ class TimedArray(Function, Nameable):
                      '_%s_num_values' % self.name: len(self.values),
                      '_%s_values' % self.name: self.values}
 
+        # Implementation for Cython, the values in the namespace are available
+        # as module-level variables
+        cython_code = {'support_code': '''
+        cdef double _timedarray_%NAME%(double t):
+            cdef int i = <int>(t/_%NAME%_dt + 0.5) # rounds to nearest int for positive values
+            if i < 0:
+                i = 0
+            if i >= _%NAME%_num_values:
+                i = _%NAME%_num_values - 1
+            return _%NAME%_values[i]
+        '''.replace('%NAME%', self.name)}
+
         add_implementations(self, codes={'cpp': cpp_code,
+                                         'cython': cython_code,
                                          'numpy': unitless_timed_array_func},
-                            namespaces={'cpp': namespace},
-                            names={'cpp': self.name})
+                            namespaces={'cpp': namespace,
+                                        'cython': namespace},
+                            names={'cpp': self.name,
+                                   'cython': '_timedarray_' + self.name})
 
 
@@ -1,44 +1,51 @@
+'''
+How long does it take to prepare a `SpikeQueue` and to push spikes into it?
+The preparation time should scale linearly with the number of synapses.
+'''
 import timeit
 import itertools
 
 import numpy as np
 
 GENERAL_SETUP =  ['import numpy as np',
-                  'from brian2.tests.test_spikequeue import create_all_to_all, create_one_to_one',
                   'from brian2.units.stdunits import ms',
-                  'from brian2.synapses.spikequeue import SpikeQueue']
+                  'from brian2.synapses.spikequeue import SpikeQueue',
+                  'dt = float(0.1*ms)']
 
-def get_setup_code(N, create_func):
+def get_setup_code(N, n_synapses):
     return GENERAL_SETUP + [
-        'synapses, delays = {}({})'.format(create_func, N),
-        'queue = SpikeQueue(synapses, delays, 0.1*ms)']
+        'N = {}'.format(N),
+        'sources = np.sort(np.random.randint(0, N, {})).astype(np.int32)'.format(n_synapses),
+        'delays = np.random.randint(0, 10, len(sources)) * dt',
+        'queue = SpikeQueue(source_start=0, source_end=N)']
 
-def test_compress(N, create_func):
-    setup_code = get_setup_code(N, create_func)
-    number = 1000/N
-    results = timeit.repeat('queue.compress()', ';'.join(setup_code), repeat=5,
-                            number=number)
-    return np.array(results) / number
+
+def test_prepare(N, n_synapses):
+    setup_code = get_setup_code(N, n_synapses)
+    results = timeit.repeat('queue.prepare(delays, dt, sources)',
+                            ';'.join(setup_code), repeat=5, number=1)
+    return np.array(results)
 
 
-def test_push(N, create_func):
-    setup_code = get_setup_code(N, create_func) + ['queue.compress()']
-    number = 5000/N
-    results = timeit.repeat('queue.push(np.arange({}));queue.next()'.format(N),
+def test_push(N, n_synapses):
+    setup_code = get_setup_code(N, n_synapses) + ['queue.prepare(delays, dt, sources)',
+                                                  'spikes = np.sort(np.random.permutation(N)[:N/100]).astype(np.int32)']
+    number = 100
+    results = timeit.repeat('queue.push(spikes);queue.advance()',
                             ';'.join(setup_code), repeat=5,
                             number=number)
     return np.array(results) / number
 
 
-def run_benchmark(test_func, N, create_func):
-    result = test_func(N, create_func)
-    print '{} -- {}({}) : {}'.format(test_func.__name__, create_func, N,
-                                     np.median(result))
+def run_benchmark(test_func, N, n_synapses):
+    result = test_func(N, n_synapses)
+    print '{} -- N={}, {} synapses : {:.6f}s'.format(test_func.__name__, N,
+                                                     n_synapses,
+                                                     np.median(result))
 
 
 if __name__ == '__main__':
-    for test, N, create_func in itertools.product((test_compress, test_push),
-                                                  (10, 100),
-                                                  ('create_all_to_all',
-                                                   'create_one_to_one')):
-        run_benchmark(test, N, create_func)
+    for test, N, synapses_per_neuron in itertools.product((test_prepare, test_push),
+                                                          (1000, 10000, 100000),
+                                                          (10, 100)):
+        run_benchmark(test, N, N*synapses_per_neuron)
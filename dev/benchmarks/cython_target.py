@@ -0,0 +1,47 @@
+'''
+How much time per time step does a network of leaky integrate-and-fire
+neurons with random synaptic connections need with the numpy and with the
+cython target? The first run of the cython target compiles the code, later
+runs (also in new processes) load the compiled modules from the cache.
+'''
+import time
+
+
+from brian2 import *
+
+repetitions = 3
+steps = 1000
+sizes = [100, 1000, 10000]
+
+eqs = '''
+dv/dt = (ge - (v + 49*mV))/(20*ms) : volt
+dge/dt = -ge/(5*ms) : volt
+'''
+
+for size in sizes:
+    for codeobj_class in [NumpyCodeObject, CythonCodeObject]:
+        G = NeuronGroup(size, eqs, threshold='v > -50*mV', reset='v = -60*mV',
+                        codeobj_class=codeobj_class)
+        G.v = '-60*mV + rand()*10*mV'
+        S = Synapses(G, G, 'w : volt', pre='ge += w',
+                     codeobj_class=codeobj_class)
+        S.connect('i != j', p=min(1., 50. / size))
+        S.w = 1*mV
+        net = Network(G, S)
+        # The first run compiles the code (or loads it from the cache). Every
+        # run includes the code generation, we therefore subtract the time
+        # needed for a run with a single time step
+        net.run(defaultclock.dt)
+        single_step, many_steps = [], []
+        for _ in xrange(repetitions):
+            start = time.time()
+            net.run(defaultclock.dt)
+            single_step.append(time.time() - start)
+            start = time.time()
+            net.run(steps * defaultclock.dt)
+            many_steps.append(time.time() - start)
+        per_step = (min(many_steps) - min(single_step)) / (steps - 1)
+        print '%s, N=%d: %.3fms per time step' % (codeobj_class.class_name,
+                                                  size,
+                                                  per_step * 1e3)
+        del net, G, S
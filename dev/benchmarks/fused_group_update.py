@@ -0,0 +1,45 @@
+'''
+How much time per time step does a `NeuronGroup` need with separate code
+objects for state update, threshold and reset and how much with a single
+fused code object for state update and threshold (``fused=True``)? For small
+groups, the time is dominated by the overhead of calling the code objects.
+'''
+import time
+
+import numpy as np
+
+from brian2 import *
+
+try:
+    import scipy.weave
+    codeobj_classes = [WeaveCodeObject, NumpyCodeObject]
+except ImportError:
+    codeobj_classes = [NumpyCodeObject]
+
+repetitions = 3
+steps = 1000
+sizes = [100, 1000, 10000, 100000, 1000000]
+
+for codeobj_class in codeobj_classes:
+    for N in sizes:
+        for fused in [False, True]:
+            G = NeuronGroup(N, '''dv/dt = (v0 - v) / (10*ms) : 1
+                                  v0 : 1''',
+                            threshold='v > 1', reset='v = 0',
+                            codeobj_class=codeobj_class, fused=fused)
+            G.v0 = 'rand() * 1.5'
+            net = Network(G)
+            # Every run includes the code generation, we therefore subtract
+            # the time needed for a run with a single time step
+            times = []
+            for _ in xrange(repetitions):
+                start = time.time()
+                net.run(defaultclock.dt)
+                single_step = time.time() - start
+                start = time.time()
+                net.run(steps * defaultclock.dt)
+                times.append((time.time() - start - single_step) / (steps - 1))
+            print '%s, N=%d, fused=%s: %.2fus per time step' % (codeobj_class.class_name,
+                                                                N, fused,
+                                                                np.median(times) * 1e6)
+            del net, G
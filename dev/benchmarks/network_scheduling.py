@@ -0,0 +1,33 @@
+'''
+How much time per time step does `Network.run` spend on deciding which objects
+to update? The objects in this benchmark do nothing, the measured time is
+therefore only the overhead of the main loop.
+'''
+import time
+
+import numpy as np
+
+from brian2 import *
+
+class DoNothing(BrianObject):
+    def run(self):
+        pass
+
+repetitions = 3
+steps = 10000
+clocks = [Clock(dt=0.1*ms), Clock(dt=0.2*ms), Clock(dt=0.5*ms)]
+
+for num_objects in [1, 10, 100, 1000]:
+    for num_clocks in [1, 2, 3]:
+        objects = [DoNothing(when=(clocks[i % num_clocks], 'groups'))
+                   for i in xrange(num_objects)]
+        net = Network(objects)
+        times = []
+        for _ in xrange(repetitions):
+            start = time.time()
+            net.run(steps * clocks[0].dt)
+            times.append(time.time() - start)
+        print '%d objects, %d clock(s): %.2fus per time step' % (num_objects,
+                                                                 num_clocks,
+                                                                 np.median(times) / steps * 1e6)
+        del net, objects
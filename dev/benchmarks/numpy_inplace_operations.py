@@ -0,0 +1,58 @@
+'''
+How much time per time step does the numpy state update of a
+Hodgkin-Huxley type model need with the standard code and how much with the
+code storing all intermediate results in scratch buffers
+(``codegen.runtime.numpy.inplace_operations``)?
+'''
+import time
+
+import numpy as np
+
+from brian2 import *
+
+repetitions = 3
+steps = 50
+sizes = [100, 10000, 100000, 1000000]
+
+area = 20000*umetre**2
+Cm = 1*ufarad*cm**-2 * area
+gl = 5e-5*siemens*cm**-2 * area
+El = -65*mV
+EK = -90*mV
+ENa = 50*mV
+g_na = 100*msiemens*cm**-2 * area
+g_kd = 30*msiemens*cm**-2 * area
+VT = -63*mV
+
+eqs = Equations('''
+dv/dt = (gl*(El-v) - g_na*(m*m*m)*h*(v-ENa) - g_kd*(n*n*n*n)*(v-EK) + I)/Cm : volt
+dm/dt = 0.32/mV*(13.*mV-v+VT)/
+    (exp((13.*mV-v+VT)/(4.*mV))-1.)/ms*(1-m)-0.28/mV*(v-VT-40.*mV)/
+    (exp((v-VT-40.*mV)/(5.*mV))-1.)/ms*m : 1
+dn/dt = 0.032/mV*(15.*mV-v+VT)/
+    (exp((15.*mV-v+VT)/(5.*mV))-1.)/ms*(1.-n)-.5*exp((10.*mV-v+VT)/(40.*mV))/ms*n : 1
+dh/dt = 0.128*exp((17.*mV-v+VT)/(18.*mV))/ms*(1.-h)-4./(1+exp((40.*mV-v+VT)/(5.*mV)))/ms*h : 1
+I : amp
+''')
+
+for size in sizes:
+    for inplace in [False, True]:
+        brian_prefs['codegen.runtime.numpy.inplace_operations'] = inplace
+        G = NeuronGroup(size, eqs, method='exponential_euler',
+                        codeobj_class=NumpyCodeObject)
+        G.v = El
+        G.I = '0.7*nA * i / N'
+        net = Network(G)
+        # Every run includes the code generation, we therefore subtract
+        # the time needed for a run with a single time step
+        times = []
+        for _ in xrange(repetitions):
+            start = time.time()
+            net.run(defaultclock.dt)
+            single_step = time.time() - start
+            start = time.time()
+            net.run(steps * defaultclock.dt)
+            times.append((time.time() - start - single_step) / (steps - 1))
+        print 'N=%d, inplace_operations=%s: %.2fms per time step' % (size, inplace,
+                                                                     np.median(times) * 1e3)
+        del net, G
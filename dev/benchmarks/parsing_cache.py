@@ -0,0 +1,55 @@
+'''
+How long does it take to construct and prepare a model consisting of many
+populations with identical equations, with and without caching the results of
+parsing expressions (``core.parsing_cache_size``)? Each measurement includes
+the creation of the objects and a run over a single time step, i.e. the unit
+checks and the generation of the state updater and of all code objects.
+'''
+import time
+
+import numpy as np
+
+from brian2 import *
+from brian2.utils.caching import clear_caches, get_cache_statistics
+
+repetitions = 3
+populations = [5, 10, 20, 40]
+
+eqs = '''dv/dt = (g_e*(E_e - v) + g_i*(E_i - v) + (v_r - v))/tau_m : volt
+         dg_e/dt = -g_e/tau_e : 1
+         dg_i/dt = -g_i/tau_i : 1
+         tau_m : second'''
+E_e, E_i, v_r = 0*mV, -80*mV, -70*mV
+tau_e, tau_i = 5*ms, 10*ms
+
+
+def build_and_prepare(n_populations):
+    groups = [NeuronGroup(10, eqs, threshold='v > -50*mV',
+                          reset='v = v_r', refractory=5*ms)
+              for _ in xrange(n_populations)]
+    synapses = [Synapses(source, target, 'w : 1', pre='g_e += w')
+                for source, target in zip(groups[:-1], groups[1:])]
+    for S in synapses:
+        S.connect(True)
+    net = Network(groups + synapses)
+    net.run(defaultclock.dt)
+
+
+for n_populations in populations:
+    median_times = {}
+    for cache_size in [0, 10000]:
+        brian_prefs['core.parsing_cache_size'] = cache_size
+        times = []
+        for _ in xrange(repetitions):
+            clear_caches()
+            start = time.time()
+            build_and_prepare(n_populations)
+            times.append(time.time() - start)
+        hits = sum(stats['hits'] for stats in get_cache_statistics().itervalues())
+        median_times[cache_size] = np.median(times)
+        print '%d populations, cache size %d: %.2fs (%d cache hits)' % (n_populations,
+                                                                       cache_size,
+                                                                       median_times[cache_size],
+                                                                       hits)
+    print '%d populations: %.2fs saved by caching' % (n_populations,
+                                                      median_times[0] - median_times[10000])
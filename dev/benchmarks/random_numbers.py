@@ -0,0 +1,63 @@
+'''
+How much time per time step does the state update of a group of neurons
+driven by noise (one call of ``randn()`` per neuron and time step) need with
+the different runtime targets? The numpy and numexpr targets are run with
+numpy's random number generator and with the counter-based generator
+(``codegen.runtime.numpy.counter_based_random``). Also checks that all
+targets generate the same random numbers for the same seed when using the
+counter-based generator.
+'''
+import time
+
+import numpy as np
+
+from brian2 import *
+
+repetitions = 3
+steps = 1000
+sizes = [100, 1000, 10000, 100000]
+
+eqs = '''
+dv/dt = -v/(10*ms) + xi/sqrt(10*ms) : 1
+'''
+
+codeobj_classes = [NumpyCodeObject, NumexprCodeObject, CythonCodeObject]
+try:
+    import scipy.weave
+    codeobj_classes.append(WeaveCodeObject)
+except ImportError:
+    pass
+cases = [(codeobj_class, True) for codeobj_class in codeobj_classes]
+cases += [(NumpyCodeObject, False), (NumexprCodeObject, False)]
+
+for size in sizes:
+    final_values = {}
+    for codeobj_class, counter_based in cases:
+        brian_prefs['codegen.runtime.numpy.counter_based_random'] = counter_based
+        seed(2014)
+        G = NeuronGroup(size, eqs, codeobj_class=codeobj_class)
+        G.v = 'rand()'
+        net = Network(G)
+        # The first run compiles the code (or loads it from the cache). Every
+        # run includes the code generation, we therefore subtract the time
+        # needed for a run with a single time step
+        net.run(defaultclock.dt)
+        single_step, many_steps = [], []
+        for _ in xrange(repetitions):
+            start = time.time()
+            net.run(defaultclock.dt)
+            single_step.append(time.time() - start)
+            start = time.time()
+            net.run(steps * defaultclock.dt)
+            many_steps.append(time.time() - start)
+        per_step = (min(many_steps) - min(single_step)) / (steps - 1)
+        if counter_based:
+            final_values[codeobj_class] = G.v[:].copy()
+        print '%s%s, N=%d: %.3fms per time step' % (codeobj_class.class_name,
+                                                    '' if counter_based else ' (numpy generator)',
+                                                    size,
+                                                    per_step * 1e3)
+        del net, G
+    reference = final_values[codeobj_classes[0]]
+    print 'Same values for all targets: %s' % all([np.allclose(values, reference)
+                                                   for values in final_values.itervalues()])
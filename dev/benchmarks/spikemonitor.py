@@ -0,0 +1,49 @@
+'''
+How much time per time step does a `SpikeMonitor` need for large groups with
+low firing rates (a few spikes per time step), when recording the whole group
+and when recording a subgroup? Only the monitor's code is run, on a fixed set
+of spiking neurons.
+'''
+import time
+
+import numpy as np
+
+from brian2 import *
+
+repetitions = 3
+steps = 1000
+sizes = [10000, 100000, 1000000]
+spikes_per_step = 5
+
+codeobj_classes = [NumpyCodeObject, CythonCodeObject]
+try:
+    import scipy.weave
+    codeobj_classes.append(WeaveCodeObject)
+except ImportError:
+    pass
+
+for size in sizes:
+    for codeobj_class in codeobj_classes:
+        G = NeuronGroup(size, 'v : 1', threshold='v>1',
+                        codeobj_class=codeobj_class)
+        for description, source in [('group', G),
+                                    ('subgroup', G[size//4:size//2])]:
+            mon = SpikeMonitor(source, codeobj_class=codeobj_class)
+            net = Network(G, mon)
+            # Generates the code
+            net.run(defaultclock.dt)
+            spikespace = G.variables['_spikespace'].get_value()
+            spikes = np.sort(np.random.permutation(size)[:spikes_per_step])
+            spikespace[:spikes_per_step] = spikes
+            spikespace[-1] = spikes_per_step
+            times = []
+            for _ in xrange(repetitions):
+                start = time.time()
+                for _ in xrange(steps):
+                    mon.run()
+                times.append(time.time() - start)
+            print '%s, N=%d, %s: %.3fms per time step' % (codeobj_class.class_name,
+                                                          size, description,
+                                                          min(times) / steps * 1e3)
+            del net, mon
+        del G
@@ -0,0 +1,52 @@
+'''
+How much time per time step does a `StateMonitor` recording several variables
+of many neurons need with the different runtime targets, and how long does it
+take to access the recorded values after the run?
+'''
+import time
+
+from brian2 import *
+
+repetitions = 3
+steps = 1000
+size = 1000
+
+eqs = '''
+dv/dt = -v/(10*ms) : 1
+dw/dt = -w/(20*ms) : 1
+dx/dt = -x/(30*ms) : 1
+dy/dt = -y/(40*ms) : 1
+dz/dt = -z/(50*ms) : 1
+'''
+
+codeobj_classes = [NumpyCodeObject, CythonCodeObject]
+try:
+    import scipy.weave
+    codeobj_classes.append(WeaveCodeObject)
+except ImportError:
+    pass
+
+for codeobj_class in codeobj_classes:
+    run_times, access_times = [], []
+    for _ in xrange(repetitions):
+        G = NeuronGroup(size, eqs, codeobj_class=codeobj_class)
+        mon = StateMonitor(G, ['v', 'w', 'x', 'y', 'z'], record=True,
+                           codeobj_class=codeobj_class)
+        net = Network(G, mon)
+        # Compile the code (or load it from the cache)
+        net.run(defaultclock.dt)
+        without_mon = Network(G)
+        without_mon.run(defaultclock.dt)
+        start = time.time()
+        without_mon.run(steps * defaultclock.dt)
+        group_time = time.time() - start
+        start = time.time()
+        net.run(steps * defaultclock.dt)
+        run_times.append(time.time() - start - group_time)
+        start = time.time()
+        values = [mon.v, mon.w, mon.x, mon.y, mon.z]
+        access_times.append(time.time() - start)
+        del net, without_mon, mon, G, values
+    print '%s: %.3fms per time step for recording, %.3fms for accessing the values' % (codeobj_class.class_name,
+                                                                                      min(run_times) / steps * 1e3,
+                                                                                      min(access_times) * 1e3)
@@ -0,0 +1,55 @@
+'''
+How long does it take to create a Hodgkin-Huxley type `NeuronGroup` when the
+state updater results have to be calculated, and how long when they are taken
+from the on-disk cache (``stateupdaters.use_cache``)? To simulate a new
+process, only the in-memory copy of the cache is cleared for the second case.
+'''
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from brian2 import *
+
+repetitions = 3
+
+area = 20000*umetre**2
+Cm = 1*ufarad*cm**-2 * area
+gl = 5e-5*siemens*cm**-2 * area
+El = -65*mV
+EK = -90*mV
+ENa = 50*mV
+g_na = 100*msiemens*cm**-2 * area
+g_kd = 30*msiemens*cm**-2 * area
+VT = -63*mV
+
+eqs = Equations('''
+dv/dt = (gl*(El-v) - g_na*(m*m*m)*h*(v-ENa) - g_kd*(n*n*n*n)*(v-EK) + I)/Cm : volt
+dm/dt = 0.32*(mV**-1)*(13.*mV-v+VT)/
+    (exp((13.*mV-v+VT)/(4.*mV))-1.)/ms*(1-m)-0.28*(mV**-1)*(v-VT-40.*mV)/
+    (exp((v-VT-40.*mV)/(5.*mV))-1.)/ms*m : 1
+dn/dt = 0.032*(mV**-1)*(15.*mV-v+VT)/
+    (exp((15.*mV-v+VT)/(5.*mV))-1.)/ms*(1.-n)-.5*exp((10.*mV-v+VT)/(40.*mV))/ms*n : 1
+dh/dt = 0.128*exp((17.*mV-v+VT)/(18.*mV))/ms*(1.-h)-4./(1+exp((40.*mV-v+VT)/(5.*mV)))/ms*h : 1
+I : amp
+''')
+
+tempdir = tempfile.mkdtemp()
+brian_prefs['stateupdaters.cache_directory'] = tempdir
+brian_prefs['stateupdaters.use_cache'] = True
+try:
+    for method in [None, 'exponential_euler', 'rk4']:
+        times = {'computed': [], 'from disk': []}
+        for _ in xrange(repetitions):
+            for case in ['computed', 'from disk']:
+                clear_stateupdater_cache(disk=(case == 'computed'))
+                start = time.time()
+                G = NeuronGroup(100, eqs, threshold='v > -20*mV', method=method)
+                times[case].append(time.time() - start)
+                del G
+        print 'method=%s: %.3fs (computed), %.3fs (from disk)' % (method,
+                                                                 np.median(times['computed']),
+                                                                 np.median(times['from disk']))
+finally:
+    shutil.rmtree(tempdir)
@@ -0,0 +1,44 @@
+'''
+How long does synapse creation with the numpy target take for different
+network shapes and values of the
+``codegen.runtime.numpy.synapse_creation_block_size`` preference? A block size
+of 1 evaluates the condition for one presynaptic neuron at a time.
+'''
+import time
+
+import numpy as np
+
+from brian2 import *
+
+repetitions = 3
+
+block_sizes = [1, 10000, 100000, 1000000]
+# (number of presynaptic neurons, number of postsynaptic neurons)
+shapes = [(1000, 1000), (50000, 100), (100, 50000), (20000, 20000)]
+conditions = [('Full (no-self)', 'i != j', 1.),
+              ('Random no-self (2%)', 'i != j', 0.02)]
+
+for pattern, condition, p in conditions:
+    for N_pre, N_post in shapes:
+        if p == 1. and N_pre*N_post > 10000000:
+            continue  # too many synapses
+        source = NeuronGroup(N_pre, '')
+        target = NeuronGroup(N_post, '')
+        for block_size in block_sizes:
+            brian_prefs['codegen.runtime.numpy.synapse_creation_block_size'] = block_size
+            times = []
+            for _ in xrange(repetitions):
+                S = Synapses(source, target, '''w : 1
+                                                x : 1''', pre='x += w',
+                             codeobj_class=NumpyCodeObject)
+                start = time.time()
+                S.connect(condition, p=p)
+                times.append(time.time() - start)
+                connections = len(S)
+                del S
+            print '%s, %dx%d, block size %d: %.4fs (for %d connections)' % (pattern,
+                                                                            N_pre,
+                                                                            N_post,
+                                                                            block_size,
+                                                                            np.median(times),
+                                                                            connections)
@@ -122,7 +122,9 @@ setup(name='Brian2',
                     'brian2.codegen.runtime.numpy_rt': ['templates/*.py_'],
                     'brian2.codegen.runtime.weave_rt': ['templates/*.cpp',
                                                         'templates/*.h'],
+                    'brian2.codegen.runtime.cython_rt': ['templates/*.pyx'],
                     'brian2.devices.cpp_standalone': ['templates/*.cpp',
+                                                      'templates/makefile',
                                                       'templates/*.h',
                                                       'brianlib/*.cpp',
                                                       'brianlib/*.h'],
@@ -141,7 +143,9 @@ setup(name='Brian2',
       cmdclass={'build_ext': optional_build_ext},
       provides=['brian2'],
       extras_require={'test': ['nosetests>=1.0'],
-                      'docs': ['sphinx>=1.0.1', 'sphinxcontrib-issuetracker']},
+                      'docs': ['sphinx>=1.0.1', 'sphinxcontrib-issuetracker'],
+                      'numexpr': ['numexpr>=2.0'],
+                      'cython': ['Cython>=0.20']},
       use_2to3=True,
       ext_modules=extensions,
       url='http://www.briansimulator.org/',